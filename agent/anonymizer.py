@@ -0,0 +1,471 @@
+import dataclasses
+import multiprocessing
+import os
+import re
+import resource
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import spacy
+import structlog
+from billiard.pool import Pool
+from django.conf import settings
+from opentelemetry import metrics
+from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine, recognizer_result
+from presidio_analyzer.nlp_engine import NlpEngineProvider, SpacyNlpEngine
+from presidio_anonymizer import AnonymizerEngine, entities
+
+logger = structlog.get_logger(__name__)
+meter = metrics.get_meter(__name__)
+
+SPACY_MODEL_NAME = "en_core_web_sm"
+LANGUAGE = "en"
+
+# Small document that touches the spacy pipeline and the most common recognizers,
+# so the first real CV does not pay for lazy initialization.
+WARM_UP_TEXT = """
+John Smith
+Software Engineer, Colombo, Sri Lanka
+john.smith@example.com | +94 77 123 4567 | https://github.com/johnsmith
+"""
+
+# Precompiled recognizers of the "fast" profile, the PII a CV shows in its contact details
+REGEX_RECOGNIZERS: List[Tuple[str, re.Pattern]] = [
+    ("EMAIL_ADDRESS", re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")),
+    ("URL", re.compile(r"https?://\S+|www\.\S+")),
+    # no year ranges (2019 - 2023), the groups are separated by a single character
+    ("PHONE_NUMBER", re.compile(r"(?:\+\d{1,3}[\s.-]?)?\(?\d{1,4}\)?[\s.-]?\d{3,4}[\s.-]?\d{3,4}\b")),
+    (
+        "LOCATION",
+        # house number and street, eg: 42 Example Street
+        re.compile(
+            r"\b\d{1,5}\s+(?:[A-Z][a-z]+\s+){1,3}"
+            r"(?:Street|St|Road|Rd|Avenue|Ave|Lane|Ln|Drive|Dr|Boulevard|Blvd|Way)\b\.?"
+        ),
+    ),
+]
+# regex matches are not scored by presidio, every match is replaced
+REGEX_SCORE = 1.0
+
+# Entities the "standard" profile anonymizes, dates and organizations stay readable for the analysis
+CV_ENTITIES = ("PERSON", "EMAIL_ADDRESS", "PHONE_NUMBER", "URL", "LOCATION")
+# NER reads the shared tok2vec layer, tagging, parsing and lemmatizing are skipped
+NER_COMPONENTS = ("tok2vec", "ner")
+
+
+@dataclasses.dataclass(frozen=True)
+class AnonymizerProfile:
+    """How much of presidio/spacy runs per document, see AGENT_ANONYMIZER_PROFILE."""
+
+    name: str
+    # spacy components to run, None: the whole pipeline, empty: no spacy model (regex recognizers only)
+    spacy_components: Optional[Tuple[str, ...]]
+    # entity types that are anonymized, None: everything presidio recognizes
+    entities: Optional[Tuple[str, ...]] = None
+
+    @property
+    def uses_spacy(self) -> bool:
+        return self.spacy_components != ()
+
+    @property
+    def chunkable(self) -> bool:
+        # a regex match does not depend on the rest of the text, spacy's NER does (sentence context),
+        # only without spacy chunks are guaranteed to find the same entities as a single pass
+        return not self.uses_spacy
+
+
+ANONYMIZER_PROFILES: Dict[str, AnonymizerProfile] = {
+    "fast": AnonymizerProfile("fast", spacy_components=(), entities=tuple(entity for entity, _ in REGEX_RECOGNIZERS)),
+    "standard": AnonymizerProfile("standard", spacy_components=NER_COMPONENTS, entities=CV_ENTITIES),
+    "full": AnonymizerProfile("full", spacy_components=None),
+}
+
+
+def get_anonymizer_profile(name: str) -> AnonymizerProfile:
+    if name not in ANONYMIZER_PROFILES:
+        raise ValueError(f"Unknown anonymizer profile {name!r}, expected one of {sorted(ANONYMIZER_PROFILES)}")
+    return ANONYMIZER_PROFILES[name]
+
+
+class RegexAnalyzer:
+    """Stand-in for presidio's AnalyzerEngine running only `REGEX_RECOGNIZERS`, no spacy model is loaded."""
+
+    def __init__(self, recognizers: List[Tuple[str, re.Pattern]] = REGEX_RECOGNIZERS):
+        self.recognizers = recognizers
+
+    def analyze(
+        self, text: str, language: str, entities: Optional[List[str]] = None
+    ) -> List[recognizer_result.RecognizerResult]:
+        return [
+            recognizer_result.RecognizerResult(
+                entity_type=entity,
+                start=match.start(),
+                end=match.end(),
+                score=REGEX_SCORE,
+                recognition_metadata={recognizer_result.RecognizerResult.RECOGNIZER_NAME_KEY: "RegexAnalyzer"},
+            )
+            for entity, pattern in self.recognizers
+            if entities is None or entity in entities
+            for match in pattern.finditer(text)
+        ]
+
+
+class PartialSpacyNlpEngine(SpacyNlpEngine):
+    """Presidio's spacy engine loading only some components of the model, the rest of the pipeline is skipped."""
+
+    def __init__(self, components: Tuple[str, ...], **kwargs: Any):
+        super().__init__(**kwargs)
+        self.components = components
+
+    def load(self) -> None:
+        self.nlp = {  # type: ignore [assignment]
+            model["lang_code"]: spacy.load(model["model_name"], enable=list(self.components)) for model in self.models
+        }
+
+
+@dataclasses.dataclass
+class EngineMetrics:
+    load_seconds: float = 0.0
+    # ru_maxrss is reported in kilobytes on linux
+    load_max_rss_kb: int = 0
+    load_rss_delta_kb: int = 0
+    warm_up_seconds: float = 0.0
+    loaded_at: Optional[float] = None
+
+
+def _max_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class EngineRegistry:
+    """
+    Holds one Presidio analyzer/anonymizer pair (and the spacy model behind it) per process.
+
+    Engines are loaded lazily on first use or eagerly via `load()` / `warm_up()`, which is
+    what the celery `worker_process_init` signal does. Loading is guarded by a lock so
+    threads that race on the first scan only load the model once. The loaded engines are
+    read-only afterwards, so they can be shared by concurrent scans in the same process.
+
+    In Celery each prefork child has its own registry, this is not shared across workers.
+
+    `profile` picks how much of the pipeline runs (see `ANONYMIZER_PROFILES`), AGENT_ANONYMIZER_PROFILE by default.
+    """
+
+    def __init__(self, profile: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._profile = profile
+        self._analyzer: AnalyzerEngine | RegexAnalyzer | None = None
+        self._anonymizer: Optional[AnonymizerEngine] = None
+        self.metrics = EngineMetrics()
+
+    @property
+    def profile(self) -> AnonymizerProfile:
+        return get_anonymizer_profile(self._profile or settings.AGENT_ANONYMIZER_PROFILE)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._analyzer is not None and self._anonymizer is not None
+
+    def load(self):
+        if self.is_loaded:
+            return
+
+        with self._lock:
+            if self.is_loaded:
+                return
+
+            profile = self.profile
+            rss_before = _max_rss_kb()
+            started = time.perf_counter()
+
+            analyzer = self._load_analyzer(profile)
+            anonymizer = AnonymizerEngine()
+
+            self.metrics.load_seconds = time.perf_counter() - started
+            self.metrics.load_max_rss_kb = _max_rss_kb()
+            self.metrics.load_rss_delta_kb = self.metrics.load_max_rss_kb - rss_before
+            self.metrics.loaded_at = time.time()
+
+            self._analyzer = analyzer
+            self._anonymizer = anonymizer
+
+        logger.info(
+            "anonymizer engines loaded",
+            profile=profile.name,
+            model=SPACY_MODEL_NAME if profile.uses_spacy else None,
+            load_seconds=round(self.metrics.load_seconds, 3),
+            rss_delta_kb=self.metrics.load_rss_delta_kb,
+        )
+
+    @staticmethod
+    def _load_analyzer(profile: AnonymizerProfile) -> AnalyzerEngine | RegexAnalyzer:
+        if not profile.uses_spacy:
+            return RegexAnalyzer()
+        models = [{"lang_code": LANGUAGE, "model_name": SPACY_MODEL_NAME}]
+        if profile.spacy_components is None:
+            nlp_engine = NlpEngineProvider(
+                nlp_configuration={"nlp_engine_name": "spacy", "models": models}
+            ).create_engine()
+        else:
+            nlp_engine = PartialSpacyNlpEngine(profile.spacy_components, models=models)
+            nlp_engine.load()
+        return AnalyzerEngine(nlp_engine=nlp_engine, supported_languages=[LANGUAGE])
+
+    def warm_up(self, text: str = WARM_UP_TEXT):
+        self.load()
+        started = time.perf_counter()
+        anonymize_text(text, registry=self)
+        self.metrics.warm_up_seconds = time.perf_counter() - started
+        logger.info("anonymizer engines warmed up", warm_up_seconds=round(self.metrics.warm_up_seconds, 3))
+
+    def get_analyzer(self) -> AnalyzerEngine | RegexAnalyzer:
+        self.load()
+        assert self._analyzer is not None
+        return self._analyzer
+
+    def get_anonymizer(self) -> AnonymizerEngine:
+        self.load()
+        assert self._anonymizer is not None
+        return self._anonymizer
+
+    def reset(self):
+        with self._lock:
+            self._analyzer = None
+            self._anonymizer = None
+            self.metrics = EngineMetrics()
+
+
+# One registry per Python process
+engine_registry = EngineRegistry()
+
+
+def _observe_load_seconds(options: metrics.CallbackOptions):
+    yield metrics.Observation(engine_registry.metrics.load_seconds)
+
+
+def _observe_load_rss(options: metrics.CallbackOptions):
+    yield metrics.Observation(engine_registry.metrics.load_max_rss_kb)
+
+
+meter.create_observable_gauge(
+    "agent.anonymizer.engine_load_duration",
+    callbacks=[_observe_load_seconds],
+    unit="s",
+    description="Time taken to load the presidio/spacy engines in this process",
+)
+meter.create_observable_gauge(
+    "agent.anonymizer.engine_max_rss",
+    callbacks=[_observe_load_rss],
+    unit="kB",
+    description="Peak resident memory of the process right after loading the presidio/spacy engines",
+)
+
+
+def to_anonymizer_input(
+    analyzer_results: List[recognizer_result.RecognizerResult],
+) -> List[entities.RecognizerResult]:
+    anonymizer_input: List[entities.RecognizerResult] = []
+    for result in analyzer_results:
+        anonymizer_input.append(
+            entities.RecognizerResult(
+                entity_type=result.entity_type,
+                start=result.start,
+                end=result.end,
+                score=result.score,
+            )
+        )
+    return anonymizer_input
+
+
+def _analyze_kwargs(profile: AnonymizerProfile) -> Dict[str, Any]:
+    # presidio only runs the recognizers of the allowed entities
+    return {"entities": list(profile.entities)} if profile.entities else {}
+
+
+@dataclasses.dataclass(frozen=True)
+class TextChunk:
+    start: int
+    end: int
+    # entities starting in [own_start, own_end) are taken from this chunk, the rest from its neighbours
+    own_start: int
+    own_end: int
+
+
+def split_text(text: str, chunk_chars: int, overlap: int) -> List[TextChunk]:
+    """
+    Overlapping chunks of at most `chunk_chars` characters, cut at whitespace so no word is split.
+
+    Neighbours own their overlap up to its middle, an entity shorter than half the overlap is
+    found whole in the chunk owning its start, see `_analyze_chunks`.
+    """
+    if chunk_chars <= 0 or len(text) <= chunk_chars:
+        return [TextChunk(0, len(text), 0, len(text))]
+    # every chunk moves the window forward
+    overlap = min(overlap, chunk_chars // 4)
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    while True:
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            # back to the last whitespace, unless the chunk would lose its overlap
+            cut = max(text.rfind(" ", start, end), text.rfind("\n", start, end))
+            end = cut if cut > start + overlap else end
+        spans.append((start, end))
+        if end == len(text):
+            break
+        start = end - overlap
+        # forward to the next word, the part of a word before it belongs to the previous chunk
+        while start < end and not text[start - 1].isspace():
+            start += 1
+    chunks = []
+    own_start = 0
+    for index, (start, end) in enumerate(spans):
+        own_end = (spans[index + 1][0] + end) // 2 if index + 1 < len(spans) else len(text)
+        chunks.append(TextChunk(start, end, own_start, own_end))
+        own_start = own_end
+    return chunks
+
+
+# Registries of the pool processes, a forked process reuses the engines the parent already loaded
+_chunk_registries: Dict[str, EngineRegistry] = {}
+
+
+def _chunk_registry(profile: str) -> EngineRegistry:
+    if engine_registry.profile.name == profile:
+        return engine_registry
+    if profile not in _chunk_registries:
+        _chunk_registries[profile] = EngineRegistry(profile=profile)
+    return _chunk_registries[profile]
+
+
+def _analyze_chunk(profile: str, chunk: TextChunk, text: str) -> List[Tuple[str, int, int, float]]:
+    """Entities of a chunk owned by it, as (entity type, start, end, score) in the offsets of the whole text."""
+    registry = _chunk_registry(profile)
+    results = registry.get_analyzer().analyze(text=text, language=LANGUAGE, **_analyze_kwargs(registry.profile))
+    return [
+        (result.entity_type, result.start + chunk.start, result.end + chunk.start, result.score)
+        for result in results
+        if chunk.own_start <= result.start + chunk.start < chunk.own_end
+    ]
+
+
+# One pool per Python process, started with the celery worker process (see config/celery.py)
+# or on the first long document
+anonymizerPoolInstance: Optional[Pool] = None
+
+
+def get_anonymizer_pool() -> Optional[Pool]:
+    """
+    None when chunks are analyzed in this process (one worker).
+
+    billiard (celery's fork of multiprocessing) lets daemon processes have children, so the celery prefork
+    children running the scans get a pool too, the standard library refuses to start one there.
+    """
+    global anonymizerPoolInstance
+    if settings.AGENT_ANONYMIZER_CHUNK_WORKERS <= 1:
+        return None
+    if anonymizerPoolInstance is None:
+        anonymizerPoolInstance = Pool(processes=settings.AGENT_ANONYMIZER_CHUNK_WORKERS)
+    return anonymizerPoolInstance
+
+
+def _forget_pool():
+    global anonymizerPoolInstance
+    anonymizerPoolInstance = None
+
+
+os.register_at_fork(after_in_child=_forget_pool)
+
+
+def _analyze_chunks(
+    text: str, chunks: List[TextChunk], registry: EngineRegistry
+) -> List[recognizer_result.RecognizerResult]:
+    # loaded before the pool forks, so the pool processes start with the engines
+    registry.load()
+    profile = registry.profile.name
+    pool = get_anonymizer_pool()
+    if pool is None:
+        # no speed up without other cores, a single pass gives the same output
+        return registry.get_analyzer().analyze(text=text, language=LANGUAGE, **_analyze_kwargs(registry.profile))
+    pending = [pool.apply_async(_analyze_chunk, (profile, chunk, text[chunk.start : chunk.end])) for chunk in chunks]
+    results = [
+        recognizer_result.RecognizerResult(entity_type=entity, start=start, end=end, score=score)
+        for result in pending
+        for entity, start, end, score in result.get()
+    ]
+    logger.debug("anonymized in chunks", chunks=len(chunks), entities=len(results), chars=len(text))
+    return results
+
+
+def anonymize_text(text: str, registry: EngineRegistry = engine_registry) -> str:
+    """
+    Replace the PII in `text` with its entity type, eg: <EMAIL_ADDRESS>.
+
+    With a chunkable profile ("fast"), texts longer than AGENT_ANONYMIZER_CHUNK_CHARS are analyzed as
+    overlapping chunks on a process pool, each chunk keeps the entities starting in the part it owns and
+    the whole text is anonymized once.
+    """
+    chunks = split_text(text, settings.AGENT_ANONYMIZER_CHUNK_CHARS, settings.AGENT_ANONYMIZER_CHUNK_OVERLAP)
+    analyzer_results: List[recognizer_result.RecognizerResult]
+    if len(chunks) > 1 and registry.profile.chunkable:
+        analyzer_results = _analyze_chunks(text, chunks, registry)
+    else:
+        analyzer_results = registry.get_analyzer().analyze(
+            text=text,
+            language=LANGUAGE,
+            **_analyze_kwargs(registry.profile),
+        )
+    anonymized = registry.get_anonymizer().anonymize(text=text, analyzer_results=to_anonymizer_input(analyzer_results))
+    return anonymized.text
+
+
+def anonymize_texts(
+    texts: Iterable[str],
+    batch_size: Optional[int] = None,
+    n_process: Optional[int] = None,
+    registry: EngineRegistry = engine_registry,
+) -> List[str]:
+    """
+    Anonymize many CV texts in one go.
+
+    The texts are streamed through spacy's `nlp.pipe` via presidio's `BatchAnalyzerEngine`,
+    so NER runs on batches instead of paying the per document overhead of `anonymize_text`.
+    Results are returned in the same order as the input.
+
+    Args:
+        texts: CV texts to anonymize.
+        batch_size: Number of documents spacy processes per batch. Defaults to `AGENT_ANONYMIZER_BATCH_SIZE`.
+        n_process: Number of processes spacy uses. Defaults to `AGENT_ANONYMIZER_N_PROCESS`, always 1 in a
+            daemon process (celery prefork child).
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+
+    analyzer = registry.get_analyzer()
+    analyze_kwargs = _analyze_kwargs(registry.profile)
+    analyzer_results_batch: Iterable[List[recognizer_result.RecognizerResult]]
+    if isinstance(analyzer, RegexAnalyzer):
+        # nothing to batch without spacy
+        analyzer_results_batch = [analyzer.analyze(text=text, language=LANGUAGE, **analyze_kwargs) for text in texts]
+    else:
+        n_process = n_process or settings.AGENT_ANONYMIZER_N_PROCESS
+        if multiprocessing.current_process().daemon:
+            # spacy starts its processes with the standard library, which refuses to in celery prefork children
+            n_process = 1
+        batch_analyzer = BatchAnalyzerEngine(analyzer_engine=analyzer)
+        analyzer_results_batch = batch_analyzer.analyze_iterator(
+            texts=texts,
+            language=LANGUAGE,
+            batch_size=batch_size or settings.AGENT_ANONYMIZER_BATCH_SIZE,
+            n_process=n_process,
+            **analyze_kwargs,
+        )
+
+    anonymizer = registry.get_anonymizer()
+    anonymized_texts: List[str] = []
+    for text, analyzer_results in zip(texts, analyzer_results_batch):
+        anonymized = anonymizer.anonymize(text=text, analyzer_results=to_anonymizer_input(analyzer_results))
+        anonymized_texts.append(anonymized.text)
+    return anonymized_texts
@@ -0,0 +1,126 @@
+from typing import List, NamedTuple, Tuple
+
+
+class AnonymizerSample(NamedTuple):
+    text: str
+    # (entity type, text) of every piece of PII in the sample, see `manage.py benchmark_anonymizer`
+    pii: List[Tuple[str, str]]
+
+
+# Synthetic CV headers and sections with the PII we expect the anonymizer to remove.
+# Skills, employers and dates are not PII here, they have to stay for the analysis.
+ANONYMIZER_SAMPLES: List[AnonymizerSample] = [
+    AnonymizerSample(
+        text="""John Smith
+Software Engineer, Colombo, Sri Lanka
+john.smith@example.com | +94 77 123 4567 | https://github.com/johnsmith
+
+Experience
+Senior Developer at Example Corp (2019 - 2023)
+- Built REST APIs with Python, Django and PostgreSQL
+""",
+        pii=[
+            ("PERSON", "John Smith"),
+            ("LOCATION", "Colombo"),
+            ("LOCATION", "Sri Lanka"),
+            ("EMAIL_ADDRESS", "john.smith@example.com"),
+            ("PHONE_NUMBER", "+94 77 123 4567"),
+            ("URL", "https://github.com/johnsmith"),
+        ],
+    ),
+    AnonymizerSample(
+        text="""Curriculum Vitae
+
+Name: Maria Garcia
+Address: 42 Example Street, Springfield
+Phone: (555) 010-4477
+Email: maria.garcia@mail.example.org
+LinkedIn: www.linkedin.com/in/mariagarcia
+
+Profile
+Data analyst with 6 years of experience in SQL, Tableau and Python.
+""",
+        pii=[
+            ("PERSON", "Maria Garcia"),
+            ("LOCATION", "42 Example Street"),
+            ("LOCATION", "Springfield"),
+            ("PHONE_NUMBER", "(555) 010-4477"),
+            ("EMAIL_ADDRESS", "maria.garcia@mail.example.org"),
+            ("URL", "www.linkedin.com/in/mariagarcia"),
+        ],
+    ),
+    AnonymizerSample(
+        text="""AHMED KHAN
+Lead DevOps Engineer | London, United Kingdom
+ahmed.khan+cv@example.co.uk · +44 20 7946 0958
+
+Summary
+Ahmed Khan has led platform teams running Kubernetes, Terraform and AWS for 9 years.
+
+References available on request from Sarah Thompson.
+""",
+        pii=[
+            ("PERSON", "AHMED KHAN"),
+            ("LOCATION", "London"),
+            ("LOCATION", "United Kingdom"),
+            ("EMAIL_ADDRESS", "ahmed.khan+cv@example.co.uk"),
+            ("PHONE_NUMBER", "+44 20 7946 0958"),
+            ("PERSON", "Ahmed Khan"),
+            ("PERSON", "Sarah Thompson"),
+        ],
+    ),
+    AnonymizerSample(
+        text="""Priya Raman
+Frontend Developer
+Bangalore, India | priya.raman@example.in | 080 4123 9876
+Portfolio: https://priyaraman.dev
+
+Skills: React, TypeScript, Next.js, GraphQL, Figma
+Education: BSc Computer Science (2014 - 2017)
+""",
+        pii=[
+            ("PERSON", "Priya Raman"),
+            ("LOCATION", "Bangalore"),
+            ("LOCATION", "India"),
+            ("EMAIL_ADDRESS", "priya.raman@example.in"),
+            ("PHONE_NUMBER", "080 4123 9876"),
+            ("URL", "https://priyaraman.dev"),
+        ],
+    ),
+    AnonymizerSample(
+        text="""Contact
+Lucas Martin - Paris, France
+lucas.martin@example.fr / +33 1 4020 5050
+
+Work
+Backend engineer at Example SAS since 2020, Go and gRPC services.
+Mentored by Claire Dubois during the graduate programme.
+""",
+        pii=[
+            ("PERSON", "Lucas Martin"),
+            ("LOCATION", "Paris"),
+            ("LOCATION", "France"),
+            ("EMAIL_ADDRESS", "lucas.martin@example.fr"),
+            ("PHONE_NUMBER", "+33 1 4020 5050"),
+            ("PERSON", "Claire Dubois"),
+        ],
+    ),
+    AnonymizerSample(
+        text="""Emily Chen, PhD
+Machine Learning Engineer
+San Francisco, California
+emily.chen@example.com | 415-555-0132 | https://scholar.example.com/emilychen
+
+Research
+Published 12 papers on NLP and recommender systems, PyTorch and JAX.
+""",
+        pii=[
+            ("PERSON", "Emily Chen"),
+            ("LOCATION", "San Francisco"),
+            ("LOCATION", "California"),
+            ("EMAIL_ADDRESS", "emily.chen@example.com"),
+            ("PHONE_NUMBER", "415-555-0132"),
+            ("URL", "https://scholar.example.com/emilychen"),
+        ],
+    ),
+]
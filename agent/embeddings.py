@@ -0,0 +1,126 @@
+import re
+import zlib
+from functools import lru_cache
+from typing import List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from langchain_ollama import OllamaEmbeddings
+
+from agent.http_client import ollama_client_kwargs
+
+# keeps "c++", "c#" and "node.js" as one word
+WORD_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+CHAR_NGRAM_SIZES = (3, 4, 5)
+# char n-grams make "postgres" close to "postgresql", words and word pairs carry most of the meaning
+WORD_WEIGHT = 1.0
+BIGRAM_WEIGHT = 1.0
+CHAR_NGRAM_WEIGHT = 0.3
+
+
+class Embedder(Protocol):
+    # stored with a vector index, vectors of different embedders can not be compared
+    name: str
+
+    @property
+    def dim(self) -> int:
+        ...
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """One L2 normalized float32 row per text."""
+        ...
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+
+def _hash(feature: str) -> int:
+    # stable across processes, unlike hash(), so stored vectors stay valid
+    return zlib.crc32(feature.encode())
+
+
+@lru_cache(maxsize=100_000)
+def _word_features(word: str) -> Tuple[int, ...]:
+    padded = f" {word} "
+    return tuple(
+        _hash(padded[i : i + size]) for size in CHAR_NGRAM_SIZES for i in range(max(len(padded) - size + 1, 0))
+    )
+
+
+class HashingEmbedder:
+    """
+    Offline embeddings without a model: word, word pair and character n-gram counts hashed into
+    `dim` buckets, log scaled and L2 normalized. Good for near-synonyms and spelling variants,
+    not for meaning ("NoSQL" is not close to "MongoDB").
+    """
+
+    def __init__(self, dim: int = 2048):
+        self._dim = dim
+        self.name = f"hashing-{dim}"
+
+    @property
+    def dim(self) -> int:
+        return self._dim
+
+    def _features(self, text: str) -> Tuple[List[int], List[float]]:
+        words = [word.rstrip(".") for word in WORD_RE.findall(text.lower())]
+        indices: List[int] = []
+        weights: List[float] = []
+        for index, word in enumerate(words):
+            indices.append(_hash(word))
+            weights.append(WORD_WEIGHT)
+            if index:
+                indices.append(_hash(f"{words[index - 1]} {word}"))
+                weights.append(BIGRAM_WEIGHT)
+            char_ngrams = _word_features(word)
+            indices.extend(char_ngrams)
+            weights.extend([CHAR_NGRAM_WEIGHT] * len(char_ngrams))
+        return indices, weights
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self._dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            indices, weights = self._features(text)
+            if indices:
+                counts = np.bincount(np.array(indices) % self._dim, weights=weights, minlength=self._dim)
+                # a skill repeated ten times is not ten times more relevant
+                vectors[row] = np.log1p(counts)
+        return normalize_rows(vectors)
+
+
+class OllamaEmbedder:
+    """Embeddings from a local ollama model (eg: nomic-embed-text), no text leaves the machine."""
+
+    def __init__(self, model: str, base_url: str):
+        self.name = f"ollama/{model}"
+        self._embeddings = OllamaEmbeddings(model=model, base_url=base_url, **ollama_client_kwargs())
+        self._dim: Optional[int] = None
+
+    @property
+    def dim(self) -> int:
+        if self._dim is None:
+            self._dim = len(self._embeddings.embed_query("dimension probe"))
+        return self._dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return normalize_rows(np.array(self._embeddings.embed_documents(list(texts)), dtype=np.float32))
+
+
+# One embedder per Python process
+embedderInstance: Embedder | None = None
+
+
+def get_embedder() -> Embedder:
+    global embedderInstance
+    if embedderInstance is None:
+        if settings.AGENT_EMBEDDING_MODEL == "hashing":
+            embedderInstance = HashingEmbedder(settings.AGENT_EMBEDDING_DIM)
+        else:
+            if not settings.OLLAMA_BASE_URL:
+                raise RuntimeError("OLLAMA_BASE_URL not configured")
+            embedderInstance = OllamaEmbedder(settings.AGENT_EMBEDDING_MODEL, settings.OLLAMA_BASE_URL)
+    return embedderInstance
@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.messages.ai import UsageMetadata
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+HARD_SKILLS = [
+    "Python",
+    "Django",
+    "React",
+    "TypeScript",
+    "Docker",
+    "Kubernetes",
+    "PostgreSQL",
+    "Redis",
+    "AWS",
+    "Celery",
+    "GraphQL",
+    "Java",
+]
+SOFT_SKILLS = [
+    "Communication",
+    "Leadership",
+    "Teamwork",
+    "Problem Solving",
+    "Adaptability",
+    "Time Management",
+    "Mentoring",
+    "Ownership",
+]
+EXPERIENCE_LEVELS = ["Entry-Level", "Junior", "Mid-Level", "Senior", "Principal/Lead"]
+
+
+class FakeLLMError(RuntimeError):
+    pass
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Local stand-in for the LLM providers, to measure pipeline throughput without network calls.
+
+    Responses are deterministic for a given prompt and schema-valid for every prompt in
+    `agent.prompts.model_prompts` (the prompt template is recognized in the request).
+    Latency follows a log-normal distribution around `latency` seconds and calls fail with
+    probability `failure_rate`, both drawn from a generator seeded with `seed`.
+    """
+
+    model: str = "fake"
+    # agent name -> prompt template, usually PROMPTS of the workflow
+    prompts: Dict[str, str] = {}
+    # median latency in seconds and spread of the log-normal distribution
+    latency: float = 0.0
+    latency_sigma: float = 0.0
+    failure_rate: float = 0.0
+    seed: Optional[int] = None
+
+    _rng: random.Random = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model}
+
+    def sample_latency(self) -> float:
+        if self.latency <= 0:
+            return 0.0
+        return self._rng.lognormvariate(math.log(self.latency), self.latency_sigma)
+
+    def should_fail(self) -> bool:
+        return self._rng.random() < self.failure_rate
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.sample_latency())
+        return self._result(messages)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.sample_latency())
+        return self._result(messages)
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        if self.should_fail():
+            raise FakeLLMError("fake llm failure")
+        prompt = "\n".join(message.text for message in messages)
+        content = respond(prompt, self.prompts)
+        # roughly 4 characters per token, enough for token metrics to move
+        usage = UsageMetadata(
+            input_tokens=len(prompt) // 4,
+            output_tokens=len(content) // 4,
+            total_tokens=(len(prompt) + len(content)) // 4,
+        )
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content, usage_metadata=usage))])
+
+
+def detect_agent(prompt: str, prompts: Dict[str, str]) -> Optional[str]:
+    for agent, template in prompts.items():
+        # "pipeline_mode" sits next to the prompts, it is no template
+        if agent != "pipeline_mode" and template.strip() and template.strip() in prompt:
+            return agent
+    return None
+
+
+def _pick(options: List[str], prompt: str, salt: str, count: int) -> List[str]:
+    """Skills mentioned in the prompt, topped up with a prompt dependent (but stable) choice."""
+    found = [option for option in options if re.search(rf"\b{re.escape(option)}\b", prompt, re.IGNORECASE)]
+    digest = hashlib.sha256(f"{salt}:{prompt}".encode("utf-8")).digest()
+    for byte in digest:
+        if len(found) >= count:
+            break
+        option = options[byte % len(options)]
+        if option not in found:
+            found.append(option)
+    return found
+
+
+def _score(prompt: str, salt: str) -> int:
+    return 40 + hashlib.sha256(f"{salt}:{prompt}".encode("utf-8")).digest()[0] % 61
+
+
+def _identified_hard_skills(prompt: str) -> Dict[str, Any]:
+    return {
+        "extraction_reasoning": "Technologies listed in the job description.",
+        "found_hard_skills": _pick(HARD_SKILLS, prompt, "hard", 4),
+    }
+
+
+def _identified_soft_skills(prompt: str) -> Dict[str, Any]:
+    return {
+        "extraction_reasoning": "Behavioral traits mentioned in the job description.",
+        "found_soft_skills": _pick(SOFT_SKILLS, prompt, "soft", 3),
+    }
+
+
+def _hard_skill_analysis(prompt: str) -> Dict[str, Any]:
+    skills = _pick(HARD_SKILLS, prompt, "hard", 4)
+    return {
+        "found_hard_skills": skills[: len(skills) // 2 + 1],
+        "missing_hard_skills": skills[len(skills) // 2 + 1 :],
+        "match_score": _score(prompt, "hard"),
+        "summary": "Solid overlap with the required stack.",
+    }
+
+
+def _soft_skill_analysis(prompt: str) -> Dict[str, Any]:
+    skills = _pick(SOFT_SKILLS, prompt, "soft", 3)
+    return {
+        "found_soft_skills": skills[:2],
+        "missing_soft_skills": skills[2:],
+        "match_score": _score(prompt, "soft"),
+        "summary": "Some evidence of the required behavioral traits.",
+    }
+
+
+def _summary(prompt: str) -> Dict[str, Any]:
+    score = _score(prompt, "summary")
+    return {
+        "overall_match": score,
+        "experience_level": EXPERIENCE_LEVELS[score % len(EXPERIENCE_LEVELS)],
+        "strengths": ["Relevant technical background"],
+        "weaknesses": ["Limited evidence for some required skills"],
+        "recommendations": ["Add measurable outcomes to recent roles"],
+        "final_summary": "**Potential Fit**: the candidate covers most of the core requirements.",
+    }
+
+
+def _preprocess(prompt: str) -> str:
+    cv_text = prompt.split("CV Text:", 1)[-1]
+    lines = [line.strip() for line in cv_text.splitlines() if line.strip()]
+    return "\n".join(f"- {line}" for line in lines)
+
+
+def respond(prompt: str, prompts: Dict[str, str]) -> str:
+    agent = detect_agent(prompt, prompts)
+    if agent == "preprocess":
+        return _preprocess(prompt)
+
+    match agent:
+        case "hard_skill_identifier":
+            data = _identified_hard_skills(prompt)
+        case "soft_skill_identifier":
+            data = _identified_soft_skills(prompt)
+        case "skill_identifier":
+            data = {
+                "identified_hard_skills": _identified_hard_skills(prompt),
+                "identified_soft_skills": _identified_soft_skills(prompt),
+            }
+        case "hard_skill_analyzer":
+            data = _hard_skill_analysis(prompt)
+        case "soft_skill_analyzer":
+            data = _soft_skill_analysis(prompt)
+        case "skill_analyzer":
+            data = {
+                "hard_skill_analysis": _hard_skill_analysis(prompt),
+                "soft_skill_analysis": _soft_skill_analysis(prompt),
+            }
+        case "summary_generator":
+            data = _summary(prompt)
+        case _:
+            data = {}
+    # same markdown wrapping the real models tend to use
+    return f"```json\n{json.dumps(data, indent=2)}\n```"
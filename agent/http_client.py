@@ -0,0 +1,85 @@
+import importlib.util
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+import structlog
+from django.conf import settings
+
+logger = structlog.get_logger(__name__)
+
+
+def http2_enabled() -> bool:
+    # http2 needs the optional h2 package (httpx[http2])
+    if not settings.AGENT_HTTP2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("AGENT_HTTP2 is set but the h2 package is not installed, using http/1.1")
+        return False
+    return True
+
+
+def get_http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.AGENT_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.AGENT_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.AGENT_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_http_timeout() -> httpx.Timeout:
+    # connecting fails fast, generating a long response may take a while
+    return httpx.Timeout(settings.AGENT_HTTP_TIMEOUT, connect=settings.AGENT_HTTP_CONNECT_TIMEOUT)
+
+
+# One connection pool per Python process, shared by every LLM and embedding client.
+# Sockets must not be shared with a forked child (celery prefork), the child builds its own on first use.
+transportInstance: Optional[httpx.HTTPTransport] = None
+asyncTransportInstance: Optional[httpx.AsyncHTTPTransport] = None
+
+
+def get_http_transport() -> httpx.HTTPTransport:
+    global transportInstance
+    if transportInstance is None:
+        transportInstance = httpx.HTTPTransport(limits=get_http_limits(), http2=http2_enabled())
+    return transportInstance
+
+
+def get_async_http_transport() -> httpx.AsyncHTTPTransport:
+    # used from the single event loop of agent/runner.py
+    global asyncTransportInstance
+    if asyncTransportInstance is None:
+        asyncTransportInstance = httpx.AsyncHTTPTransport(limits=get_http_limits(), http2=http2_enabled())
+    return asyncTransportInstance
+
+
+def _forget_transports():
+    global transportInstance, asyncTransportInstance
+    transportInstance = None
+    asyncTransportInstance = None
+
+
+os.register_at_fork(after_in_child=_forget_transports)
+
+
+def ollama_client_kwargs() -> Dict[str, Any]:
+    """ChatOllama/OllamaEmbeddings kwargs making their httpx clients use the shared connection pool."""
+    return {
+        "client_kwargs": {"timeout": get_http_timeout()},
+        "sync_client_kwargs": {"transport": get_http_transport()},
+        "async_client_kwargs": {"transport": get_async_http_transport()},
+    }
+
+
+def gemini_client_kwargs() -> Dict[str, Any]:
+    """
+    ChatGoogleGenerativeAI kwargs for its httpx clients.
+
+    The google-genai SDK passes the same `client_args` to its sync and async clients, so they can not
+    share a transport. It builds them once per LLM instance (one per process), with these pool limits.
+    """
+    return {
+        "client_args": {"limits": get_http_limits(), "http2": http2_enabled()},
+        # per request total, the SDK sends no timeout at all otherwise
+        "timeout": settings.AGENT_HTTP_TIMEOUT,
+    }
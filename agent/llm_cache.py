@@ -0,0 +1,226 @@
+import asyncio
+import contextlib
+import contextvars
+import dataclasses
+import enum
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import structlog
+from django.conf import settings
+from django.core.cache import cache
+from opentelemetry import metrics
+
+logger = structlog.get_logger(__name__)
+meter = metrics.get_meter(__name__)
+
+KEY_PREFIX = "agent:llm"
+
+hit_counter = meter.create_counter(
+    "agent.llm_cache.hits",
+    description="LLM responses served from the cache",
+)
+miss_counter = meter.create_counter(
+    "agent.llm_cache.misses",
+    description="LLM calls that had to go to the provider",
+)
+
+
+class LLMCacheMode(enum.StrEnum):
+    # read from and write to the cache
+    USE = "use"
+    # skip reading but store the fresh response, eg: a user asked to rescan
+    REFRESH = "refresh"
+    # neither read nor write
+    BYPASS = "bypass"
+
+
+_cache_mode: contextvars.ContextVar[LLMCacheMode] = contextvars.ContextVar("llm_cache_mode", default=LLMCacheMode.USE)
+
+
+@contextlib.contextmanager
+def llm_cache_mode(mode: LLMCacheMode) -> Iterator[None]:
+    """
+    Change how LLM calls made inside the block use the cache.
+
+    Usage:
+        ```
+        with llm_cache_mode(LLMCacheMode.REFRESH):
+            steam_line_workflow.invoke(...)
+        ```
+    """
+    token = _cache_mode.set(mode)
+    try:
+        yield
+    finally:
+        _cache_mode.reset(token)
+
+
+# responses of the running node, written once the node accepted them, see `deferred_cache_writes`
+_pending_writes: contextvars.ContextVar[Optional[List[Tuple[str, str]]]] = contextvars.ContextVar(
+    "llm_cache_pending_writes", default=None
+)
+
+
+@contextlib.contextmanager
+def deferred_cache_writes() -> Iterator[None]:
+    """
+    Responses stored inside the block are only cached when the block exits without an error.
+
+    A response the node could not parse is asked for again on the next attempt instead of being
+    served from the cache on every retry, see also `discard_cache_writes`.
+    """
+    pending: List[Tuple[str, str]] = []
+    token = _pending_writes.set(pending)
+    try:
+        yield
+    finally:
+        _pending_writes.reset(token)
+    _write_pending(pending)
+
+
+@contextlib.asynccontextmanager
+async def adeferred_cache_writes() -> AsyncIterator[None]:
+    """Like `deferred_cache_writes`, the accepted responses are written to redis off the event loop."""
+    pending: List[Tuple[str, str]] = []
+    token = _pending_writes.set(pending)
+    try:
+        yield
+    finally:
+        _pending_writes.reset(token)
+    if pending:
+        await asyncio.to_thread(_write_pending, pending)
+
+
+def _write_pending(pending: List[Tuple[str, str]]):
+    for key, value in pending:
+        llm_cache.set(key, value)
+
+
+def discard_cache_writes():
+    """Drop the responses stored so far in the `deferred_cache_writes` block, eg: output that stayed invalid."""
+    pending = _pending_writes.get()
+    if pending is not None:
+        pending.clear()
+
+
+def make_cache_key(llm_name: str, model_name: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    payload = json.dumps(
+        {"llm": llm_name, "model": model_name, "prompt": prompt, "params": params or {}},
+        sort_keys=True,
+        default=str,
+    )
+    return f"{KEY_PREFIX}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+@dataclasses.dataclass
+class LLMCacheStats:
+    local_hits: int = 0
+    shared_hits: int = 0
+    misses: int = 0
+
+
+class LLMResponseCache:
+    """
+    Content addressed cache of LLM responses.
+
+    Two tiers: a small in-process LRU in front of the django cache (redis when `REDIS_URL`
+    is set), so repeated prompts within a worker do not even pay a redis round trip.
+    Entries expire after `AGENT_LLM_CACHE_TTL` seconds in redis, the local tier is capped
+    at `AGENT_LLM_CACHE_LOCAL_MAX_ENTRIES` and responses above `AGENT_LLM_CACHE_MAX_RESPONSE_BYTES`
+    are never cached.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local: OrderedDict[str, str] = OrderedDict()
+        self.stats = LLMCacheStats()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.AGENT_LLM_CACHE_ENABLED
+
+    def _readable(self) -> bool:
+        return self.enabled and _cache_mode.get() == LLMCacheMode.USE
+
+    def _get_local(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._local.get(key)
+            if value is not None:
+                self._local.move_to_end(key)
+                self.stats.local_hits += 1
+        if value is not None:
+            hit_counter.add(1, {"tier": "local"})
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        if not self._readable():
+            return None
+        value = self._get_local(key)
+        if value is not None:
+            return value
+        return self._shared_result(key, cache.get(key))
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Like `get`, the redis round trip runs off the event loop."""
+        if not self._readable():
+            return None
+        value = self._get_local(key)
+        if value is not None:
+            return value
+        return self._shared_result(key, await asyncio.to_thread(cache.get, key))
+
+    def _shared_result(self, key: str, value: Optional[str]) -> Optional[str]:
+        if value is not None:
+            self._set_local(key, value)
+            self.stats.shared_hits += 1
+            hit_counter.add(1, {"tier": "shared"})
+            return value
+
+        self.stats.misses += 1
+        miss_counter.add(1)
+        return None
+
+    def _skip_write(self, key: str, value: str) -> bool:
+        """True when the response is not written now: it is not cacheable, or left to `deferred_cache_writes`."""
+        if not self.enabled or _cache_mode.get() == LLMCacheMode.BYPASS:
+            return True
+        if not value or len(value.encode("utf-8")) > settings.AGENT_LLM_CACHE_MAX_RESPONSE_BYTES:
+            return True
+        pending = _pending_writes.get()
+        if pending is not None:
+            pending.append((key, value))
+            return True
+        return False
+
+    def _store(self, key: str, value: str):
+        cache.set(key, value, timeout=settings.AGENT_LLM_CACHE_TTL)
+        self._set_local(key, value)
+
+    def set(self, key: str, value: str):
+        if not self._skip_write(key, value):
+            self._store(key, value)
+
+    async def aset(self, key: str, value: str):
+        """Like `set`, the redis round trip runs off the event loop."""
+        if not self._skip_write(key, value):
+            await asyncio.to_thread(self._store, key, value)
+
+    def _set_local(self, key: str, value: str):
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > settings.AGENT_LLM_CACHE_LOCAL_MAX_ENTRIES:
+                self._local.popitem(last=False)
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+            self.stats = LLMCacheStats()
+
+
+# One front tier per Python process, the shared tier lives in redis
+llm_cache = LLMResponseCache()
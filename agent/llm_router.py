@@ -0,0 +1,366 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import dataclasses
+import threading
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+import numpy as np
+import structlog
+from opentelemetry import trace
+
+from agent.rate_limit import RateLimitExceeded
+from agent.telemetry import record_provider_call
+
+logger = structlog.get_logger(__name__)
+
+T = TypeVar("T")
+
+# successful calls needed before a provider's latency percentile is trusted for hedging
+MIN_HEDGE_SAMPLES = 20
+# weight of the latest call in a provider's success rate
+HEALTH_ALPHA = 0.2
+# providers with a lower success rate are tried after the healthy ones
+HEALTHY_SUCCESS_RATE = 0.5
+# sync hedged calls run here, so the first one can be waited for with a timeout
+HEDGE_WORKERS = 32
+
+
+@dataclasses.dataclass(frozen=True)
+class Provider:
+    """A langchain adapter (see AGENT_LLM_NAME) and one of its models."""
+
+    llm_name: str
+    model: str
+    # the workflow's own model (LLM_NAME/MODEL_NAME), its prompts are used for every provider of unrouted nodes
+    primary: bool = False
+    # generation params passed to the adapter (eg: temperature), see agent/model_routing.py
+    params: Tuple[Tuple[str, Any], ...] = ()
+
+    @property
+    def name(self) -> str:
+        return f"{self.llm_name}:{self.model}"
+
+    @property
+    def model_id(self) -> str:
+        return f"fake/{self.model}" if self.llm_name == "FakeChatModel" else self.model
+
+    @classmethod
+    def parse(cls, value: str) -> "Provider":
+        # model names may contain ":" themselves, eg: ChatOllama:qwen2.5:7b
+        llm_name, _, model = value.partition(":")
+        if not llm_name or not model:
+            raise ValueError(f"invalid LLM provider {value!r}, expected <adapter>:<model>")
+        return cls(llm_name=llm_name, model=model)
+
+
+class ProvidersUnavailable(RateLimitExceeded):
+    """Every provider's circuit is open, raised as a rate limit so scan tasks retry once one reopens."""
+
+
+class CircuitOpen(Exception):
+    """The provider was skipped, another call is already probing it."""
+
+
+class CircuitBreaker:
+    """
+    Stops sending calls to a provider after `failure_threshold` failures in a row.
+
+    After `cooldown` seconds a single probe call is let through (half open), its outcome
+    closes the circuit again or keeps it open for another cooldown.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.probing or self.retry_after() == 0 else "open"
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(self.opened_at + self.cooldown - self._clock(), 0.0)
+
+    def available(self) -> bool:
+        return self.opened_at is None or (not self.probing and self.retry_after() == 0)
+
+    def allow(self) -> bool:
+        """Like `available` but claims the probe of a half open circuit."""
+        if not self.available():
+            return False
+        if self.opened_at is not None:
+            self.probing = True
+        return True
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.failure_threshold:
+            self.opened_at = self._clock()
+        self.probing = False
+
+
+@dataclasses.dataclass
+class ProviderHealth:
+    # exponentially weighted, new providers start out healthy
+    success_rate: float = 1.0
+    latencies: Deque[float] = dataclasses.field(default_factory=lambda: collections.deque(maxlen=200))
+
+    def record(self, ok: bool, duration: float):
+        self.success_rate += HEALTH_ALPHA * ((1.0 if ok else 0.0) - self.success_rate)
+        if ok:
+            self.latencies.append(duration)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        if len(self.latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        return float(np.percentile(self.latencies, percentile))
+
+
+class _Step(NamedTuple):
+    provider: Provider
+    # sent the same call when `provider` is slower than `hedge_delay`
+    hedge: Optional[Provider]
+    hedge_delay: float
+    # no provider left to fail over to after this step
+    last: bool
+
+
+class LLMRouter:
+    """
+    Sends each LLM call to the first usable provider of an ordered pool and fails over to the next one.
+
+    Providers are tried in the configured order, skipping those whose circuit is open and moving those
+    with a poor recent success rate to the back. With `hedge_percentile` set, a call still running after
+    that percentile of the provider's usual latency is also sent to the next provider and the first
+    answer wins. Rate limit waits (`RateLimitExceeded`) fail over without counting against the provider.
+    """
+
+    def __init__(
+        self,
+        providers: Sequence[Provider],
+        failure_threshold: int,
+        cooldown: float,
+        hedge_percentile: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not providers:
+            raise ValueError("LLMRouter needs at least one provider")
+        self.providers = list(providers)
+        self.hedge_percentile = hedge_percentile
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.breakers = {p.name: CircuitBreaker(failure_threshold, cooldown, clock) for p in self.providers}
+        self.health = {p.name: ProviderHealth() for p in self.providers}
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    def candidates(self) -> List[Provider]:
+        """Providers to try, in order."""
+        with self._lock:
+            available = [p for p in self.providers if self.breakers[p.name].available()]
+            # sort is stable, healthy providers keep the configured order
+            return sorted(available, key=lambda p: self.health[p.name].success_rate < HEALTHY_SUCCESS_RATE)
+
+    def hedge_delay(self, provider: Provider) -> Optional[float]:
+        if not self.hedge_percentile:
+            return None
+        with self._lock:
+            return self.health[provider.name].latency_percentile(self.hedge_percentile)
+
+    def _unavailable(self) -> ProvidersUnavailable:
+        with self._lock:
+            retry_after = min(breaker.retry_after() for breaker in self.breakers.values())
+        return ProvidersUnavailable("llm providers", retry_after)
+
+    def _claim(self, provider: Provider):
+        with self._lock:
+            if not self.breakers[provider.name].allow():
+                raise CircuitOpen(provider.name)
+
+    def _record(self, provider: Provider, started: float, error: Optional[BaseException] = None):
+        duration = self._clock() - started
+        with self._lock:
+            breaker = self.breakers[provider.name]
+            if isinstance(error, (RateLimitExceeded, asyncio.CancelledError)):
+                # our own rate limit budget or a lost hedge, says nothing about the provider
+                outcome = "rate_limited" if isinstance(error, RateLimitExceeded) else "cancelled"
+                breaker.probing = False
+            elif error is None:
+                outcome = "success"
+                breaker.success()
+                self.health[provider.name].record(True, duration)
+            else:
+                outcome = "failure"
+                breaker.failure()
+                self.health[provider.name].record(False, duration)
+            opened = outcome == "failure" and breaker.state == "open"
+        if opened:
+            logger.warning("llm provider circuit opened", provider=provider.name, cooldown=breaker.cooldown)
+        record_provider_call(provider.name, outcome, duration)
+
+    def _attempt(self, call: Callable[[Provider, bool], T], provider: Provider, last: bool) -> T:
+        self._claim(provider)
+        started = self._clock()
+        try:
+            result = call(provider, last)
+        except Exception as e:
+            self._record(provider, started, e)
+            raise
+        self._record(provider, started)
+        return result
+
+    async def _aattempt(self, call: Callable[[Provider, bool], Awaitable[T]], provider: Provider, last: bool) -> T:
+        self._claim(provider)
+        started = self._clock()
+        try:
+            result = await call(provider, last)
+        except BaseException as e:
+            self._record(provider, started, e)
+            raise
+        self._record(provider, started)
+        return result
+
+    def _hedged(
+        self, call: Callable[[Provider, bool], T], first: Provider, second: Provider, last: bool, delay: float
+    ) -> Tuple[T, Provider]:
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+        futures = [
+            # node spans and the output schema are in contextvars, see agent/telemetry.py and agent/output_schemas.py
+            self._executor.submit(contextvars.copy_context().run, self._attempt, call, first, False)
+        ]
+        done, _ = concurrent.futures.wait(futures, timeout=delay)
+        if not done:
+            trace.get_current_span().set_attribute("llm.hedged", True)
+        if not done or futures[0].exception() is not None:
+            futures.append(self._executor.submit(contextvars.copy_context().run, self._attempt, call, second, last))
+        error: Optional[Exception] = None
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                # the slower call can not be interrupted, it still finishes in the background
+                return future.result(), (first if future is futures[0] else second)
+            except Exception as e:
+                error = e
+        assert error is not None
+        raise error
+
+    async def _ahedged(
+        self,
+        call: Callable[[Provider, bool], Awaitable[T]],
+        first: Provider,
+        second: Provider,
+        last: bool,
+        delay: float,
+    ) -> Tuple[T, Provider]:
+        tasks = {asyncio.ensure_future(self._aattempt(call, first, False)): first}
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            trace.get_current_span().set_attribute("llm.hedged", True)
+        if not done or next(iter(done)).exception() is not None:
+            tasks[asyncio.ensure_future(self._aattempt(call, second, last))] = second
+        error: Optional[BaseException] = None
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result(), tasks[task]
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        assert error is not None
+        raise error
+
+    def _plan(self, hedge: bool) -> List[_Step]:
+        candidates = self.candidates()
+        if not candidates:
+            raise self._unavailable()
+        steps = []
+        i = 0
+        while i < len(candidates):
+            delay = self.hedge_delay(candidates[i]) if hedge and i + 1 < len(candidates) else None
+            if delay is None:
+                steps.append(_Step(candidates[i], None, 0.0, i == len(candidates) - 1))
+                i += 1
+            else:
+                steps.append(_Step(candidates[i], candidates[i + 1], delay, i + 1 == len(candidates) - 1))
+                i += 2
+        return steps
+
+    def _failed(self, provider: Provider, error: BaseException, last: bool):
+        if not isinstance(error, CircuitOpen):
+            logger.warning("llm provider call failed", provider=provider.name, error=repr(error), failover=not last)
+
+    def call(self, call: Callable[[Provider, bool], T], hedge: bool = True) -> T:
+        """
+        `call(provider, last)` with the first provider that answers. `last` tells the call no provider is
+        left to fail over to, so it may wait out a provider's retry-after instead of failing.
+        """
+        span = trace.get_current_span()
+        error: Optional[BaseException] = None
+        for failovers, (provider, second, delay, last) in enumerate(self._plan(hedge)):
+            try:
+                if second is None:
+                    result = self._attempt(call, provider, last)
+                else:
+                    result, provider = self._hedged(call, provider, second, last, delay)
+            except Exception as e:
+                self._failed(provider, e, last)
+                error = e
+                continue
+            span.set_attribute("llm.provider", provider.name)
+            span.set_attribute("llm.failovers", failovers)
+            return result
+        if isinstance(error, CircuitOpen):
+            raise self._unavailable()
+        assert error is not None
+        raise error
+
+    async def acall(self, call: Callable[[Provider, bool], Awaitable[T]], hedge: bool = True) -> T:
+        """Same as `call` for coroutines, the losing call of a hedge is cancelled."""
+        span = trace.get_current_span()
+        error: Optional[BaseException] = None
+        for failovers, (provider, second, delay, last) in enumerate(self._plan(hedge)):
+            try:
+                if second is None:
+                    result = await self._aattempt(call, provider, last)
+                else:
+                    result, provider = await self._ahedged(call, provider, second, last, delay)
+            except Exception as e:
+                self._failed(provider, e, last)
+                error = e
+                continue
+            span.set_attribute("llm.provider", provider.name)
+            span.set_attribute("llm.failovers", failovers)
+            return result
+        if isinstance(error, CircuitOpen):
+            raise self._unavailable()
+        assert error is not None
+        raise error
@@ -0,0 +1,121 @@
+import contextlib
+import contextvars
+import dataclasses
+import urllib.parse
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from django.conf import settings
+
+from agent.llm_router import Provider
+from agent.prompts import ModelPrompts
+
+
+def _param_value(value: str) -> Any:
+    for kind in (int, float):
+        try:
+            return kind(value)
+        except ValueError:
+            pass
+    return {"true": True, "false": False}.get(value.lower(), value)
+
+
+@dataclasses.dataclass(frozen=True)
+class NodeRoute:
+    """Provider, model and generation params (eg: temperature) a workflow node is sent to."""
+
+    llm_name: str
+    model: str
+    params: Tuple[Tuple[str, Any], ...] = ()
+
+    @property
+    def provider(self) -> Provider:
+        return Provider(llm_name=self.llm_name, model=self.model, params=self.params)
+
+    @classmethod
+    def parse(cls, value: str) -> "NodeRoute":
+        """`<adapter>:<model>[?<param>=<value>&...]`, eg: ChatOllama:qwen2.5:7b?temperature=0&num_ctx=8192"""
+        provider, _, query = value.partition("?")
+        parsed = Provider.parse(provider)
+        params = tuple((key, _param_value(param)) for key, param in urllib.parse.parse_qsl(query))
+        return cls(llm_name=parsed.llm_name, model=parsed.model, params=params)
+
+
+@dataclasses.dataclass(frozen=True)
+class RouteRule:
+    agent: str
+    route: NodeRoute
+    # only for CVs of at least this many tokens
+    min_cv_tokens: int = 0
+
+
+def parse_node_routes(raw: Mapping[str, str]) -> List[RouteRule]:
+    """
+    AGENT_NODE_MODELS entries: `<agent>[@<min cv tokens>]` -> `<adapter>:<model>[?<params>]`.
+
+    eg: {"summary_generator_agent@6000": "ChatGoogleGenerativeAI:gemini-2.5-flash"} sends the summary of
+    CVs from 6000 tokens on to gemini-2.5-flash, shorter CVs keep the node's route without a threshold.
+    """
+    rules = []
+    for key, value in raw.items():
+        agent, _, min_cv_tokens = key.partition("@")
+        rules.append(RouteRule(agent=agent, route=NodeRoute.parse(value), min_cv_tokens=int(min_cv_tokens or 0)))
+    return rules
+
+
+class ModelRoutingTable:
+    """Which model each workflow node runs on, nodes without a rule use the workflow's MODEL_NAME."""
+
+    def __init__(self, rules: List[RouteRule]):
+        self.rules: Dict[str, List[RouteRule]] = {}
+        for rule in sorted(rules, key=lambda rule: -rule.min_cv_tokens):
+            self.rules.setdefault(rule.agent, []).append(rule)
+
+    def route(self, agent: str, cv_tokens: int = 0) -> Optional[NodeRoute]:
+        # the rule with the highest threshold the CV reaches
+        for rule in self.rules.get(agent, []):
+            if cv_tokens >= rule.min_cv_tokens:
+                return rule.route
+        return None
+
+    def validate(self, model_prompts: ModelPrompts, prompt_keys: Mapping[str, str]):
+        """
+        Every routed node must be a known agent and its model must have its own prompt for the node,
+        a model without a prompt set would silently get the prompts written for another model.
+        """
+        for agent, rules in self.rules.items():
+            if agent not in prompt_keys:
+                raise ValueError(f"AGENT_NODE_MODELS: unknown agent {agent!r}, expected one of {sorted(prompt_keys)}")
+            for rule in rules:
+                prompts = model_prompts.get(rule.route.model)
+                if prompts is None or prompt_keys[agent] not in prompts:
+                    raise ValueError(
+                        f"AGENT_NODE_MODELS: {rule.route.model!r} has no {prompt_keys[agent]!r} prompt in model_prompts"
+                    )
+
+
+_node_route: contextvars.ContextVar[Optional[NodeRoute]] = contextvars.ContextVar("llm_node_route", default=None)
+
+
+@contextlib.contextmanager
+def routed_to(route: Optional[NodeRoute]) -> Iterator[None]:
+    """LLM calls made inside the block go to `route` (None: the workflow's own model)."""
+    token = _node_route.set(route)
+    try:
+        yield
+    finally:
+        _node_route.reset(token)
+
+
+def get_node_route() -> Optional[NodeRoute]:
+    return _node_route.get()
+
+
+# One routing table per Python process
+routingTableInstance: Optional[ModelRoutingTable] = None
+
+
+def get_routing_table() -> ModelRoutingTable:
+    global routingTableInstance
+    if routingTableInstance is None:
+        routingTableInstance = ModelRoutingTable(parse_node_routes(settings.AGENT_NODE_MODELS))
+    return routingTableInstance
@@ -0,0 +1,137 @@
+import contextlib
+import contextvars
+import json
+from typing import Annotated, Any, Dict, Iterator, List, Optional, Type
+
+from langchain_core.language_models import BaseChatModel
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_ollama import ChatOllama
+from pydantic import BaseModel, BeforeValidator, Field, ValidationError
+
+from agent.parseJsonMarkdown import parse_markdown_json
+
+
+def _round_float(value: Any) -> Any:
+    # 85.5 is as good as 85
+    return round(value) if isinstance(value, float) else value
+
+
+Percentage = Annotated[int, BeforeValidator(_round_float), Field(ge=0, le=100)]
+
+
+class HardSkillIdentification(BaseModel):
+    # the small local model prompts do not ask for the reasoning
+    extraction_reasoning: str = ""
+    found_hard_skills: List[str]
+
+
+class SoftSkillIdentification(BaseModel):
+    extraction_reasoning: str = ""
+    found_soft_skills: List[str]
+
+
+class HardSkillAnalysis(BaseModel):
+    found_hard_skills: List[str]
+    missing_hard_skills: List[str]
+    match_score: Percentage
+    summary: str
+
+
+class SoftSkillAnalysis(BaseModel):
+    found_soft_skills: List[str]
+    missing_soft_skills: List[str]
+    match_score: Percentage
+    summary: str
+
+
+class ScanSummary(BaseModel):
+    overall_match: Percentage
+    experience_level: Optional[str] = None
+    strengths: List[str]
+    weaknesses: List[str]
+    recommendations: List[str]
+    final_summary: str
+
+
+class SkillIdentification(BaseModel):
+    identified_hard_skills: HardSkillIdentification
+    identified_soft_skills: SoftSkillIdentification
+
+
+class SkillAnalysis(BaseModel):
+    hard_skill_analysis: HardSkillAnalysis
+    soft_skill_analysis: SoftSkillAnalysis
+
+
+# agent -> shape of its json response, the same for every model's prompts (see agent/prompts.py)
+OUTPUT_SCHEMAS: Dict[str, Type[BaseModel]] = {
+    "hard_skill_identifier_agent": HardSkillIdentification,
+    "soft_skill_identifier_agent": SoftSkillIdentification,
+    "hard_skill_analyzer_agent": HardSkillAnalysis,
+    "soft_skill_analyzer_agent": SoftSkillAnalysis,
+    "summary_generator_agent": ScanSummary,
+    "skill_identifier_agent": SkillIdentification,
+    "skill_analyzer_agent": SkillAnalysis,
+}
+
+
+class OutputValidationError(ValueError):
+    pass
+
+
+def validate_output(schema: Type[BaseModel], response: str) -> str:
+    """The json in `response` checked against `schema` and re-serialized with missing optional fields filled in."""
+    try:
+        data = json.loads(parse_markdown_json(response))
+        return json.dumps(schema.model_validate(data).model_dump())
+    except json.JSONDecodeError as e:
+        raise OutputValidationError(f"response is not valid JSON: {e}") from e
+    except ValidationError as e:
+        errors = "; ".join(f"{'.'.join(map(str, error['loc'])) or 'root'}: {error['msg']}" for error in e.errors())
+        raise OutputValidationError(f"response does not match the schema: {errors}") from e
+
+
+def repair_prompt(prompt: str, response: str, error: OutputValidationError, schema: Type[BaseModel]) -> str:
+    """Ask again with the rejected response and what is wrong with it, the original task stays the same."""
+    return f"""
+    {prompt}
+
+    Your previous response could not be used:
+    {response}
+
+    Problem:
+    {error}
+
+    Return **only** valid JSON matching this JSON schema:
+    {json.dumps(schema.model_json_schema())}
+    """
+
+
+def structured_output_kwargs(llm: BaseChatModel, schema: Optional[Type[BaseModel]]) -> Dict[str, Any]:
+    """Invoke kwargs making the provider itself constrain the response to `schema`, when it supports it."""
+    if schema is None:
+        return {}
+    if isinstance(llm, ChatGoogleGenerativeAI):
+        return {"response_mime_type": "application/json", "response_json_schema": schema.model_json_schema()}
+    if isinstance(llm, ChatOllama):
+        return {"format": schema.model_json_schema()}
+    return {}
+
+
+_output_schema: contextvars.ContextVar[Optional[Type[BaseModel]]] = contextvars.ContextVar(
+    "llm_output_schema", default=None
+)
+
+
+@contextlib.contextmanager
+def structured_output(schema: Optional[Type[BaseModel]]) -> Iterator[None]:
+    """LLM calls made inside the block ask the provider for json matching `schema`, see `structured_output_kwargs`."""
+    token = _output_schema.set(schema)
+    try:
+        yield
+    finally:
+        _output_schema.reset(token)
+
+
+def get_output_schema() -> Optional[Type[BaseModel]]:
+    return _output_schema.get()
@@ -14,13 +14,17 @@ res = """
 
 
 def parse_markdown_json(response: str):
-    pattern = r"```json(.*?)```"
-    match = re.search(pattern, response, re.DOTALL)  # re.DOTALL allows newlines to be matched
+    # ```json blocks, also bare ``` blocks some models use
+    pattern = r"```(?:json)?\s*\n(.*?)```"
+    match = re.search(pattern, response, re.DOTALL | re.IGNORECASE)  # re.DOTALL allows newlines to be matched
     if match:
         json_string = match.group(1).strip()  # remove extra whitespace/newlines
         return json_string
-    else:
-        return response
+    # an object with a sentence before or after it
+    start, end = response.find("{"), response.rfind("}")
+    if 0 <= start < end and (start > 0 or end < len(response) - 1):
+        return response[start : end + 1]
+    return response
 
 
 # parse_markdown_json(res)
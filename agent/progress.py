@@ -0,0 +1,236 @@
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import redis
+import redis.asyncio
+import structlog
+from django.conf import settings
+
+logger = structlog.get_logger(__name__)
+
+KEY_PREFIX = "agent:scan"
+
+# Scan whose workflow is running in the current context, set by analyze_cv_task
+_scan_id: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("progress_scan_id", default=None)
+
+
+def channel_name(scan_id: int) -> str:
+    return f"{KEY_PREFIX}:{scan_id}:progress"
+
+
+class InMemorySubscription:
+    def __init__(self, broker: "InMemoryBroker", channel: str):
+        self._broker = broker
+        self.channel = channel
+        self.queue: queue.Queue[str] = queue.Queue()
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(self.queue.get(timeout=timeout))
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+    async def aget(self, timeout: float) -> Optional[Dict[str, Any]]:
+        # without redis (development) the wait runs on a thread of the default executor
+        return await asyncio.to_thread(self.get, timeout)
+
+    async def aclose(self):
+        self.close()
+
+
+class InMemoryBroker:
+    """Pub/sub inside one process, used when redis is not configured (eg: eager celery in development)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[str, List[InMemorySubscription]] = {}
+
+    def publish(self, channel: str, message: str):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, []))
+        for subscription in subscriptions:
+            subscription.queue.put(message)
+
+    def subscribe(self, channel: str) -> InMemorySubscription:
+        subscription = InMemorySubscription(self, channel)
+        with self._lock:
+            self._subscriptions.setdefault(channel, []).append(subscription)
+        return subscription
+
+    async def asubscribe(self, channel: str) -> InMemorySubscription:
+        return self.subscribe(channel)
+
+    def unsubscribe(self, subscription: InMemorySubscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel, [])
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.channel, None)
+
+
+class RedisSubscription:
+    def __init__(self, client: redis.Redis, channel: str):
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(channel)
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        message = self._pubsub.get_message(timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message["data"])
+
+    def close(self):
+        self._pubsub.close()
+
+
+class AsyncRedisSubscription:
+    """Subscription of the async progress stream view, waits on the event loop instead of holding a thread."""
+
+    def __init__(self, url: str, channel: str):
+        # a client of its own, redis.asyncio connections belong to the event loop they were opened on
+        self._client = redis.asyncio.from_url(url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self.channel = channel
+
+    async def aget(self, timeout: float) -> Optional[Dict[str, Any]]:
+        message = await self._pubsub.get_message(timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message["data"])
+
+    async def aclose(self):
+        await self._pubsub.aclose()
+        await self._client.aclose()
+
+
+class RedisBroker:
+    def __init__(self, client: redis.Redis, url: str):
+        self._client = client
+        self._url = url
+
+    def publish(self, channel: str, message: str):
+        self._client.publish(channel, message)
+
+    def subscribe(self, channel: str) -> RedisSubscription:
+        return RedisSubscription(self._client, channel)
+
+    async def asubscribe(self, channel: str) -> AsyncRedisSubscription:
+        subscription = AsyncRedisSubscription(self._url, channel)
+        await subscription._pubsub.subscribe(channel)
+        return subscription
+
+
+# One broker per Python process, workers publish and the web tier subscribes through redis
+progressBrokerInstance: InMemoryBroker | RedisBroker | None = None
+
+
+def get_progress_broker() -> InMemoryBroker | RedisBroker:
+    global progressBrokerInstance
+    if progressBrokerInstance is None:
+        if settings.REDIS_URL:
+            progressBrokerInstance = RedisBroker(redis.from_url(settings.REDIS_URL), settings.REDIS_URL)
+        else:
+            progressBrokerInstance = InMemoryBroker()
+    return progressBrokerInstance
+
+
+@contextlib.contextmanager
+def scan_progress(scan_id: int) -> Iterator[None]:
+    """
+    Publish progress of workflow nodes run inside the block to the scan's channel.
+
+    Usage:
+        ```
+        with scan_progress(cv_scan.id):
+            steam_line_workflow.invoke(...)
+        ```
+    """
+    token = _scan_id.set(scan_id)
+    try:
+        yield
+    finally:
+        _scan_id.reset(token)
+
+
+def get_scan_id() -> Optional[int]:
+    """Scan running in the current context, None outside `scan_progress`."""
+    return _scan_id.get()
+
+
+def publish_event(scan_id: int, event: str, **data: Any):
+    """Best effort, a subscriber missing an update must never fail the scan."""
+    try:
+        get_progress_broker().publish(channel_name(scan_id), json.dumps({"event": event, **data}))
+    except Exception:
+        logger.warning("could not publish scan progress", scan_id=scan_id, progress_event=event, exc_info=True)
+
+
+# One publisher thread per Python process, events of the async workflow keep their order on it
+progressPublisherInstance: ThreadPoolExecutor | None = None
+
+
+def get_progress_publisher() -> ThreadPoolExecutor:
+    global progressPublisherInstance
+    if progressPublisherInstance is None:
+        progressPublisherInstance = ThreadPoolExecutor(max_workers=1, thread_name_prefix="progress-publisher")
+    return progressPublisherInstance
+
+
+def _forget_publisher():
+    global progressPublisherInstance
+    progressPublisherInstance = None
+
+
+os.register_at_fork(after_in_child=_forget_publisher)
+
+
+def _submit_event(scan_id: int, event: str, **data: Any) -> Future:
+    return get_progress_publisher().submit(publish_event, scan_id, event, **data)
+
+
+def publish_progress(event: str, **data: Any):
+    """
+    Publish an event for the scan running in the current context, no-op outside `scan_progress`.
+
+    On an event loop (agent/runner.py) the redis round trip is handed to the publisher thread
+    so the other nodes sharing the loop keep running, see also `apublish_progress`.
+    """
+    scan_id = _scan_id.get()
+    if scan_id is None:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        publish_event(scan_id, event, **data)
+    else:
+        _submit_event(scan_id, event, **data)
+
+
+async def apublish_progress(event: str, **data: Any):
+    """Like `publish_progress`, but returns once the event (and the ones queued before it) went out."""
+    scan_id = _scan_id.get()
+    if scan_id is not None:
+        await asyncio.wrap_future(_submit_event(scan_id, event, **data))
+
+
+def get_token_publisher() -> Optional[Callable[[str], None]]:
+    """Callback publishing streamed LLM tokens for the current scan, None when nobody could be listening."""
+    if _scan_id.get() is None or not settings.AGENT_PROGRESS_STREAM_TOKENS:
+        return None
+
+    def publish_token(text: str):
+        if text:
+            publish_progress("token", text=text)
+
+    return publish_token
@@ -1,21 +1,84 @@
-from typing import Dict, TypedDict
+from typing import Dict, Literal, NotRequired, Tuple, TypedDict, get_args
+
+# "split": one LLM call per skill type (hard/soft identifier, hard/soft analyzer), the default
+# "fused": hard and soft skills are identified in one call and analyzed in one call,
+#          fewer round trips and the preprocessed CV is only sent once.
+#          Outputs are split back into the same JSON shapes as the split mode.
+#          Only for models with fused prompts (small local models follow the simpler
+#          single purpose prompts better and have none).
+PipelineMode = Literal["split", "fused"]
+PIPELINE_MODES: Tuple[PipelineMode, ...] = get_args(PipelineMode)
 
 
 class AgentPrompts(TypedDict):
+    # pipeline mode the model runs, "split" when missing, AGENT_PIPELINE_MODE overrides it
+    pipeline_mode: NotRequired[PipelineMode]
     preprocess: str
     hard_skill_identifier: str
     soft_skill_identifier: str
     hard_skill_analyzer: str
     soft_skill_analyzer: str
     summary_generator: str
+    # hard + soft in a single call, only needed for models using the "fused" pipeline mode
+    skill_identifier: NotRequired[str]
+    skill_analyzer: NotRequired[str]
 
 
 ModelPrompts = Dict[str, AgentPrompts]
 
 DEFAULT_MODEL = "hhao/qwen2.5-coder-tools:0.5b"
 
+# fused prompts, shared by every model using the "fused" pipeline mode
+FUSED_SKILL_IDENTIFIER_PROMPT = """You are a Technical Sourcing Specialist and HR Specialist. Analyze the provided Job Description (JD) to extract the required hard (technical) skills and soft (interpersonal/behavioral) skills.
+
+Instructions:
+1. **Hard Skills:** Extract programming languages, frameworks, tools, platforms, certifications, and technical methodologies. Standardize names (e.g., convert "React.js" or "ReactJS" to "React"; "AWS EC2" to "AWS"). Focus on skills listed in "Requirements" or "Tech Stack" sections.
+2. **Soft Skills:** Extract traits related to communication, leadership, work ethic, adaptability, and emotional intelligence. Distinguish between a skill (e.g., "Communication") and a basic duty (e.g., "Attend meetings"). Only extract the skill.
+3. **Separate:** Never list a technical tool as a soft skill or a behavioral trait as a hard skill. Exclude general responsibilities.
+
+Return **only** valid JSON with this schema (use double quotes):
+{
+    "identified_hard_skills": {
+        "extraction_reasoning": "Brief explanation of how you identified these skills (e.g., 'Noticed backend focus, consolidated AWS tools').",
+        "found_hard_skills": ["Skill1", "Skill2", "Skill3"]
+    },
+    "identified_soft_skills": {
+        "extraction_reasoning": "Brief explanation of the behavioral traits targeted in the JD.",
+        "found_soft_skills": ["Skill1", "Skill2", "Skill3"]
+    }
+}"""
+
+FUSED_SKILL_ANALYZER_PROMPT = """You are a Senior Technical Recruiter and Talent Acquisition Manager performing a Gap Analysis. Compare the Candidate's CV against the required Hard Skills and the required Soft Skills.
+
+Instructions:
+1. **Hard Skills - Semantic Matching:** Match skills based on meaning, not just exact keywords (e.g., if JD asks for "NoSQL" and CV has "MongoDB", count it as a match).
+2. **Hard Skills - Scoring:**
+   - 100: Perfect match of all critical skills.
+   - 80-99: Missing only minor/nice-to-have tools.
+   - <50: Missing core requirements.
+3. **Soft Skills - Evidence-Based Matching:** Do not just look for keywords. Look for evidence of the skill in the bullet points (e.g., "Led a team of 5" implies "Leadership"). Be strict, if a candidate lists "Communication" but has a poorly written CV, lower the score.
+4. **Missing Skills:** List required skills clearly absent from the CV, or with no evidence for soft skills.
+5. **Independent Scores:** Score hard and soft skills separately, one must not influence the other.
+
+Return **only** valid JSON with this schema:
+{
+  "hard_skill_analysis": {
+    "found_hard_skills": ["List of matching skills found in CV"],
+    "missing_hard_skills": ["List of skills in JD NOT found in CV"],
+    "match_score": 85,
+    "summary": "Brief technical assessment explaining the score."
+  },
+  "soft_skill_analysis": {
+    "found_soft_skills": ["List of soft skills supported by evidence in CV"],
+    "missing_soft_skills": ["List of required soft skills with no evidence"],
+    "match_score": 75,
+    "summary": "Brief behavioral assessment explaining the score."
+  }
+}"""
+
 model_prompts: ModelPrompts = {
     "hhao/qwen2.5-coder-tools:0.5b": {
+        "pipeline_mode": "split",
         "preprocess": """Rewrite CV to short bullet text.
 Keep: skills, experience, projects, education.
 Remove personal details.
@@ -71,6 +134,7 @@ Return JSON only:
 """,
     },
     "gemini-2.5-flash-lite": {
+        "pipeline_mode": "split",
         "preprocess": """You are an expert Resume Parser and Data Cleaner.
 Your goal is to restructure the candidate's raw CV text into a clear, canonical format suitable for automated analysis.
 
@@ -156,8 +220,11 @@ Return **only** valid JSON with this schema:
   "recommendations": ["Recommendation 1", "Recommendation 2"],
   "final_summary": "Professional narrative summary of the candidate's fit. markdown format"
 }""",
+        "skill_identifier": FUSED_SKILL_IDENTIFIER_PROMPT,
+        "skill_analyzer": FUSED_SKILL_ANALYZER_PROMPT,
     },
     "gemini-2.5-flash": {
+        "pipeline_mode": "split",
         "preprocess": """You are an expert Resume Parser and Data Cleaner.
 Your goal is to restructure the candidate's raw CV text into a clear, canonical format suitable for automated analysis.
 
@@ -243,44 +310,25 @@ Return **only** valid JSON with this schema:
   "recommendations": ["Recommendation 1", "Recommendation 2"],
   "final_summary": "Professional narrative summary of the candidate's fit. markdown format"
 }""",
+        "skill_identifier": FUSED_SKILL_IDENTIFIER_PROMPT,
+        "skill_analyzer": FUSED_SKILL_ANALYZER_PROMPT,
     },
 }
 
 
-def print_agent_prompt_and_response(agent: str, prompt: str, response: str, max_len: int = 500):
+def get_pipeline_mode(model_prompts: ModelPrompts, model: str, requested: str = "") -> PipelineMode:
     """
-    Nicely prints an agent's name, the prompt sent, and the response received.
+    Pipeline mode of `model`, the `requested` one (AGENT_PIPELINE_MODE) when set.
 
-    Args:
-        agent (str): Name of the agent
-        prompt (str): The prompt sent to the model
-        response (str): The response received from the model
-        max_len (int, optional): Maximum length to print for prompt/response. Defaults to 500.
+    "split" when the model has no fused prompts, an unknown mode raises instead of silently running "split".
     """
-    is_enabled = True
-    is_truncate_disabled = True
-    if not is_enabled:
-        return
-
-    def truncate(text: str) -> str:
-        if is_truncate_disabled:
-            return text
-
-        if len(text) > max_len:
-            return text[:max_len] + " ... [truncated]"
-        return text
-
-    separator = "=" * 80
-    print(separator)
-    print(f"Agent: {agent}")
-    print("-" * 80)
-    print("Prompt:")
-    print(truncate(prompt))
-    print("-" * 80)
-    print("Response:")
-    print(truncate(response))
-    print(separator)
-    print("\n")
+    prompts = get_prompt(model_prompts=model_prompts, model=model)
+    mode = requested or prompts.get("pipeline_mode", "split")
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"AGENT_PIPELINE_MODE: unknown pipeline mode {mode!r}, expected one of {list(PIPELINE_MODES)}")
+    if mode == "fused" and "skill_identifier" in prompts and "skill_analyzer" in prompts:
+        return "fused"
+    return "split"
 
 
 def get_prompt(model_prompts: ModelPrompts, model: str) -> AgentPrompts:
@@ -0,0 +1,258 @@
+import asyncio
+import dataclasses
+import re
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import redis
+import structlog
+from django.conf import settings
+
+logger = structlog.get_logger(__name__)
+
+KEY_PREFIX = "agent:ratelimit"
+
+
+@dataclasses.dataclass(frozen=True)
+class RateLimit:
+    """`requests` calls per `period` seconds, allowing up to `burst` calls back to back."""
+
+    requests: int
+    period: float = 60.0
+    burst: int = 1
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.requests
+
+    @property
+    def burst_offset(self) -> float:
+        return self.interval * self.burst
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call would have to wait longer than the allowed maximum."""
+
+    def __init__(self, key: str, retry_after: float):
+        super().__init__(f"rate limit for {key} exceeded, retry after {retry_after:.1f}s")
+        self.key = key
+        self.retry_after = retry_after
+
+
+# GCRA (generic cell rate algorithm). Only the theoretical arrival time (TAT) is stored per key.
+# https://brandur.org/rate-limiting
+# Returns 0 when the call is allowed, otherwise the seconds to wait before trying again.
+# Redis server time is used so workers with skewed clocks still share a single schedule.
+GCRA_RESERVE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local burst_offset = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+  tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - burst_offset
+if now < allow_at then
+  return tostring(allow_at - now)
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000) + 1)
+return '0'
+"""
+
+# Push the TAT forward so no worker is allowed a call before now + retry_after.
+GCRA_BLOCK_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local burst_offset = tonumber(ARGV[2])
+local retry_after = tonumber(ARGV[3])
+local blocked_tat = now + retry_after + burst_offset - interval
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < blocked_tat then
+  tat = blocked_tat
+end
+if tat <= now then
+  return '0'
+end
+redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000) + 1)
+return '0'
+"""
+
+
+class InMemoryBackend:
+    """Same GCRA schedule kept in process memory, used when redis is not configured."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tats: Dict[str, float] = {}
+
+    def reserve(self, key: str, limit: RateLimit) -> float:
+        with self._lock:
+            now = self._clock()
+            tat = max(self._tats.get(key, now), now)
+            new_tat = tat + limit.interval
+            allow_at = new_tat - limit.burst_offset
+            if now < allow_at:
+                return allow_at - now
+            self._tats[key] = new_tat
+            return 0.0
+
+    def block(self, key: str, limit: RateLimit, retry_after: float):
+        with self._lock:
+            now = self._clock()
+            blocked_tat = now + retry_after + limit.burst_offset - limit.interval
+            self._tats[key] = max(self._tats.get(key, now), blocked_tat)
+
+
+class RedisBackend:
+    def __init__(self, client: redis.Redis):
+        self._reserve = client.register_script(GCRA_RESERVE_SCRIPT)
+        self._block = client.register_script(GCRA_BLOCK_SCRIPT)
+
+    def reserve(self, key: str, limit: RateLimit) -> float:
+        return float(self._reserve(keys=[key], args=[limit.interval, limit.burst_offset]))
+
+    def block(self, key: str, limit: RateLimit, retry_after: float):
+        self._block(keys=[key], args=[limit.interval, limit.burst_offset, retry_after])
+
+
+class RateLimiter:
+    """
+    Token bucket style limiter keyed per model and shared by every worker through redis.
+
+    Calls go through immediately while there is budget, otherwise they sleep only for the
+    time until the next slot opens up. Waits longer than `max_wait` raise `RateLimitExceeded`
+    so the caller can give up the worker slot (eg: celery retry with a countdown) instead of sleeping.
+    """
+
+    def __init__(
+        self,
+        backend: InMemoryBackend | RedisBackend,
+        limits: Dict[str, RateLimit],
+        max_wait: float,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.backend = backend
+        self.limits = limits
+        self.max_wait = max_wait
+        self._sleep = sleep
+
+    def _key(self, model: str) -> str:
+        return f"{KEY_PREFIX}:{model}"
+
+    def _reserve(self, model: str, limit: RateLimit, waited: float) -> float:
+        wait = self.backend.reserve(self._key(model), limit)
+        if wait <= 0:
+            if waited:
+                logger.info("llm rate limit wait", model=model, waited=round(waited, 2))
+            return 0.0
+        if waited + wait > self.max_wait:
+            raise RateLimitExceeded(model, wait)
+        return wait
+
+    def acquire(self, model: str):
+        limit = self.limits.get(model)
+        if limit is None:
+            return
+
+        waited = 0.0
+        while wait := self._reserve(model, limit, waited):
+            self._sleep(wait)
+            waited += wait
+
+    async def aacquire(self, model: str):
+        limit = self.limits.get(model)
+        if limit is None:
+            return
+
+        waited = 0.0
+        # the reservation is a redis round trip, the other nodes of the event loop keep running meanwhile
+        while wait := await asyncio.to_thread(self._reserve, model, limit, waited):
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def block(self, model: str, retry_after: float):
+        """Honor a provider retry-after hint for every worker using this model."""
+        limit = self.limits.get(model) or RateLimit(requests=1, period=1.0)
+        logger.warning("llm provider asked to back off", model=model, retry_after=retry_after)
+        self.backend.block(self._key(model), limit, retry_after)
+
+    async def ablock(self, model: str, retry_after: float):
+        await asyncio.to_thread(self.block, model, retry_after)
+
+
+def parse_rate_limits(raw: Dict[str, str]) -> Dict[str, RateLimit]:
+    """
+    Parse `{"model": "<requests>/<seconds>[/<burst>]"}` entries from settings.
+
+    eg: `{"gemini-2.5-flash": "10/60"}` allows 10 calls per minute.
+    """
+    limits = {}
+    for model, value in raw.items():
+        parts = [part.strip() for part in value.split("/")]
+        limits[model] = RateLimit(
+            requests=int(parts[0]),
+            period=float(parts[1]) if len(parts) > 1 else 60.0,
+            burst=int(parts[2]) if len(parts) > 2 else 1,
+        )
+    return limits
+
+
+# One limiter per Python process, the schedule itself lives in redis
+rateLimiterInstance: RateLimiter | None = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    global rateLimiterInstance
+    if rateLimiterInstance is None:
+        backend: InMemoryBackend | RedisBackend
+        if settings.REDIS_URL:
+            backend = RedisBackend(redis.from_url(settings.REDIS_URL))
+        else:
+            backend = InMemoryBackend()
+        rateLimiterInstance = RateLimiter(
+            backend=backend,
+            limits=parse_rate_limits(settings.AGENT_RATE_LIMITS),
+            max_wait=settings.AGENT_RATE_LIMIT_MAX_WAIT,
+        )
+    return rateLimiterInstance
+
+
+def _parse_duration(value) -> Optional[float]:
+    # "37s", "1.5s", "12" or 12
+    match = re.match(r"^\s*(\d+(?:\.\d+)?)\s*s?\s*$", str(value))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def get_retry_after(exc: BaseException) -> Optional[float]:
+    """
+    Find a retry-after hint in a provider error, following the exception chain since
+    langchain adapters wrap the SDK errors.
+
+    Looks at the HTTP `retry-after` header and at google's `RetryInfo.retryDelay` error detail.
+    """
+    current: Optional[BaseException] = exc
+    while current is not None:
+        response = getattr(current, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers and headers.get("retry-after"):
+            retry_after = _parse_duration(headers.get("retry-after"))
+            if retry_after is not None:
+                return retry_after
+
+        details = getattr(current, "details", None)
+        if isinstance(details, dict):
+            for detail in details.get("error", {}).get("details", []):
+                if isinstance(detail, dict) and "retryDelay" in detail:
+                    retry_after = _parse_duration(detail["retryDelay"])
+                    if retry_after is not None:
+                        return retry_after
+
+        current = current.__cause__ or current.__context__
+    return None
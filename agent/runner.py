@@ -0,0 +1,107 @@
+import asyncio
+import contextvars
+import threading
+from typing import Optional, cast
+
+import structlog
+from django.conf import settings
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph.state import CompiledStateGraph
+
+from agent.steam_line_workflow import State, get_workflow_config, steam_line_workflow
+
+logger = structlog.get_logger(__name__)
+
+
+class WorkflowRunner:
+    """
+    Drives many scans concurrently on a single event loop per process.
+
+    Scans spend most of their time waiting on HTTP calls to the LLM provider, so instead of
+    one scan per prefork process, the workflow is run with `ainvoke` on a background event
+    loop thread. Any number of callers (eg: celery tasks on a `--pool=threads` worker) can
+    submit scans with `run()`, at most `max_in_flight` of them are executed at the same time.
+    """
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or not self._loop.is_running():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run_loop():
+                    asyncio.set_event_loop(loop)
+                    self._semaphore = asyncio.Semaphore(self.max_in_flight)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run_loop, name="workflow-runner", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+                logger.info("workflow runner started", max_in_flight=self.max_in_flight)
+            return self._loop
+
+    async def arun(
+        self,
+        workflow_input: Optional[State],
+        workflow: Optional[CompiledStateGraph] = None,
+        config: Optional[RunnableConfig] = None,
+    ) -> State:
+        assert self._semaphore is not None
+        async with self._semaphore:
+            result = await (workflow or steam_line_workflow).ainvoke(
+                workflow_input, config=config or get_workflow_config()
+            )
+            return cast(State, result)
+
+    def run(
+        self,
+        workflow_input: Optional[State],
+        timeout: Optional[float] = None,
+        workflow: Optional[CompiledStateGraph] = None,
+        config: Optional[RunnableConfig] = None,
+    ) -> State:
+        """
+        Submit a scan to the event loop and block the calling thread until it finishes.
+
+        `workflow` and `config` default to `steam_line_workflow` and `get_workflow_config()`.
+        """
+        loop = self._start()
+        context = contextvars.copy_context()
+
+        async def arun_in_caller_context() -> State:
+            # carry the caller's context vars (eg: llm cache mode) over to the event loop thread
+            for var, value in context.items():
+                var.set(value)
+            return await self.arun(workflow_input, workflow=workflow, config=config)
+
+        future = asyncio.run_coroutine_threadsafe(arun_in_caller_context(), loop)
+        return future.result(timeout=timeout)
+
+    def stop(self):
+        with self._lock:
+            if self._loop is not None and self._loop.is_running():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+            if self._thread is not None:
+                self._thread.join()
+            self._loop = None
+            self._thread = None
+
+
+# One runner (and event loop) per Python process
+workflowRunnerInstance: WorkflowRunner | None = None
+
+
+def get_workflow_runner() -> WorkflowRunner:
+    global workflowRunnerInstance
+    if workflowRunnerInstance is None:
+        workflowRunnerInstance = WorkflowRunner(max_in_flight=settings.AGENT_ASYNC_MAX_IN_FLIGHT)
+    return workflowRunnerInstance
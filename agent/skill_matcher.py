@@ -0,0 +1,272 @@
+import dataclasses
+import json
+import re
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+# canonical skill name -> synonyms, matching ignores case except for CASE_SENSITIVE names.
+# Synonyms are only spellings and abbreviations of the same skill, related tools (eg: Jest for Unit Testing,
+# Sass for CSS) are skills of their own: a CV listing one does not cover a job asking for the other.
+SKILL_TAXONOMY: Dict[str, List[str]] = {
+    # languages
+    "Python": ["python3"],
+    "Java": [],
+    "JavaScript": ["js", "ecmascript", "es6"],
+    "TypeScript": [],
+    "Go": ["golang"],
+    "Rust": [],
+    "C": [],
+    "C++": ["cpp"],
+    "C#": ["csharp", "c sharp"],
+    "Kotlin": [],
+    "Swift": [],
+    "PHP": [],
+    "Ruby": [],
+    "Scala": [],
+    "R": [],
+    "SQL": [],
+    "Bash": ["shell scripting", "shell script"],
+    # frameworks and libraries
+    "Django": [],
+    "Django REST Framework": ["drf"],
+    "Flask": [],
+    "FastAPI": [],
+    "Spring Boot": ["springboot"],
+    "Node.js": ["nodejs", "Node"],
+    "Express": ["express.js", "expressjs"],
+    "React": ["react.js", "reactjs"],
+    "Angular": ["angularjs"],
+    "Vue.js": ["vue", "vuejs"],
+    "Next.js": ["nextjs"],
+    ".NET": ["dotnet"],
+    "Ruby on Rails": ["rails"],
+    "Celery": [],
+    "GraphQL": [],
+    "REST APIs": ["REST", "restful", "rest api", "restful apis"],
+    "gRPC": [],
+    "Pandas": [],
+    "NumPy": [],
+    "PyTorch": ["torch"],
+    "TensorFlow": [],
+    "scikit-learn": ["sklearn", "scikit learn"],
+    "LangChain": [],
+    # data stores and messaging
+    "PostgreSQL": ["postgres"],
+    "MySQL": [],
+    "SQLite": [],
+    "MongoDB": ["mongo"],
+    "Redis": [],
+    "Elasticsearch": ["elastic search"],
+    "OpenSearch": [],
+    "Kafka": ["apache kafka"],
+    "RabbitMQ": [],
+    # cloud and infrastructure
+    "AWS": ["amazon web services"],
+    "GCP": ["google cloud", "google cloud platform"],
+    "Azure": ["microsoft azure"],
+    "Docker": [],
+    "Kubernetes": ["k8s"],
+    "Terraform": [],
+    "Ansible": [],
+    "Linux": [],
+    "Unix": [],
+    "Nginx": [],
+    "CI/CD": ["ci cd", "continuous integration", "continuous delivery", "continuous deployment"],
+    "GitHub Actions": [],
+    "Jenkins": [],
+    "Git": [],
+    "GitHub": [],
+    "GitLab": [],
+    # practices
+    "Microservices": ["microservice", "micro services"],
+    "Machine Learning": ["ml"],
+    "Unit Testing": ["unit tests"],
+    "TDD": ["test driven development", "test-driven development"],
+    "pytest": [],
+    "Jest": [],
+    "Agile": [],
+    "Scrum": [],
+    "Kanban": [],
+    "HTML": ["html5"],
+    "CSS": ["css3"],
+    "Sass": ["scss"],
+}
+
+# names that are also everyday words, only matched when written exactly like this
+CASE_SENSITIVE = {"Go", "C", "R", "Rust", "Swift", "Express", "Spring Boot", "Node", "REST"}
+
+# "C" must not match in "C++" or "C#", nor "Java" in "JavaScript"
+WORD_CHAR_RE = re.compile(r"[a-z0-9+#]", re.IGNORECASE)
+
+# Names up to this length (C, R, Go, js, ml) need list-like context around them,
+# "R&D", "Go-to-market", "C-level" or "Node.js" do not mention them
+SHORT_SKILL_LENGTH = 2
+SEPARATOR_RE = re.compile(r"[\s,;:()\[\]|/·]")
+
+
+def normalize(skill: str) -> str:
+    return " ".join(skill.lower().split())
+
+
+class SkillAutomaton:
+    """
+    Aho-Corasick automaton over skill names, finds every taxonomy skill in one pass over the text.
+
+    Matches must start and end at word boundaries, short names between separators (see SHORT_SKILL_LENGTH).
+    Lower case patterns match regardless of case, other patterns only match text written exactly like them.
+    """
+
+    def __init__(self, patterns: Dict[str, str]):
+        # pattern -> canonical skill
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[Tuple[int, str]]] = [[]]
+        for pattern, canonical in patterns.items():
+            self._add(pattern, canonical)
+        self._build_fail_links()
+
+    def _add(self, pattern: str, canonical: str):
+        state = 0
+        for char in pattern:
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        self._outputs[state].append((len(pattern), canonical))
+
+    def _build_fail_links(self):
+        # breadth first, the fail state of a node is always closer to the root than the node
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def _is_boundary(self, text: str, index: int) -> bool:
+        return index < 0 or index >= len(text) or not WORD_CHAR_RE.match(text[index])
+
+    def _is_separated(self, text: str, start: int, end: int) -> bool:
+        if start > 0 and not SEPARATOR_RE.match(text[start - 1]):
+            return False
+        after = end + 1
+        if after >= len(text) or SEPARATOR_RE.match(text[after]):
+            return True
+        # end of a sentence: "services written in Go."
+        return text[after] == "." and (after + 1 >= len(text) or text[after + 1].isspace())
+
+    def find(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        # lower case patterns match in the first pass, case sensitive ones in the second
+        for haystack in (text.lower(), text):
+            state = 0
+            for end, char in enumerate(haystack):
+                while state and char not in self._goto[state]:
+                    state = self._fail[state]
+                state = self._goto[state].get(char, 0)
+                for length, canonical in self._outputs[state]:
+                    start = end - length + 1
+                    if not (self._is_boundary(haystack, start - 1) and self._is_boundary(haystack, end + 1)):
+                        continue
+                    if length <= SHORT_SKILL_LENGTH and not self._is_separated(haystack, start, end):
+                        continue
+                    found.add(canonical)
+        return found
+
+
+@dataclasses.dataclass
+class SkillMatch:
+    required: List[str]
+    found: List[str]
+    # known to the taxonomy and not in the CV
+    missing: List[str]
+    # not in the taxonomy and not written as is in the CV, the rules can not tell
+    undecided: List[str]
+
+    @property
+    def to_judge(self) -> List[str]:
+        """What is left for the LLM: synonyms outside the taxonomy may still cover these."""
+        return self.missing + self.undecided
+
+    def match_score(self, found: Optional[List[str]] = None) -> int:
+        found = self.found if found is None else found
+        return round(100 * len(found) / len(self.required)) if self.required else 0
+
+    def as_analysis(self) -> Dict:
+        """Same shape as the hard skill analyzer response."""
+        return {
+            "found_hard_skills": self.found,
+            "missing_hard_skills": self.to_judge,
+            "match_score": self.match_score(),
+            "summary": f"{len(self.found)} of {len(self.required)} required hard skills found in the CV (rule based).",
+        }
+
+    def merge_analysis(self, analysis: Dict) -> Dict:
+        """Combine the LLM verdict on `to_judge` with the skills the rules already found."""
+        found = self.found + [skill for skill in analysis.get("found_hard_skills", []) if skill not in self.found]
+        return {
+            **analysis,
+            "found_hard_skills": found,
+            "missing_hard_skills": [skill for skill in self.to_judge if skill not in found],
+            "match_score": self.match_score(found),
+        }
+
+
+class SkillMatcher:
+    def __init__(self, taxonomy: Dict[str, List[str]] = SKILL_TAXONOMY, case_sensitive: Set[str] = CASE_SENSITIVE):
+        self._canonical: Dict[str, str] = {}
+        patterns: Dict[str, str] = {}
+        for canonical, synonyms in taxonomy.items():
+            for name in [canonical, *synonyms]:
+                self._canonical[normalize(name)] = canonical
+                patterns[name if name in case_sensitive else normalize(name)] = canonical
+        self.automaton = SkillAutomaton(patterns)
+
+    def canonicalize(self, skill: str) -> Optional[str]:
+        return self._canonical.get(normalize(skill))
+
+    def find(self, text: str) -> Set[str]:
+        return self.automaton.find(text)
+
+    def match(self, required: List[str], cv_text: str) -> SkillMatch:
+        in_cv = self.find(cv_text)
+        found: List[str] = []
+        missing: List[str] = []
+        undecided: List[str] = []
+        for skill in required:
+            canonical = self.canonicalize(skill)
+            if canonical is not None:
+                (found if canonical in in_cv else missing).append(skill)
+            elif re.search(rf"(?<![a-z0-9+#]){re.escape(normalize(skill))}(?![a-z0-9+#])", normalize(cv_text)):
+                found.append(skill)
+            else:
+                undecided.append(skill)
+        return SkillMatch(required=list(required), found=found, missing=missing, undecided=undecided)
+
+
+def parse_required_skills(identified_skills: str, key: str = "found_hard_skills") -> Optional[List[str]]:
+    """Skill list from a skill identifier response, None when it does not have the expected shape."""
+    try:
+        skills = json.loads(identified_skills).get(key)
+    except (json.JSONDecodeError, AttributeError):
+        return None
+    if not isinstance(skills, list) or not all(isinstance(skill, str) for skill in skills):
+        return None
+    return skills
+
+
+# One matcher per Python process, the automaton is built on first use
+skillMatcherInstance: SkillMatcher | None = None
+
+
+def get_skill_matcher() -> SkillMatcher:
+    global skillMatcherInstance
+    if skillMatcherInstance is None:
+        skillMatcherInstance = SkillMatcher()
+    return skillMatcherInstance
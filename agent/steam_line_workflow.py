@@ -1,23 +1,95 @@
 # import re
+import asyncio
+import contextvars
+import json
 import time
-from typing import List, TypedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Annotated,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypedDict,
+    cast,
+)
 
+import structlog
 from django.conf import settings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages.ai import UsageMetadata, add_usage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_ollama import ChatOllama
-from langgraph.graph import StateGraph
-from presidio_analyzer import AnalyzerEngine, recognizer_result
-from presidio_analyzer.nlp_engine import NlpEngineProvider
-from presidio_anonymizer import AnonymizerEngine, entities
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.state import CompiledStateGraph
+from opentelemetry import trace
+from pydantic import BaseModel
 
+from agent.anonymizer import anonymize_text
+from agent.fake_llm import FakeChatModel
+from agent.http_client import gemini_client_kwargs, ollama_client_kwargs
+from agent.llm_cache import (
+    adeferred_cache_writes,
+    deferred_cache_writes,
+    discard_cache_writes,
+    llm_cache,
+    make_cache_key,
+)
+from agent.llm_router import LLMRouter, Provider
+from agent.model_routing import NodeRoute, get_node_route, get_routing_table, routed_to
+from agent.output_schemas import (
+    OUTPUT_SCHEMAS,
+    OutputValidationError,
+    get_output_schema,
+    repair_prompt,
+    structured_output,
+    structured_output_kwargs,
+    validate_output,
+)
 from agent.parseJsonMarkdown import parse_markdown_json
-from agent.prompts import get_prompt, model_prompts, print_agent_prompt_and_response
+from agent.progress import apublish_progress, get_token_publisher, publish_progress
+from agent.prompts import (
+    AgentPrompts,
+    PipelineMode,
+    get_pipeline_mode,
+    get_prompt,
+    model_prompts,
+)
+from agent.rate_limit import get_rate_limiter, get_retry_after
+from agent.skill_matcher import SkillMatch, get_skill_matcher, parse_required_skills
+from agent.telemetry import node_span, record_llm_call, tracer
+from agent.token_budget import (
+    BudgetedText,
+    budget_prompt_text,
+    chunk_text,
+    compact_text,
+    estimate_tokens,
+    get_node_budget,
+)
+from agent.trace_capture import capture_trace
 
 # from langchain_ollama import ChatOllama
 
 
+logger = structlog.get_logger(__name__)
+
+# agent -> token budget report of the CV text it sent, see agent/token_budget.py
+PromptBudgets = Dict[str, Dict[str, int]]
+
+
+def merge_prompt_budgets(left: PromptBudgets, right: PromptBudgets) -> PromptBudgets:
+    # nodes running at the same time each report their own budget
+    return {**left, **right}
+
+
 # Shared State
-class State(TypedDict):
+# total=False since every node only returns the part of the state it produced
+class State(TypedDict, total=False):
     raw_cv_text: str
     anonymized_cv_text: str
     preprocessed_cv_text: str
@@ -27,6 +99,7 @@ class State(TypedDict):
     hard_skill_analyser_output: str
     soft_skill_analyser_output: str
     summary_generator_output: str
+    prompt_budget: Annotated[PromptBudgets, merge_prompt_budgets]
 
 
 GEN_AI_API_KEY = settings.GEN_AI_API_KEY
@@ -45,151 +118,580 @@ OLLAMA_BASE_URL = settings.OLLAMA_BASE_URL
 # MODEL_NAME = "hhao/qwen2.5-coder-tools:0.5b"
 # MODEL_NAME = "gemini-2.5-flash-lite"
 MODEL_NAME = "gemini-2.5-flash"
-SLEEP_DURATION = 30
 
-# select langchaing llm adapter
-LLM_NAME = "ChatGoogleGenerativeAI"
+# select langchaing llm adapter (AGENT_LLM_NAME setting)
+# LLM_NAME = "ChatGoogleGenerativeAI"
 # LLM_NAME = "ChatOllama"
+# LLM_NAME = "FakeChatModel"
+LLM_NAME = settings.AGENT_LLM_NAME
+
+# Rate limit budgets and stored results (CV artifacts, job description skills) are kept per MODEL_ID,
+# so responses of the fake model are never reused as if the real model produced them
+MODEL_ID = f"fake/{MODEL_NAME}" if LLM_NAME == "FakeChatModel" else MODEL_NAME
+
+
+def build_llm(llm_name: str, model: str, **params: Any) -> BaseChatModel:
+    # params: generation config of a routed node (temperature, ...), see agent/model_routing.py
+    match llm_name:
+        case "ChatGoogleGenerativeAI":
+            if not GEN_AI_API_KEY:
+                raise RuntimeError("GEN_AI_API_KEY not configured")
+
+            # https://github.com/langchain-ai/langchain-google/issues/1042
+            # https://github.com/IrakliGLD/langchain_railway/commit/d149adc21bf03c39ba432260f6ecadb58a007687
+            return ChatGoogleGenerativeAI(
+                model=model,
+                api_key=GEN_AI_API_KEY,
+                max_retries=1,
+                # keep-alive pool limits and timeouts, see agent/http_client.py
+                **gemini_client_kwargs(),
+                **params,
+            )
+        case "ChatOllama":
+            if not OLLAMA_BASE_URL:
+                raise RuntimeError("OLLAMA_BASE_URL not configured")
+            # OLLAMA for local testing without ratelimits and other hinderances
+            # every ollama client reuses the process wide connection pool, see agent/http_client.py
+            return ChatOllama(base_url=OLLAMA_BASE_URL, model=model, **ollama_client_kwargs(), **params)
+        case "FakeChatModel":
+            # local responses with simulated latency and failures, to benchmark the pipeline
+            return FakeChatModel(
+                model=model,
+                # a routed model is sent its own prompt set
+                prompts=cast(Dict[str, str], model_prompts.get(model, PROMPTS)),
+                latency=settings.AGENT_FAKE_LLM_LATENCY,
+                latency_sigma=settings.AGENT_FAKE_LLM_LATENCY_SIGMA,
+                failure_rate=settings.AGENT_FAKE_LLM_FAILURE_RATE,
+                seed=settings.AGENT_FAKE_LLM_SEED,
+                **params,
+            )
+        case _:
+            raise ValueError(f"Unknown LLM_NAME: {llm_name}")
 
 
 # One LLM instance per Python process
 # In Celery:
 # Each worker process gets its own instance
 # This is not “global singleton across workers”, only per process.
-llmInstance: ChatGoogleGenerativeAI | ChatOllama | None = None
+llmInstance: ChatGoogleGenerativeAI | ChatOllama | FakeChatModel | None = None
 
 
 def get_llm():
     global llmInstance
     if llmInstance is None:
-        match LLM_NAME:
-            case "ChatGoogleGenerativeAI":
-                if not GEN_AI_API_KEY:
-                    raise RuntimeError("GEN_AI_API_KEY not configured")
-
-                # https://github.com/langchain-ai/langchain-google/issues/1042
-                # https://github.com/IrakliGLD/langchain_railway/commit/d149adc21bf03c39ba432260f6ecadb58a007687
-                llmInstance = ChatGoogleGenerativeAI(
-                    model=MODEL_NAME,
-                    api_key=GEN_AI_API_KEY,
-                    max_retries=1,
-                )
-            case "ChatOllama":
-                if not OLLAMA_BASE_URL:
-                    raise RuntimeError("OLLAMA_BASE_URL not configured")
-                # OLLAMA for local testing without ratelimits and other hinderances
-                llmInstance = ChatOllama(base_url=OLLAMA_BASE_URL, model=MODEL_NAME)
-            case _:
-                raise ValueError(f"Unknown LLM_NAME: {LLM_NAME}")
-
-        return llmInstance
+        llmInstance = cast(ChatGoogleGenerativeAI | ChatOllama | FakeChatModel, build_llm(LLM_NAME, MODEL_NAME))
+    return llmInstance
+
+
+# fallback and routed providers -> their LLM instance, built on first use
+providerLLMInstances: Dict[Provider, BaseChatModel] = {}
+
+
+def get_provider_llm(provider: Provider) -> BaseChatModel:
+    if provider.primary:
+        return get_llm()
+    if provider not in providerLLMInstances:
+        providerLLMInstances[provider] = build_llm(provider.llm_name, provider.model, **dict(provider.params))
+    return providerLLMInstances[provider]
+
+
+def get_provider_model_id(provider: Provider) -> str:
+    # rate limits of the primary model are kept under MODEL_ID like its stored results
+    return MODEL_ID if provider.primary else provider.model_id
+
+
+PRIMARY_PROVIDER = Provider(llm_name=LLM_NAME, model=MODEL_NAME, primary=True)
+
+
+def _build_router(provider: Provider) -> LLMRouter:
+    # a fallback that is also the routed provider is only tried once
+    providers = [provider] + [Provider.parse(value) for value in settings.AGENT_LLM_FALLBACKS]
+    return LLMRouter(
+        [fallback for i, fallback in enumerate(providers) if fallback not in providers[:i]],
+        failure_threshold=settings.AGENT_LLM_BREAKER_FAILURES,
+        cooldown=settings.AGENT_LLM_BREAKER_COOLDOWN,
+        hedge_percentile=settings.AGENT_LLM_HEDGE_PERCENTILE,
+    )
+
+
+llmRouterInstance: Optional[LLMRouter] = None
+# node route -> router of the routed provider followed by the fallbacks
+nodeRouterInstances: Dict[NodeRoute, LLMRouter] = {}
 
-    else:
-        return llmInstance
+
+def get_llm_router(route: Optional[NodeRoute] = None) -> LLMRouter:
+    """
+    LLM_NAME/MODEL_NAME followed by the AGENT_LLM_FALLBACKS providers, see agent/llm_router.py.
+
+    With a node `route` its provider comes first instead, see agent/model_routing.py.
+    """
+    global llmRouterInstance
+    if route is None or route.provider == Provider(llm_name=LLM_NAME, model=MODEL_NAME):
+        if llmRouterInstance is None:
+            llmRouterInstance = _build_router(PRIMARY_PROVIDER)
+        return llmRouterInstance
+    if route not in nodeRouterInstances:
+        nodeRouterInstances[route] = _build_router(route.provider)
+    return nodeRouterInstances[route]
 
 
 PROMPTS = get_prompt(model_prompts=model_prompts, model=MODEL_NAME)
+PIPELINE_MODE = get_pipeline_mode(model_prompts=model_prompts, model=MODEL_NAME, requested=settings.AGENT_PIPELINE_MODE)
 
+# agent -> its prompt in AgentPrompts, a node routed to another model needs that model's prompt
+NODE_PROMPT_KEYS = {
+    "preprocess_agent": "preprocess",
+    "hard_skill_identifier_agent": "hard_skill_identifier",
+    "soft_skill_identifier_agent": "soft_skill_identifier",
+    "hard_skill_analyzer_agent": "hard_skill_analyzer",
+    "soft_skill_analyzer_agent": "soft_skill_analyzer",
+    "skill_identifier_agent": "skill_identifier",
+    "skill_analyzer_agent": "skill_analyzer",
+    "summary_generator_agent": "summary_generator",
+}
 
-# nodes (agents)
-def anonymizer_agent(state: State) -> State:
-    provider = NlpEngineProvider(
-        nlp_configuration={
-            "nlp_engine_name": "spacy",
-            "models": [{"lang_code": "en", "model_name": "en_core_web_sm"}],
-        }
+
+def node_prompts() -> AgentPrompts:
+    """Prompt set of the model the running node is routed to."""
+    route = get_node_route()
+    return PROMPTS if route is None else get_prompt(model_prompts=model_prompts, model=route.model)
+
+
+def node_model() -> str:
+    route = get_node_route()
+    return MODEL_NAME if route is None else route.model
+
+
+def node_model_id() -> str:
+    route = get_node_route()
+    return MODEL_ID if route is None else route.provider.model_id
+
+
+def route_node(agent: str, state: State) -> Optional[NodeRoute]:
+    """Route of the agent for this CV, size rules look at the CV as it was uploaded (anonymized)."""
+    cv_text = state.get("anonymized_cv_text") or state.get("preprocessed_cv_text") or ""
+    return get_routing_table().route(agent, estimate_tokens(cv_text))
+
+
+def routed_model_id(agent: str, state: State) -> str:
+    """Model id the agent's LLM calls go to for this CV."""
+    with routed_to(route_node(agent, state)):
+        return node_model_id()
+
+
+def preprocess_model_id(anonymized_cv_text: str) -> str:
+    """Model the preprocessed text of this CV comes from, stored CV artifacts are keyed on it."""
+    return routed_model_id("preprocess_agent", State(anonymized_cv_text=anonymized_cv_text))
+
+
+def skill_extraction_model_id(state: State) -> str:
+    """Model(s) the job description skills of this CV are extracted by, stored skills are keyed on it."""
+    agents = (
+        ["skill_identifier_agent"]
+        if PIPELINE_MODE == "fused"
+        else ["hard_skill_identifier_agent", "soft_skill_identifier_agent"]
     )
+    return ",".join(dict.fromkeys(routed_model_id(agent, state) for agent in agents))
+
+
+def get_llm_params(llm: BaseChatModel) -> Dict[str, Any]:
+    # generation params (temperature, max tokens, ...) are part of the cache key
+    params = getattr(llm, "_identifying_params", {})
+    schema = get_output_schema()
+    return {**params, "output_schema": schema.__name__} if schema else params
+
+
+def _call_llm(
+    llm: BaseChatModel, prompt: str, on_token: Optional[Callable[[str], None]], **kwargs: Any
+) -> Tuple[str, Optional[UsageMetadata]]:
+    if on_token is None:
+        message = llm.invoke(prompt, **kwargs)
+        return message.text, message.usage_metadata
+    # stream so progress listeners see the response while it is generated
+    chunks = []
+    usage: Optional[UsageMetadata] = None
+    for chunk in llm.stream(prompt, **kwargs):
+        chunks.append(chunk.text)
+        on_token(chunk.text)
+        if chunk.usage_metadata:
+            usage = add_usage(usage, chunk.usage_metadata)
+    return "".join(chunks), usage
+
+
+async def _acall_llm(
+    llm: BaseChatModel, prompt: str, on_token: Optional[Callable[[str], None]], **kwargs: Any
+) -> Tuple[str, Optional[UsageMetadata]]:
+    if on_token is None:
+        message = await llm.ainvoke(prompt, **kwargs)
+        return message.text, message.usage_metadata
+    chunks = []
+    usage: Optional[UsageMetadata] = None
+    async for chunk in llm.astream(prompt, **kwargs):
+        chunks.append(chunk.text)
+        on_token(chunk.text)
+        if chunk.usage_metadata:
+            usage = add_usage(usage, chunk.usage_metadata)
+    return "".join(chunks), usage
+
 
-    nlp_engine = provider.create_engine()
+def _cache_key(provider: Provider, llm: BaseChatModel, prompt: str) -> str:
+    return make_cache_key(provider.llm_name, provider.model, prompt, get_llm_params(llm))
 
-    pii_analyzer = AnalyzerEngine(nlp_engine=nlp_engine, supported_languages=["en"])
 
-    analyzer_results: List[recognizer_result.RecognizerResult] = pii_analyzer.analyze(
-        text=state["raw_cv_text"],
-        language="en",
+def _cached_response(router: LLMRouter, prompt: str, on_token: Optional[Callable[[str], None]]) -> Optional[str]:
+    # answered by the provider that would be asked first, the same prompt on another provider is another entry
+    provider = (router.candidates() or router.providers)[0]
+    cached = llm_cache.get(_cache_key(provider, get_provider_llm(provider), prompt))
+    if cached is not None:
+        record_llm_call(get_provider_model_id(provider), cache_hit=True)
+        if on_token is not None:
+            on_token(cached)
+    return cached
+
+
+async def _acached_response(router: LLMRouter, prompt: str, on_token: Optional[Callable[[str], None]]) -> Optional[str]:
+    provider = (router.candidates() or router.providers)[0]
+    cached = await llm_cache.aget(_cache_key(provider, get_provider_llm(provider), prompt))
+    if cached is not None:
+        record_llm_call(get_provider_model_id(provider), cache_hit=True)
+        if on_token is not None:
+            on_token(cached)
+    return cached
+
+
+def _invoke_provider(provider: Provider, prompt: str, on_token: Optional[Callable[[str], None]], last: bool) -> str:
+    llm = get_provider_llm(provider)
+    model_id = get_provider_model_id(provider)
+    # json constrained by the provider for nodes with an output schema, see agent/output_schemas.py
+    kwargs = structured_output_kwargs(llm, get_output_schema())
+
+    # Waits only as long as the shared per model budget requires, see agent/rate_limit.py
+    rate_limiter = get_rate_limiter()
+    started = time.perf_counter()
+    rate_limiter.acquire(model_id)
+    rate_limit_wait = time.perf_counter() - started
+    retries = 0
+    try:
+        response, usage = _call_llm(llm, prompt, on_token, **kwargs)
+    except Exception as e:
+        retry_after = get_retry_after(e)
+        if retry_after is None:
+            raise
+        # provider told us when to come back, make every worker wait
+        rate_limiter.block(model_id, retry_after)
+        if not last:
+            # the next provider answers instead
+            raise
+        # and try once more
+        retries += 1
+        started = time.perf_counter()
+        rate_limiter.acquire(model_id)
+        rate_limit_wait += time.perf_counter() - started
+        response, usage = _call_llm(llm, prompt, on_token, **kwargs)
+
+    record_llm_call(model_id, cache_hit=False, usage=usage, rate_limit_wait=rate_limit_wait, retries=retries)
+    llm_cache.set(_cache_key(provider, llm, prompt), response)
+    return response
+
+
+async def _ainvoke_provider(
+    provider: Provider, prompt: str, on_token: Optional[Callable[[str], None]], last: bool
+) -> str:
+    llm = get_provider_llm(provider)
+    model_id = get_provider_model_id(provider)
+    kwargs = structured_output_kwargs(llm, get_output_schema())
+
+    rate_limiter = get_rate_limiter()
+    started = time.perf_counter()
+    await rate_limiter.aacquire(model_id)
+    rate_limit_wait = time.perf_counter() - started
+    retries = 0
+    try:
+        response, usage = await _acall_llm(llm, prompt, on_token, **kwargs)
+    except Exception as e:
+        retry_after = get_retry_after(e)
+        if retry_after is None:
+            raise
+        await rate_limiter.ablock(model_id, retry_after)
+        if not last:
+            raise
+        retries += 1
+        started = time.perf_counter()
+        await rate_limiter.aacquire(model_id)
+        rate_limit_wait += time.perf_counter() - started
+        response, usage = await _acall_llm(llm, prompt, on_token, **kwargs)
+
+    record_llm_call(model_id, cache_hit=False, usage=usage, rate_limit_wait=rate_limit_wait, retries=retries)
+    await llm_cache.aset(_cache_key(provider, llm, prompt), response)
+    return response
+
+
+def invoke_llm(prompt: str, on_token: Optional[Callable[[str], None]] = None) -> str:
+    # the running node's route, see agent/model_routing.py
+    router = get_llm_router(get_node_route())
+    # repeated prompts (rescans, retries) are answered from agent/llm_cache.py
+    cached = _cached_response(router, prompt, on_token)
+    if cached is not None:
+        return cached
+    # fails over to the next healthy provider, streamed responses are never hedged
+    return router.call(
+        lambda provider, last: _invoke_provider(provider, prompt, on_token, last), hedge=on_token is None
+    )
+
+
+async def ainvoke_llm(prompt: str, on_token: Optional[Callable[[str], None]] = None) -> str:
+    # Same as invoke_llm but never blocks the event loop, used by agent/runner.py
+    router = get_llm_router(get_node_route())
+    cached = await _acached_response(router, prompt, on_token)
+    if cached is not None:
+        return cached
+    return await router.acall(
+        lambda provider, last: _ainvoke_provider(provider, prompt, on_token, last), hedge=on_token is None
+    )
+
+
+def _budget_text(agent: str, state: State, budget_key: str, build_prompt: Callable[[State], str]) -> BudgetedText:
+    """`budget_key` of the state fitted to what the agent's token budget leaves after the rest of the prompt."""
+    overhead = estimate_tokens(build_prompt(cast(State, {**state, budget_key: ""})))
+    budgeted = budget_prompt_text(agent, node_model(), cast(Dict[str, str], state).get(budget_key, ""), overhead)
+    trace.get_current_span().set_attribute("agent.prompt.dropped_tokens", budgeted.dropped_tokens)
+    return budgeted
+
+
+def get_node_output_schema(agent: str) -> Optional[Type[BaseModel]]:
+    return OUTPUT_SCHEMAS.get(agent) if settings.AGENT_OUTPUT_VALIDATION else None
+
+
+def _repair_failed(agent: str, error: OutputValidationError) -> None:
+    # the response is kept as it is, a bad output is not worth failing the whole scan for
+    # but it is not cached, the next scan asks again
+    discard_cache_writes()
+    trace.get_current_span().set_attribute("agent.output.invalid", True)
+    logger.warning("LLM output does not match the schema", agent=agent, error=str(error))
+
+
+def _validate_or_repair(agent: str, schema: Type[BaseModel], prompt: str, response: str) -> str:
+    """
+    `response` checked against the agent's output schema. An invalid one is sent back with what is wrong
+    (up to AGENT_OUTPUT_REPAIR_ATTEMPTS times), only this node is asked again, not the whole workflow.
+    """
+    for attempt in range(settings.AGENT_OUTPUT_REPAIR_ATTEMPTS + 1):
+        try:
+            validated = validate_output(schema, response)
+            trace.get_current_span().set_attribute("agent.output.repairs", attempt)
+            return validated
+        except OutputValidationError as error:
+            if attempt == settings.AGENT_OUTPUT_REPAIR_ATTEMPTS:
+                _repair_failed(agent, error)
+                return response
+            response = invoke_llm(repair_prompt(prompt, response, error, schema))
+    return response
+
+
+async def _avalidate_or_repair(agent: str, schema: Type[BaseModel], prompt: str, response: str) -> str:
+    for attempt in range(settings.AGENT_OUTPUT_REPAIR_ATTEMPTS + 1):
+        try:
+            validated = validate_output(schema, response)
+            trace.get_current_span().set_attribute("agent.output.repairs", attempt)
+            return validated
+        except OutputValidationError as error:
+            if attempt == settings.AGENT_OUTPUT_REPAIR_ATTEMPTS:
+                _repair_failed(agent, error)
+                return response
+            response = await ainvoke_llm(repair_prompt(prompt, response, error, schema))
+    return response
+
+
+def _llm_node(
+    agent: str,
+    output_keys: List[str],
+    build_prompt: Callable[[State], str],
+    to_state: Callable[[str], State],
+    reuse_existing: bool,
+    stream_tokens: bool = False,
+    budget_key: Optional[str] = None,
+) -> RunnableLambda:
+    def prepare(state: State) -> Tuple[str, State]:
+        if not budget_key:
+            return build_prompt(state), State()
+        budgeted = _budget_text(agent, state, budget_key, build_prompt)
+        prompt = build_prompt(cast(State, {**state, budget_key: budgeted.text}))
+        return prompt, State(prompt_budget={agent: budgeted.report()})
+
+    def node(state: State) -> State:
+        if reuse_existing and all(state.get(key) for key in output_keys):
+            publish_progress("node", node=agent, skipped=True)
+            return {}
+        started = time.perf_counter()
+        # the model this node is routed to for this CV, see agent/model_routing.py
+        with routed_to(route_node(agent, state)), node_span(agent, node_model_id()):
+            prompt, output = prepare(state)
+            on_token = get_token_publisher() if stream_tokens else None
+            schema = get_node_output_schema(agent)
+            # responses are cached once they are parsed, a retry asks again for one that was not
+            with deferred_cache_writes():
+                with structured_output(schema):
+                    text = invoke_llm(prompt, on_token=on_token)
+                    if schema is not None:
+                        text = _validate_or_repair(agent, schema, prompt, text)
+                response = to_state(text)
+        capture_trace(agent=agent, prompt=prompt, response="\n".join(map(str, response.values())))
+        publish_progress("node", node=agent, skipped=False, duration=time.perf_counter() - started)
+        output.update(response)
+        return output
+
+    async def anode(state: State) -> State:
+        if reuse_existing and all(state.get(key) for key in output_keys):
+            await apublish_progress("node", node=agent, skipped=True)
+            return {}
+        started = time.perf_counter()
+        # the model this node is routed to for this CV, see agent/model_routing.py
+        with routed_to(route_node(agent, state)), node_span(agent, node_model_id()):
+            prompt, output = prepare(state)
+            on_token = get_token_publisher() if stream_tokens else None
+            schema = get_node_output_schema(agent)
+            async with adeferred_cache_writes():
+                with structured_output(schema):
+                    text = await ainvoke_llm(prompt, on_token=on_token)
+                    if schema is not None:
+                        text = await _avalidate_or_repair(agent, schema, prompt, text)
+                response = to_state(text)
+        capture_trace(agent=agent, prompt=prompt, response="\n".join(map(str, response.values())))
+        await apublish_progress("node", node=agent, skipped=False, duration=time.perf_counter() - started)
+        output.update(response)
+        return output
+
+    return RunnableLambda(node, afunc=anode, name=agent)
+
+
+def llm_node(
+    agent: str,
+    output_key: str,
+    build_prompt: Callable[[State], str],
+    parse: Callable[[str], str] = parse_markdown_json,
+    reuse_existing: bool = False,
+    stream_tokens: bool = False,
+    budget_key: Optional[str] = None,
+) -> RunnableLambda:
+    """
+    Build a workflow node that sends `build_prompt(state)` to the LLM and stores the parsed
+    response under `output_key`.
+
+    The node has both a sync and an async implementation, so the same graph can be run with
+    `invoke` (one scan per worker process) or `ainvoke` (many scans on one event loop).
+    Each node only returns the key it produces, independent branches run concurrently
+    and langgraph merges their updates into the shared state.
+
+    With `reuse_existing`, the LLM call is skipped when the workflow input already has a value
+    for `output_key` (eg: skills extracted earlier for the same job description).
+    With `stream_tokens`, the response is streamed to the scan progress channel, see agent/progress.py.
+    With `budget_key`, that text (the CV) is compacted and trimmed so the prompt fits the agent's
+    token budget, how much was dropped is reported under `prompt_budget`, see agent/token_budget.py.
+    Agents with an output schema get their json response validated and repaired, see agent/output_schemas.py.
+    """
+    return _llm_node(
+        agent,
+        [output_key],
+        build_prompt,
+        lambda response: cast(State, {output_key: parse(response)}),
+        reuse_existing,
+        stream_tokens,
+        budget_key,
+    )
+
+
+def split_fused_output(response: str, output_keys: Dict[str, str]) -> State:
+    """
+    Split one json object into the separate json strings the split pipeline would have produced.
+
+    `output_keys` maps a field of the response to the state key its value is stored under.
+    """
+    try:
+        data = json.loads(parse_markdown_json(response))
+        return cast(State, {state_key: json.dumps(data[field]) for field, state_key in output_keys.items()})
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        raise ValueError(f"fused LLM response is missing {list(output_keys)}") from e
+
+
+def fused_llm_node(
+    agent: str,
+    output_keys: Dict[str, str],
+    build_prompt: Callable[[State], str],
+    reuse_existing: bool = False,
+    budget_key: Optional[str] = None,
+) -> RunnableLambda:
+    """Like `llm_node`, but one LLM call produces several state keys, see `split_fused_output`."""
+    return _llm_node(
+        agent,
+        list(output_keys.values()),
+        build_prompt,
+        lambda response: split_fused_output(response, output_keys),
+        reuse_existing,
+        budget_key=budget_key,
     )
 
-    anonymizer_input: List[entities.RecognizerResult] = []
-    for result in analyzer_results:
-        anonymizer_input.append(
-            entities.RecognizerResult(
-                entity_type=result.entity_type,
-                start=result.start,
-                end=result.end,
-                score=result.score,
-            )
-        )
 
-    anonymize_engine = AnonymizerEngine()
-    anonymized_cv_text = anonymize_engine.anonymize(text=state["raw_cv_text"], analyzer_results=anonymizer_input)
-    state["anonymized_cv_text"] = anonymized_cv_text.text
-    print_agent_prompt_and_response(
+# nodes (agents)
+def _anonymize(state: State) -> State:
+    if state.get("anonymized_cv_text"):
+        # already stored on the CV for this cv_text
+        publish_progress("node", node="anonymizer_agent", skipped=True)
+        return {}
+    started = time.perf_counter()
+    with node_span("anonymizer_agent"):
+        # engines are loaded once per process, see agent/anonymizer.py
+        anonymized_cv_text = anonymize_text(state["raw_cv_text"])
+    capture_trace(
         agent="anonymizer_agent",
         prompt="None",
-        response=state["anonymized_cv_text"],
+        response=anonymized_cv_text,
     )
-    return state
+    publish_progress("node", node="anonymizer_agent", skipped=False, duration=time.perf_counter() - started)
+    return {"anonymized_cv_text": anonymized_cv_text}
+
+
+async def _aanonymize(state: State) -> State:
+    if state.get("anonymized_cv_text"):
+        await apublish_progress("node", node="anonymizer_agent", skipped=True)
+        return {}
+    # spacy is CPU bound, keep it off the event loop
+    return await asyncio.to_thread(_anonymize, state)
+
 
+anonymizer_agent = RunnableLambda(_anonymize, afunc=_aanonymize, name="anonymizer_agent")
 
-def preprocess_agent(state: State) -> State:
-    llm = get_llm()
-    prompt = f"""
-    {PROMPTS["preprocess"]}
+
+def preprocess_prompt(state: State) -> str:
+    # https://docs.langchain.com/oss/python/integrations/llms/google_generative_ai
+    return f"""
+    {node_prompts()["preprocess"]}
 
     CV Text:
     {state["anonymized_cv_text"]}
     """
-    # https://docs.langchain.com/oss/python/integrations/llms/google_generative_ai
-    state["preprocessed_cv_text"] = llm.invoke(prompt).text
-    print_agent_prompt_and_response(
-        agent="preprocess_agent",
-        prompt=prompt,
-        response=state["preprocessed_cv_text"],
-    )
-    time.sleep(SLEEP_DURATION)
-    return state
 
 
-def hard_skill_identifier_agent(state: State) -> State:
-    llm = get_llm()
-    prompt = f"""
-    {PROMPTS["hard_skill_identifier"]}
+def hard_skill_identifier_prompt(state: State) -> str:
+    return f"""
+    {node_prompts()["hard_skill_identifier"]}
 
     Job Description:
     {state["job_description"]}
     """
-    state["identified_hard_skills"] = parse_markdown_json(llm.invoke(prompt).text)
-    print_agent_prompt_and_response(
-        agent="hard_skill_identifier_agent",
-        prompt=prompt,
-        response=str(state["identified_hard_skills"]),
-    )
-    time.sleep(SLEEP_DURATION)
-    return state
 
 
-def soft_skill_identifier_agent(state: State) -> State:
-    llm = get_llm()
-    prompt = f"""
-    {PROMPTS["soft_skill_identifier"]}
+def soft_skill_identifier_prompt(state: State) -> str:
+    return f"""
+    {node_prompts()["soft_skill_identifier"]}
 
     Job Description:
     {state["job_description"]}
     """
-    state["identified_soft_skills"] = parse_markdown_json(llm.invoke(prompt).text)
-    print_agent_prompt_and_response(
-        agent="soft_skill_identifier_agent",
-        prompt=prompt,
-        response=str(state["identified_soft_skills"]),
-    )
-    time.sleep(SLEEP_DURATION)
-    return state
 
 
-def hard_skill_analyzer_agent(state: State) -> State:
-    llm = get_llm()
-    prompt = f"""
-    {PROMPTS["hard_skill_analyzer"]}
+def hard_skill_analyzer_prompt(state: State) -> str:
+    return f"""
+    {node_prompts()["hard_skill_analyzer"]}
 
     Required Hard Skills:
     {state["identified_hard_skills"]}
@@ -203,20 +705,11 @@ def hard_skill_analyzer_agent(state: State) -> State:
     - short justification for each
     - overall match quality in simple words
     """
-    state["hard_skill_analyser_output"] = parse_markdown_json(llm.invoke(prompt).text)
-    print_agent_prompt_and_response(
-        agent="hard_skill_analyzer_agent",
-        prompt=prompt,
-        response=state["hard_skill_analyser_output"],
-    )
-    time.sleep(SLEEP_DURATION)
-    return state
 
 
-def soft_skill_analyzer_agent(state: State) -> State:
-    llm = get_llm()
-    prompt = f"""
-    {PROMPTS["soft_skill_analyzer"]}
+def soft_skill_analyzer_prompt(state: State) -> str:
+    return f"""
+    {node_prompts()["soft_skill_analyzer"]}
 
     Required Soft Skills:
     {state["identified_soft_skills"]}
@@ -230,20 +723,41 @@ def soft_skill_analyzer_agent(state: State) -> State:
     - short justification for each
     - overall match quality in simple words
     """
-    state["soft_skill_analyser_output"] = parse_markdown_json(llm.invoke(prompt).text)
-    print_agent_prompt_and_response(
-        agent="soft_skill_analyzer_agent",
-        prompt=prompt,
-        response=state["soft_skill_analyser_output"],
-    )
-    time.sleep(SLEEP_DURATION)
-    return state
 
 
-def summary_generator_agent(state: State) -> State:
-    llm = get_llm()
-    prompt = f"""
-    {PROMPTS["summary_generator"]}
+def skill_identifier_prompt(state: State) -> str:
+    return f"""
+    {node_prompts().get("skill_identifier", "")}
+
+    Job Description:
+    {state["job_description"]}
+    """
+
+
+def skill_analyzer_prompt(state: State) -> str:
+    return f"""
+    {node_prompts().get("skill_analyzer", "")}
+
+    Required Hard Skills:
+    {state["identified_hard_skills"]}
+
+    Required Soft Skills:
+    {state["identified_soft_skills"]}
+
+    Preprocessed CV:
+    {state["preprocessed_cv_text"]}
+
+    Explain, separately for hard and soft skills:
+    - which required skills are present
+    - which required skills are missing
+    - short justification for each
+    - overall match quality in simple words
+    """
+
+
+def summary_generator_prompt(state: State) -> str:
+    return f"""
+    {node_prompts()["summary_generator"]}
 
     Hard Skill Analysis:
     {state["hard_skill_analyser_output"]}
@@ -251,40 +765,307 @@ def summary_generator_agent(state: State) -> State:
     Soft Skill Analysis:
     {state["soft_skill_analyser_output"]}
     """
-    state["summary_generator_output"] = parse_markdown_json(llm.invoke(prompt).text)
-    print_agent_prompt_and_response(
-        agent="summary_generator_agent",
-        prompt=prompt,
-        response=state["summary_generator_output"],
+
+
+def _keep_text(response: str) -> str:
+    return response
+
+
+# preprocess returns plain text, everything else is json
+# CV side artifacts are passed in when already stored on the CV
+preprocess_llm_agent = llm_node(
+    "preprocess_agent",
+    "preprocessed_cv_text",
+    preprocess_prompt,
+    parse=_keep_text,
+    reuse_existing=True,
+    budget_key="anonymized_cv_text",
+)
+
+
+def _preprocess_chunks(state: State) -> Optional[List[str]]:
+    """Section aligned chunks of a long CV when chunked preprocessing is on, None when one call will do."""
+    if not settings.AGENT_PREPROCESS_CHUNKING or state.get("preprocessed_cv_text"):
+        return None
+    text = compact_text(state["anonymized_cv_text"])
+    # every chunk has to fit the preprocess budget on its own
+    overhead = estimate_tokens(preprocess_prompt(State(anonymized_cv_text="")))
+    chunk_tokens = min(
+        settings.AGENT_PREPROCESS_CHUNK_TOKENS, get_node_budget("preprocess_agent", node_model()) - overhead
+    )
+    if estimate_tokens(text) <= chunk_tokens:
+        return None
+    return chunk_text(text, chunk_tokens)
+
+
+def _preprocess_chunk(index: int, chunk: str) -> str:
+    with tracer.start_as_current_span("preprocess_agent.chunk", attributes={"agent.chunk.index": index}):
+        return invoke_llm(preprocess_prompt(State(anonymized_cv_text=chunk)))
+
+
+async def _apreprocess_chunk(index: int, chunk: str, semaphore: asyncio.Semaphore) -> str:
+    async with semaphore:
+        with tracer.start_as_current_span("preprocess_agent.chunk", attributes={"agent.chunk.index": index}):
+            return await ainvoke_llm(preprocess_prompt(State(anonymized_cv_text=chunk)))
+
+
+def _merge_preprocessed_chunks(state: State, chunks: List[str], responses: List[str], started: float) -> State:
+    # reduce: the chunk summaries in CV order, no extra LLM call
+    preprocessed_cv_text = "\n\n".join(response.strip() for response in responses)
+    capture_trace(agent="preprocess_agent", prompt=f"{len(chunks)} chunks", response=preprocessed_cv_text)
+    publish_progress(
+        "node", node="preprocess_agent", skipped=False, duration=time.perf_counter() - started, chunks=len(chunks)
+    )
+    original_tokens = estimate_tokens(state["anonymized_cv_text"])
+    report = {
+        "budget": settings.AGENT_PREPROCESS_CHUNK_TOKENS,
+        "original_tokens": original_tokens,
+        # only what compaction removed, chunking itself keeps everything
+        "dropped_tokens": max(original_tokens - sum(estimate_tokens(chunk) for chunk in chunks), 0),
+    }
+    return State(preprocessed_cv_text=preprocessed_cv_text, prompt_budget={"preprocess_agent": report})
+
+
+def _preprocess(state: State) -> State:
+    with routed_to(route_node("preprocess_agent", state)):
+        chunks = _preprocess_chunks(state)
+    if chunks is None:
+        return preprocess_llm_agent.invoke(state)
+    started = time.perf_counter()
+    # chunk calls go to the preprocess route as well, the context is copied into the pool
+    with routed_to(route_node("preprocess_agent", state)), node_span("preprocess_agent", node_model_id()):
+        workers = min(settings.AGENT_PREPROCESS_CHUNK_CONCURRENCY, len(chunks))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # each chunk call keeps the cache mode, progress channel and span of the scan
+            futures = [
+                pool.submit(contextvars.copy_context().run, _preprocess_chunk, index, chunk)
+                for index, chunk in enumerate(chunks)
+            ]
+            responses = [future.result() for future in futures]
+    return _merge_preprocessed_chunks(state, chunks, responses, started)
+
+
+async def _apreprocess(state: State) -> State:
+    with routed_to(route_node("preprocess_agent", state)):
+        chunks = _preprocess_chunks(state)
+    if chunks is None:
+        return await preprocess_llm_agent.ainvoke(state)
+    started = time.perf_counter()
+    with routed_to(route_node("preprocess_agent", state)), node_span("preprocess_agent", node_model_id()):
+        semaphore = asyncio.Semaphore(settings.AGENT_PREPROCESS_CHUNK_CONCURRENCY)
+        responses = await asyncio.gather(
+            *[_apreprocess_chunk(index, chunk, semaphore) for index, chunk in enumerate(chunks)]
+        )
+    return _merge_preprocessed_chunks(state, chunks, list(responses), started)
+
+
+# Long CVs can be preprocessed as chunks in parallel (map-reduce), see AGENT_PREPROCESS_CHUNKING
+preprocess_agent = RunnableLambda(_preprocess, afunc=_apreprocess, name="preprocess_agent")
+# identified skills only depend on the job description, they are passed in when already known
+hard_skill_identifier_agent = llm_node(
+    "hard_skill_identifier_agent", "identified_hard_skills", hard_skill_identifier_prompt, reuse_existing=True
+)
+soft_skill_identifier_agent = llm_node(
+    "soft_skill_identifier_agent", "identified_soft_skills", soft_skill_identifier_prompt, reuse_existing=True
+)
+# long CVs are trimmed to the node's token budget before they are sent, see agent/token_budget.py
+hard_skill_analyzer_llm_agent = llm_node(
+    "hard_skill_analyzer_agent",
+    "hard_skill_analyser_output",
+    hard_skill_analyzer_prompt,
+    budget_key="preprocessed_cv_text",
+)
+soft_skill_analyzer_agent = llm_node(
+    "soft_skill_analyzer_agent",
+    "soft_skill_analyser_output",
+    soft_skill_analyzer_prompt,
+    budget_key="preprocessed_cv_text",
+)
+# the summary is what users wait for, its tokens are pushed to progress listeners as they arrive
+summary_generator_agent = llm_node(
+    "summary_generator_agent", "summary_generator_output", summary_generator_prompt, stream_tokens=True
+)
+
+
+# fused pipeline mode, see agent/prompts.py
+skill_identifier_agent = fused_llm_node(
+    "skill_identifier_agent",
+    {"identified_hard_skills": "identified_hard_skills", "identified_soft_skills": "identified_soft_skills"},
+    skill_identifier_prompt,
+    reuse_existing=True,
+)
+skill_analyzer_llm_agent = fused_llm_node(
+    "skill_analyzer_agent",
+    {"hard_skill_analysis": "hard_skill_analyser_output", "soft_skill_analysis": "soft_skill_analyser_output"},
+    skill_analyzer_prompt,
+    budget_key="preprocessed_cv_text",
+)
+
+
+def _rule_skill_match(state: State) -> Optional[SkillMatch]:
+    """Required hard skills matched against the skill taxonomy, None when AGENT_SKILL_MATCHING leaves it to the LLM."""
+    if settings.AGENT_SKILL_MATCHING == "llm":
+        return None
+    required = parse_required_skills(state["identified_hard_skills"])
+    if required is None:
+        return None
+    # preprocessing may have summarized skill names away, the anonymized CV still has them
+    cv_text = "\n".join(filter(None, [state.get("anonymized_cv_text"), state.get("preprocessed_cv_text")]))
+    return get_skill_matcher().match(required, cv_text)
+
+
+def _rule_skill_analysis(agent: str, match: SkillMatch) -> State:
+    started = time.perf_counter()
+    with node_span(agent):
+        response = json.dumps(match.as_analysis())
+    capture_trace(agent=agent, prompt="rule based skill match", response=response)
+    publish_progress(
+        "node",
+        node=agent,
+        skipped=False,
+        duration=time.perf_counter() - started,
+        rules=True,
     )
-    return state
-
-
-graph = StateGraph(State)
-
-# adding agents
-graph.add_node("anonymizer_agent", anonymizer_agent)
-graph.add_node("preprocess_agent", preprocess_agent)
-graph.add_node("hard_skill_identifier_agent", hard_skill_identifier_agent)
-graph.add_node("soft_skill_identifier_agent", soft_skill_identifier_agent)
-graph.add_node("hard_skill_analyzer_agent", hard_skill_analyzer_agent)
-graph.add_node("soft_skill_analyzer_agent", soft_skill_analyzer_agent)
-graph.add_node("summary_generator_agent", summary_generator_agent)
-
-# adding edges
-graph.set_entry_point("anonymizer_agent")
-graph.add_edge("anonymizer_agent", "preprocess_agent")
-graph.add_edge("preprocess_agent", "hard_skill_identifier_agent")
-graph.add_edge("hard_skill_identifier_agent", "soft_skill_identifier_agent")
-graph.add_edge("soft_skill_identifier_agent", "hard_skill_analyzer_agent")
-graph.add_edge("hard_skill_analyzer_agent", "soft_skill_analyzer_agent")
-graph.add_edge("soft_skill_analyzer_agent", "summary_generator_agent")
-graph.set_finish_point("summary_generator_agent")
+    return State(hard_skill_analyser_output=response)
+
+
+def _narrow_required_skills(state: State, match: SkillMatch) -> State:
+    # the LLM only judges what the rules did not find
+    return cast(
+        State,
+        {
+            **state,
+            "identified_hard_skills": json.dumps({"found_hard_skills": match.to_judge}),
+        },
+    )
+
+
+def _merge_rule_skill_match(match: SkillMatch, output: State) -> State:
+    try:
+        analysis = json.loads(output["hard_skill_analyser_output"])
+    except (json.JSONDecodeError, KeyError):
+        return output
+    output["hard_skill_analyser_output"] = json.dumps(match.merge_analysis(analysis))
+    return output
+
+
+def skill_matched_node(llm_agent: RunnableLambda, agent: str, rules_only: bool) -> RunnableLambda:
+    """
+    Wrap an analyzer node so the required hard skills are matched against the skill taxonomy first,
+    see AGENT_SKILL_MATCHING and agent/skill_matcher.py.
+
+    In "prefilter" mode the LLM only judges the skills the rules did not find and both verdicts are merged.
+    With `rules_only` (the analyzer has nothing else to do) the LLM call is skipped in "rules" mode,
+    and in "prefilter" mode when the rules found every required skill.
+    """
+
+    def rules_decide(match: SkillMatch) -> bool:
+        return rules_only and (settings.AGENT_SKILL_MATCHING == "rules" or not match.to_judge)
+
+    def node(state: State) -> State:
+        match = _rule_skill_match(state)
+        if match is None:
+            return llm_agent.invoke(state)
+        if rules_decide(match):
+            return _rule_skill_analysis(agent, match)
+        return _merge_rule_skill_match(match, llm_agent.invoke(_narrow_required_skills(state, match)))
+
+    async def anode(state: State) -> State:
+        match = _rule_skill_match(state)
+        if match is None:
+            return await llm_agent.ainvoke(state)
+        if rules_decide(match):
+            return _rule_skill_analysis(agent, match)
+        return _merge_rule_skill_match(match, await llm_agent.ainvoke(_narrow_required_skills(state, match)))
+
+    return RunnableLambda(node, afunc=anode, name=agent)
+
+
+# string matching decides most hard skills without an LLM call, see AGENT_SKILL_MATCHING
+hard_skill_analyzer_agent = skill_matched_node(hard_skill_analyzer_llm_agent, "hard_skill_analyzer_agent", True)
+# soft skills still need the LLM, "rules" mode works as "prefilter" here
+skill_analyzer_agent = skill_matched_node(skill_analyzer_llm_agent, "skill_analyzer_agent", False)
+
+
+def build_graph(pipeline_mode: PipelineMode) -> StateGraph:
+    """
+    The graph follows the real data dependencies instead of a single chain:
+    - CV branch: anonymizer -> preprocess
+    - job branch: skill identifiers only need the job description, so they start right away
+    - each analyzer waits for preprocess and its identifier
+    - summary waits for the analyzers
+
+    In "fused" mode the hard/soft identifier and analyzer pairs are single nodes (one LLM call each).
+    """
+    graph = StateGraph(State)
+
+    # adding agents
+    graph.add_node("anonymizer_agent", anonymizer_agent)
+    graph.add_node("preprocess_agent", preprocess_agent)
+    graph.add_node("summary_generator_agent", summary_generator_agent)
+
+    # adding edges
+    graph.add_edge(START, "anonymizer_agent")
+    graph.add_edge("anonymizer_agent", "preprocess_agent")
+
+    if pipeline_mode == "fused":
+        graph.add_node("skill_identifier_agent", skill_identifier_agent)
+        graph.add_node("skill_analyzer_agent", skill_analyzer_agent)
+
+        graph.add_edge(START, "skill_identifier_agent")
+        graph.add_edge(["preprocess_agent", "skill_identifier_agent"], "skill_analyzer_agent")
+        graph.add_edge("skill_analyzer_agent", "summary_generator_agent")
+    else:
+        graph.add_node("hard_skill_identifier_agent", hard_skill_identifier_agent)
+        graph.add_node("soft_skill_identifier_agent", soft_skill_identifier_agent)
+        graph.add_node("hard_skill_analyzer_agent", hard_skill_analyzer_agent)
+        graph.add_node("soft_skill_analyzer_agent", soft_skill_analyzer_agent)
+
+        graph.add_edge(START, "hard_skill_identifier_agent")
+        graph.add_edge(START, "soft_skill_identifier_agent")
+        graph.add_edge(["preprocess_agent", "hard_skill_identifier_agent"], "hard_skill_analyzer_agent")
+        graph.add_edge(["preprocess_agent", "soft_skill_identifier_agent"], "soft_skill_analyzer_agent")
+        graph.add_edge(["hard_skill_analyzer_agent", "soft_skill_analyzer_agent"], "summary_generator_agent")
+
+    graph.add_edge("summary_generator_agent", END)
+    return graph
+
 
 # Currently we are only chaining LLM responses so it is called workflow not agent.
 # once we attach tools and let LLM to decied what to do it will become agent(s)
 # Hope we could do it too.
-steam_line_workflow = graph.compile()
+def compile_workflow(checkpointer: Optional[BaseCheckpointSaver] = None) -> CompiledStateGraph:
+    """
+    With a checkpointer, the state is saved after every step under the `thread_id` of the run config,
+    so a failed run invoked again with `None` as input resumes at the node that failed.
+    """
+    # a node routed to a model without its prompt fails here instead of mid scan
+    get_routing_table().validate(model_prompts, NODE_PROMPT_KEYS)
+    return build_graph(PIPELINE_MODE).compile(checkpointer=checkpointer)
+
+
+steam_line_workflow = compile_workflow()
+
+
+# Only the CV side of the workflow, run in the background right after a CV is uploaded so the
+# anonymized and preprocessed text are ready (and stored on the CV) before the first scans need them.
+cv_artifacts_graph = StateGraph(State)
+cv_artifacts_graph.add_node("anonymizer_agent", anonymizer_agent)
+cv_artifacts_graph.add_node("preprocess_agent", preprocess_agent)
+cv_artifacts_graph.add_edge(START, "anonymizer_agent")
+cv_artifacts_graph.add_edge("anonymizer_agent", "preprocess_agent")
+cv_artifacts_graph.add_edge("preprocess_agent", END)
+cv_artifacts_workflow = cv_artifacts_graph.compile()
+
+
+def get_workflow_config(thread_id: Optional[str] = None) -> RunnableConfig:
+    # caps how many nodes of a single scan run at the same time
+    config: RunnableConfig = {"max_concurrency": settings.AGENT_MAX_CONCURRENCY}
+    if thread_id is not None:
+        # checkpoints of a checkpointed workflow are stored under this id
+        config["configurable"] = {"thread_id": thread_id}
+    return config
+
 
 # raw_cv_text = """
 # Python developer with Django experience.
@@ -0,0 +1,164 @@
+import contextlib
+import contextvars
+import datetime
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from langchain_core.messages.ai import UsageMetadata
+from opentelemetry import metrics, trace
+from opentelemetry.trace import Span
+
+# Spans and metrics go through the providers set up in config/otel.py (no-ops when it is not configured)
+tracer = trace.get_tracer(__name__)
+meter = metrics.get_meter(__name__)
+
+node_duration_histogram = meter.create_histogram(
+    "agent.node.duration",
+    unit="s",
+    description="Time spent in a workflow node (agent), including LLM rate limit waits",
+)
+queue_wait_histogram = meter.create_histogram(
+    "agent.queue.wait",
+    unit="s",
+    description="Time waited before work could start: scans for a celery worker, LLM calls for rate limit budget",
+)
+token_counter = meter.create_counter(
+    "agent.llm.tokens",
+    unit="{token}",
+    description="Prompt and response tokens reported by the LLM provider",
+)
+provider_call_counter = meter.create_counter(
+    "agent.llm.provider.calls",
+    unit="{call}",
+    description="LLM calls per provider and outcome, the same outcomes steer the routing (see agent/llm_router.py)",
+)
+provider_duration_histogram = meter.create_histogram(
+    "agent.llm.provider.duration",
+    unit="s",
+    description="Time an LLM provider took to answer or fail",
+)
+
+
+class NodeLLMTotals:
+    """
+    LLM calls of a node added up on its span, a node may call the LLM again to repair a response.
+
+    Calls of one node can run on several threads at once (preprocess chunk pool, hedged calls),
+    the totals are only changed under the lock.
+    """
+
+    def __init__(self, span: Span):
+        self._lock = threading.Lock()
+        self._span = span
+        self._totals: Dict[str, Any] = {}
+
+    def add(self, event: Dict[str, Any]):
+        with self._lock:
+            totals = self._totals
+            totals["llm.calls"] = totals.get("llm.calls", 0) + 1
+            totals["llm.cache_hit"] = totals.get("llm.cache_hit", False) or event["llm.cache_hit"]
+            for key in (
+                "llm.retries",
+                "llm.rate_limit_wait",
+                "gen_ai.usage.input_tokens",
+                "gen_ai.usage.output_tokens",
+            ):
+                if key in event:
+                    totals[key] = totals.get(key, 0) + event[key]
+            # under the lock too, a thread setting older totals last would lose calls
+            self._span.set_attributes(totals)
+
+
+# Totals of the node span running in the current context, copied into the threads the node starts
+_node_llm_totals: contextvars.ContextVar[Optional[NodeLLMTotals]] = contextvars.ContextVar(
+    "node_llm_totals", default=None
+)
+
+
+@contextlib.contextmanager
+def node_span(agent: str, model: Optional[str] = None) -> Iterator[Span]:
+    """
+    Run a workflow node inside a span named after the agent and record its duration.
+
+    LLM calls made inside the block add their details to the span, see `record_llm_call`.
+    """
+    attributes: Dict[str, Any] = {"agent.name": agent}
+    if model:
+        attributes["gen_ai.request.model"] = model
+    started = time.perf_counter()
+    with tracer.start_as_current_span(agent, attributes=attributes) as span:
+        totals_token = _node_llm_totals.set(NodeLLMTotals(span))
+        try:
+            yield span
+        except Exception as e:
+            attributes["error.type"] = type(e).__name__
+            raise
+        finally:
+            node_duration_histogram.record(time.perf_counter() - started, attributes)
+            _node_llm_totals.reset(totals_token)
+
+
+def record_llm_call(
+    model: str,
+    cache_hit: bool,
+    usage: Optional[UsageMetadata] = None,
+    rate_limit_wait: float = 0.0,
+    retries: int = 0,
+):
+    """
+    Attach an LLM call to the current span and count its tokens.
+
+    Every call is a `llm.call` span event. The node span attributes add up the calls of the node (repair and chunk
+    calls included): `llm.cache_hit` is set when any call was served from the cache, retries, waits and tokens are sums.
+    """
+    span = trace.get_current_span()
+    event: Dict[str, Any] = {
+        "gen_ai.request.model": model,
+        "llm.cache_hit": cache_hit,
+        "llm.retries": retries,
+        "llm.rate_limit_wait": rate_limit_wait,
+    }
+    if usage:
+        event["gen_ai.usage.input_tokens"] = usage["input_tokens"]
+        event["gen_ai.usage.output_tokens"] = usage["output_tokens"]
+    span.add_event("llm.call", event)
+
+    # outside a node span, the attributes describe this call only
+    (_node_llm_totals.get() or NodeLLMTotals(span)).add(event)
+
+    if not cache_hit:
+        queue_wait_histogram.record(rate_limit_wait, {"queue": "rate_limit", "gen_ai.request.model": model})
+    if usage:
+        token_counter.add(usage["input_tokens"], {"gen_ai.request.model": model, "gen_ai.token.type": "input"})
+        token_counter.add(usage["output_tokens"], {"gen_ai.request.model": model, "gen_ai.token.type": "output"})
+
+
+def record_provider_call(provider: str, outcome: str, duration: float):
+    attributes = {"llm.provider": provider, "llm.outcome": outcome}
+    provider_call_counter.add(1, attributes)
+    provider_duration_histogram.record(duration, attributes)
+
+
+def record_task_queue_wait(task_name: str, enqueued_at: Optional[float], eta: Optional[str] = None):
+    """
+    Time a celery task spent in the queue, `enqueued_at` is set when publishing (see config/celery.py).
+
+    A retry scheduled with a countdown is only counted as waiting once its eta has passed.
+    """
+    if enqueued_at is None:
+        # eager tasks are never published
+        return
+    ready_at = enqueued_at
+    if eta:
+        ready_at = max(ready_at, datetime.datetime.fromisoformat(eta).timestamp())
+    queue_wait_histogram.record(max(time.time() - ready_at, 0.0), {"queue": "celery", "celery.task_name": task_name})
+
+
+@contextlib.contextmanager
+def scan_span(scan_id: int, attempt: int, resumed: bool) -> Iterator[Span]:
+    """Parent span of the node spans of one scan attempt, `attempt` is the number of earlier retries."""
+    with tracer.start_as_current_span(
+        "agent.scan", attributes={"cv_scan.id": scan_id, "agent.scan.attempt": attempt, "agent.scan.resumed": resumed}
+    ) as span:
+        yield span
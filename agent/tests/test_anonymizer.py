@@ -0,0 +1,236 @@
+from unittest import mock
+
+import billiard
+from django.test import SimpleTestCase, override_settings
+from presidio_anonymizer import AnonymizerEngine
+
+from agent import anonymizer
+from agent.anonymizer import (
+    ANONYMIZER_PROFILES,
+    CV_ENTITIES,
+    SPACY_MODEL_NAME,
+    EngineRegistry,
+    anonymize_text,
+    anonymize_texts,
+    split_text,
+)
+from agent.anonymizer_samples import ANONYMIZER_SAMPLES
+from config.celery import init_anonymizer_engines
+
+
+class EngineRegistryTestCase(SimpleTestCase):
+    def setUp(self):
+        provider_patcher = mock.patch("agent.anonymizer.NlpEngineProvider")
+        analyzer_patcher = mock.patch("agent.anonymizer.AnalyzerEngine")
+        anonymizer_patcher = mock.patch("agent.anonymizer.AnonymizerEngine")
+        self.provider = provider_patcher.start()
+        self.analyzer = analyzer_patcher.start()
+        self.anonymizer = anonymizer_patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.analyzer.return_value.analyze.return_value = []
+        self.anonymizer.return_value.anonymize.return_value = mock.Mock(text="anonymized")
+
+    def test_engines_are_loaded_once(self):
+        registry = EngineRegistry()
+        self.assertFalse(registry.is_loaded)
+
+        first = registry.get_analyzer()
+        second = registry.get_analyzer()
+        registry.get_anonymizer()
+
+        self.assertIs(first, second)
+        self.assertTrue(registry.is_loaded)
+        self.provider.assert_called_once()
+        self.analyzer.assert_called_once()
+        self.anonymizer.assert_called_once()
+
+    def test_load_records_metrics(self):
+        registry = EngineRegistry()
+        registry.load()
+        self.assertGreaterEqual(registry.metrics.load_seconds, 0)
+        self.assertGreater(registry.metrics.load_max_rss_kb, 0)
+        self.assertIsNotNone(registry.metrics.loaded_at)
+
+    def test_warm_up_runs_a_document_through_the_engines(self):
+        registry = EngineRegistry()
+        registry.warm_up("John Smith")
+        self.analyzer.return_value.analyze.assert_called_once_with(text="John Smith", language="en")
+        self.anonymizer.return_value.anonymize.assert_called_once()
+
+    def test_reset_forces_reload(self):
+        registry = EngineRegistry()
+        registry.load()
+        registry.reset()
+        self.assertFalse(registry.is_loaded)
+        registry.load()
+        self.assertEqual(self.provider.call_count, 2)
+
+
+class AnonymizeTextsTestCase(SimpleTestCase):
+    def setUp(self):
+        self.registry = mock.Mock()
+        self.registry.profile = ANONYMIZER_PROFILES["full"]
+        self.registry.get_anonymizer.return_value.anonymize.side_effect = lambda text, analyzer_results: mock.Mock(
+            text=f"<{text}:{len(analyzer_results)}>"
+        )
+        batch_patcher = mock.patch("agent.anonymizer.BatchAnalyzerEngine")
+        self.batch_analyzer = batch_patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_returns_results_in_input_order(self):
+        self.batch_analyzer.return_value.analyze_iterator.return_value = [[], [], []]
+        result = anonymize_texts(["a", "b", "c"], registry=self.registry)
+        self.assertEqual(result, ["<a:0>", "<b:0>", "<c:0>"])
+
+    def test_passes_batch_settings_to_spacy(self):
+        self.batch_analyzer.return_value.analyze_iterator.return_value = [[]]
+        anonymize_texts(["a"], batch_size=8, n_process=2, registry=self.registry)
+        self.batch_analyzer.return_value.analyze_iterator.assert_called_once_with(
+            texts=["a"], language="en", batch_size=8, n_process=2
+        )
+
+    def test_one_process_in_celery_prefork_children(self):
+        self.batch_analyzer.return_value.analyze_iterator.return_value = [[]]
+        with mock.patch("agent.anonymizer.multiprocessing.current_process", return_value=mock.Mock(daemon=True)):
+            anonymize_texts(["a"], batch_size=8, n_process=2, registry=self.registry)
+        self.batch_analyzer.return_value.analyze_iterator.assert_called_once_with(
+            texts=["a"], language="en", batch_size=8, n_process=1
+        )
+
+    def test_empty_input_does_not_load_engines(self):
+        self.assertEqual(anonymize_texts([], registry=self.registry), [])
+        self.registry.get_analyzer.assert_not_called()
+
+
+class AnonymizerProfileTestCase(SimpleTestCase):
+    def setUp(self):
+        provider_patcher = mock.patch("agent.anonymizer.NlpEngineProvider")
+        spacy_patcher = mock.patch("agent.anonymizer.spacy")
+        analyzer_patcher = mock.patch("agent.anonymizer.AnalyzerEngine")
+        self.provider = provider_patcher.start()
+        self.spacy = spacy_patcher.start()
+        self.analyzer = analyzer_patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.analyzer.return_value.analyze.return_value = []
+
+    def test_fast_profile_needs_no_spacy_model(self):
+        registry = EngineRegistry(profile="fast")
+
+        anonymized = anonymize_text(
+            "Jane Doe, 42 Example Street\njane@example.com | +33 1 4020 5050 | https://jane.dev\n(2019 - 2023)",
+            registry=registry,
+        )
+
+        self.assertEqual(anonymized, "Jane Doe, <LOCATION>\n<EMAIL_ADDRESS> | <PHONE_NUMBER> | <URL>\n(2019 - 2023)")
+        self.provider.assert_not_called()
+        self.spacy.load.assert_not_called()
+        self.assertEqual(anonymize_texts(["jane@example.com"], registry=registry), ["<EMAIL_ADDRESS>"])
+
+    def test_standard_profile_runs_ner_only_on_allowed_entities(self):
+        registry = EngineRegistry(profile="standard")
+
+        anonymize_text("John Smith", registry=registry)
+
+        self.provider.assert_not_called()
+        self.spacy.load.assert_called_once_with(SPACY_MODEL_NAME, enable=["tok2vec", "ner"])
+        self.analyzer.return_value.analyze.assert_called_once_with(
+            text="John Smith", language="en", entities=list(CV_ENTITIES)
+        )
+
+    @override_settings(AGENT_ANONYMIZER_PROFILE="fast")
+    def test_profile_defaults_to_the_setting(self):
+        self.assertEqual(EngineRegistry().profile.name, "fast")
+        with self.assertRaises(ValueError):
+            EngineRegistry(profile="fastest").load()
+
+
+# long enough for many chunk boundaries to fall inside entities
+LONG_CV = "\n".join(sample.text for sample in ANONYMIZER_SAMPLES * 10)
+
+
+@override_settings(
+    AGENT_ANONYMIZER_CHUNK_CHARS=400, AGENT_ANONYMIZER_CHUNK_OVERLAP=100, AGENT_ANONYMIZER_CHUNK_WORKERS=2
+)
+class ChunkedAnonymizationTestCase(SimpleTestCase):
+    def setUp(self):
+        self.registry = EngineRegistry(profile="fast")
+        pool_patcher = mock.patch.object(anonymizer, "anonymizerPoolInstance", None)
+        pool_patcher.start()
+        self.addCleanup(mock.patch.stopall)
+        self.addCleanup(self.shutdown_pool)
+
+    def shutdown_pool(self):
+        if anonymizer.anonymizerPoolInstance is not None:
+            # terminate() could kill a worker holding the queue lock and leave the others waiting for it
+            anonymizer.anonymizerPoolInstance.close()
+            anonymizer.anonymizerPoolInstance.join()
+
+    def test_chunks_overlap_and_own_the_whole_text(self):
+        chunks = split_text(LONG_CV, 400, 100)
+
+        self.assertGreater(len(chunks), 10)
+        self.assertEqual((chunks[0].own_start, chunks[-1].own_end), (0, len(LONG_CV)))
+        for chunk, following in zip(chunks, chunks[1:]):
+            self.assertLessEqual(chunk.end - chunk.start, 400)
+            self.assertEqual(chunk.own_end, following.own_start)
+            self.assertLess(following.start, chunk.end)
+            # cut at whitespace
+            self.assertTrue(LONG_CV[following.start - 1].isspace())
+
+    def test_output_is_identical_to_a_single_pass(self):
+        with override_settings(AGENT_ANONYMIZER_CHUNK_CHARS=0):
+            single_pass = anonymize_text(LONG_CV, registry=self.registry)
+
+        chunked = anonymize_text(LONG_CV, registry=self.registry)
+
+        self.assertEqual(chunked, single_pass)
+        # the chunks ran on the pool
+        self.assertIsNotNone(anonymizer.anonymizerPoolInstance)
+
+    def test_celery_children_get_a_pool(self):
+        # prefork children are daemon processes
+        results: billiard.Queue = billiard.Queue()
+        child = billiard.Process(target=self.anonymize_in_child, args=(results,), daemon=True)
+        child.start()
+        chunked, pooled = results.get(timeout=60)
+        child.join()
+
+        with override_settings(AGENT_ANONYMIZER_CHUNK_CHARS=0):
+            self.assertEqual(chunked, anonymize_text(LONG_CV, registry=self.registry))
+        self.assertTrue(pooled)
+
+    def anonymize_in_child(self, results):
+        chunked = anonymize_text(LONG_CV, registry=self.registry)
+        results.put((chunked, anonymizer.anonymizerPoolInstance is not None))
+        self.shutdown_pool()
+
+    @override_settings(AGENT_ANONYMIZER_CHUNK_WORKERS=1)
+    def test_single_worker_analyzes_in_one_pass(self):
+        with mock.patch.object(self.registry, "get_analyzer") as get_analyzer:
+            get_analyzer.return_value.analyze.return_value = []
+            self.assertEqual(anonymize_text(LONG_CV, registry=self.registry), LONG_CV)
+
+        get_analyzer.return_value.analyze.assert_called_once_with(
+            text=LONG_CV, language="en", entities=list(self.registry.profile.entities or [])
+        )
+        self.assertIsNone(anonymizer.anonymizerPoolInstance)
+
+    def test_spacy_profiles_analyze_in_one_pass(self):
+        # spacy's NER looks at the text around an entity, a chunk could find other entities
+        registry = EngineRegistry(profile="full")
+        with (
+            mock.patch.object(registry, "get_analyzer") as get_analyzer,
+            mock.patch.object(registry, "get_anonymizer", return_value=AnonymizerEngine()),
+        ):
+            get_analyzer.return_value.analyze.return_value = []
+            self.assertEqual(anonymize_text(LONG_CV, registry=registry), LONG_CV)
+
+        get_analyzer.return_value.analyze.assert_called_once_with(text=LONG_CV, language="en")
+        self.assertIsNone(anonymizer.anonymizerPoolInstance)
+
+    @override_settings(AGENT_WARM_UP_ENGINES=False, AGENT_ANONYMIZER_PROFILE="fast")
+    def test_worker_process_starts_the_pool(self):
+        init_anonymizer_engines()
+        self.assertIsNotNone(anonymizer.anonymizerPoolInstance)
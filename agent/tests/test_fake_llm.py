@@ -0,0 +1,87 @@
+import json
+from typing import Dict, cast
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from agent import steam_line_workflow as workflow
+from agent.fake_llm import FakeChatModel, FakeLLMError, detect_agent
+from agent.parseJsonMarkdown import parse_markdown_json
+from agent.prompts import model_prompts
+
+EXPECTED_KEYS = {
+    "hard_skill_identifier": {"extraction_reasoning", "found_hard_skills"},
+    "soft_skill_identifier": {"extraction_reasoning", "found_soft_skills"},
+    "skill_identifier": {"identified_hard_skills", "identified_soft_skills"},
+    "hard_skill_analyzer": {"found_hard_skills", "missing_hard_skills", "match_score", "summary"},
+    "soft_skill_analyzer": {"found_soft_skills", "missing_soft_skills", "match_score", "summary"},
+    "skill_analyzer": {"hard_skill_analysis", "soft_skill_analysis"},
+    "summary_generator": {
+        "overall_match",
+        "experience_level",
+        "strengths",
+        "weaknesses",
+        "recommendations",
+        "final_summary",
+    },
+}
+
+
+class FakeChatModelTestCase(SimpleTestCase):
+    def test_responses_match_every_prompt(self):
+        for model, agent_prompts in model_prompts.items():
+            prompts = cast(Dict[str, str], agent_prompts)
+            llm = FakeChatModel(prompts=prompts)
+            for agent, template in prompts.items():
+                if agent == "pipeline_mode":
+                    continue
+                with self.subTest(model=model, agent=agent):
+                    prompt = f"{template}\n\nJob Description:\nPython and Django developer\n\nCV Text:\nJane, Python"
+                    self.assertEqual(detect_agent(prompt, prompts), agent)
+                    response = llm.invoke(prompt).text
+                    if agent == "preprocess":
+                        self.assertIn("Jane, Python", response)
+                    else:
+                        self.assertEqual(set(json.loads(parse_markdown_json(response))), EXPECTED_KEYS[agent])
+
+    def test_responses_are_deterministic(self):
+        prompts = cast(Dict[str, str], model_prompts["gemini-2.5-flash"])
+        prompt = f"{prompts['hard_skill_identifier']}\nJob Description:\nneed Docker"
+        first = FakeChatModel(prompts=prompts, seed=1).invoke(prompt).text
+        self.assertEqual(FakeChatModel(prompts=prompts, seed=2).invoke(prompt).text, first)
+        self.assertIn("Docker", json.loads(parse_markdown_json(first))["found_hard_skills"])
+
+    def test_latency_and_failures_follow_the_seed(self):
+        latencies = [FakeChatModel(latency=0.5, latency_sigma=0.3, seed=7).sample_latency() for _ in range(2)]
+        self.assertEqual(latencies[0], latencies[1])
+        self.assertEqual(FakeChatModel().sample_latency(), 0)
+
+        with self.assertRaises(FakeLLMError):
+            FakeChatModel(failure_rate=1).invoke("prompt")
+        self.assertEqual(FakeChatModel(failure_rate=0).invoke("prompt").text, "```json\n{}\n```")
+
+
+@override_settings(AGENT_LLM_CACHE_ENABLED=False)
+class FakeChatModelWorkflowTestCase(SimpleTestCase):
+    def setUp(self):
+        patchers: list = [
+            mock.patch.object(workflow, "llmInstance", FakeChatModel(prompts=workflow.PROMPTS)),
+            # rate limit budgets of the real model do not apply
+            mock.patch.object(workflow, "MODEL_ID", f"fake/{workflow.MODEL_NAME}"),
+            mock.patch.object(workflow, "anonymize_text", side_effect=lambda text: text),
+            mock.patch.object(workflow, "capture_trace"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_split_and_fused_pipelines_complete(self):
+        for pipeline_mode in ["split", "fused"]:
+            with self.subTest(pipeline_mode=pipeline_mode):
+                result = (
+                    workflow.build_graph(pipeline_mode)  # type: ignore [arg-type]
+                    .compile()
+                    .invoke({"raw_cv_text": "Python developer", "job_description": "need Python"})  # type: ignore
+                )
+                self.assertIn("match_score", json.loads(result["hard_skill_analyser_output"]))
+                self.assertIn("overall_match", json.loads(result["summary_generator_output"]))
@@ -0,0 +1,51 @@
+from typing import Any, cast
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_ollama import ChatOllama
+
+from agent import http_client
+from agent import steam_line_workflow as workflow
+
+
+@override_settings(AGENT_HTTP_MAX_CONNECTIONS=7, AGENT_HTTP_TIMEOUT=30.0, GEN_AI_API_KEY="test")
+class HttpClientTestCase(SimpleTestCase):
+    def setUp(self):
+        patchers: list = [
+            mock.patch.object(http_client, "transportInstance", None),
+            mock.patch.object(http_client, "asyncTransportInstance", None),
+            mock.patch.object(workflow, "OLLAMA_BASE_URL", "http://ollama:11434"),
+            mock.patch.object(workflow, "GEN_AI_API_KEY", "test"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_ollama_clients_share_one_connection_pool(self):
+        first = cast(ChatOllama, workflow.build_llm("ChatOllama", "qwen2.5:7b"))
+        second = cast(ChatOllama, workflow.build_llm("ChatOllama", "llama3.2"))
+
+        transport = http_client.get_http_transport()
+        self.assertIs(first._client._client._transport, transport)
+        self.assertIs(second._client._client._transport, transport)
+        self.assertIs(first._async_client._client._transport, http_client.get_async_http_transport())
+        self.assertEqual(transport._pool._max_connections, 7)
+        self.assertEqual(first._client._client.timeout.read, 30.0)
+
+    def test_gemini_client_is_pooled_with_a_timeout(self):
+        llm = cast(ChatGoogleGenerativeAI, workflow.build_llm("ChatGoogleGenerativeAI", "gemini-2.5-flash"))
+
+        client: Any = llm.client
+        self.assertEqual(client._api_client._httpx_client._transport._pool._max_connections, 7)
+        self.assertEqual(llm.timeout, 30.0)
+
+    @override_settings(AGENT_HTTP2=True)
+    def test_http2_needs_h2(self):
+        with mock.patch("importlib.util.find_spec", return_value=None):
+            self.assertFalse(http_client.http2_enabled())
+
+    def test_forked_child_builds_its_own_pool(self):
+        transport = http_client.get_http_transport()
+        http_client._forget_transports()
+        self.assertIsNot(http_client.get_http_transport(), transport)
@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from langchain_core.messages import AIMessage
+
+from agent import steam_line_workflow as workflow
+from agent.llm_cache import LLMCacheMode, llm_cache, llm_cache_mode, make_cache_key
+
+
+@override_settings(AGENT_LLM_CACHE_ENABLED=True, AGENT_LLM_CACHE_LOCAL_MAX_ENTRIES=2)
+class LLMResponseCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        llm_cache.clear_local()
+        self.addCleanup(cache.clear)
+        self.addCleanup(llm_cache.clear_local)
+
+    def test_key_depends_on_model_prompt_and_params(self):
+        key = make_cache_key("ChatOllama", "m", "prompt", {"temperature": 0})
+        self.assertEqual(key, make_cache_key("ChatOllama", "m", "prompt", {"temperature": 0}))
+        self.assertNotEqual(key, make_cache_key("ChatOllama", "other", "prompt", {"temperature": 0}))
+        self.assertNotEqual(key, make_cache_key("ChatOllama", "m", "prompt 2", {"temperature": 0}))
+        self.assertNotEqual(key, make_cache_key("ChatOllama", "m", "prompt", {"temperature": 1}))
+
+    def test_local_tier_then_shared_tier(self):
+        llm_cache.set("a", "response")
+        self.assertEqual(llm_cache.get("a"), "response")
+        self.assertEqual(llm_cache.stats.local_hits, 1)
+
+        llm_cache.clear_local()
+        self.assertEqual(llm_cache.get("a"), "response")
+        self.assertEqual(llm_cache.stats.shared_hits, 1)
+
+        self.assertIsNone(llm_cache.get("missing"))
+        self.assertEqual(llm_cache.stats.misses, 1)
+
+    def test_local_tier_is_size_capped(self):
+        for key in ["a", "b", "c"]:
+            llm_cache.set(key, key)
+        self.assertEqual(list(llm_cache._local.keys()), ["b", "c"])
+
+    def test_refresh_and_bypass_modes(self):
+        llm_cache.set("a", "old")
+        with llm_cache_mode(LLMCacheMode.REFRESH):
+            self.assertIsNone(llm_cache.get("a"))
+            llm_cache.set("a", "new")
+        self.assertEqual(llm_cache.get("a"), "new")
+
+        with llm_cache_mode(LLMCacheMode.BYPASS):
+            self.assertIsNone(llm_cache.get("a"))
+            llm_cache.set("b", "value")
+        self.assertIsNone(llm_cache.get("b"))
+
+    def test_invoke_llm_only_calls_provider_once(self):
+        llm = mock.Mock()
+        llm.invoke.return_value = AIMessage(content="answer")
+        llm._identifying_params = {"temperature": 0}
+        with mock.patch.object(workflow, "get_llm", return_value=llm):
+            self.assertEqual(workflow.invoke_llm("prompt"), "answer")
+            self.assertEqual(workflow.invoke_llm("prompt"), "answer")
+        llm.invoke.assert_called_once_with("prompt")
+
+    @override_settings(AGENT_OUTPUT_VALIDATION=False)
+    def test_response_is_only_cached_once_the_node_parsed_it(self):
+        llm = mock.Mock()
+        llm.invoke.side_effect = [
+            AIMessage(content="not json"),
+            AIMessage(content='{"identified_hard_skills": ["Python"], "identified_soft_skills": []}'),
+        ]
+        llm._identifying_params = {"temperature": 0}
+        node = workflow.fused_llm_node(
+            "skill_identifier_agent",
+            {"identified_hard_skills": "identified_hard_skills", "identified_soft_skills": "identified_soft_skills"},
+            workflow.skill_identifier_prompt,
+        )
+        state = workflow.State(job_description="need python")
+
+        with (
+            mock.patch.object(workflow, "get_llm", return_value=llm),
+            mock.patch.object(workflow, "get_rate_limiter"),
+            mock.patch.object(workflow, "capture_trace"),
+        ):
+            with self.assertRaises(ValueError):
+                node.invoke(state)
+            # the retry asks the provider again instead of getting the malformed response back
+            self.assertEqual(node.invoke(state)["identified_hard_skills"], '["Python"]')
+            # the accepted response is served from the cache
+            self.assertEqual(node.invoke(state)["identified_hard_skills"], '["Python"]')
+        self.assertEqual(llm.invoke.call_count, 2)
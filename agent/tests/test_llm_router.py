@@ -0,0 +1,228 @@
+import asyncio
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from langchain_core.messages import AIMessage
+
+from agent import steam_line_workflow as workflow
+from agent.llm_router import (
+    MIN_HEDGE_SAMPLES,
+    CircuitBreaker,
+    LLMRouter,
+    Provider,
+    ProvidersUnavailable,
+)
+from agent.rate_limit import RateLimitExceeded
+
+PRIMARY = Provider("ChatGoogleGenerativeAI", "gemini-2.5-flash", primary=True)
+FALLBACK = Provider.parse("ChatOllama:qwen2.5:7b")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ProviderError(Exception):
+    pass
+
+
+class CircuitBreakerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=2, cooldown=30, clock=self.clock)
+
+    def test_opens_after_failures_in_a_row(self):
+        self.breaker.failure()
+        self.breaker.success()
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, "closed")
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_after(), 30)
+
+    def test_single_probe_after_cooldown(self):
+        self.breaker.failure()
+        self.breaker.failure()
+        self.clock.now += 30
+
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, "open")
+
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.success()
+        self.assertEqual(self.breaker.state, "closed")
+
+
+class LLMRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.router = LLMRouter([PRIMARY, FALLBACK], failure_threshold=2, cooldown=30, clock=self.clock)
+        self.calls: list = []
+        self.failing: set = set()
+
+    def call(self, provider: Provider, last: bool) -> str:
+        self.calls.append((provider, last))
+        if provider in self.failing:
+            raise ProviderError(provider.name)
+        return provider.name
+
+    def test_primary_answers(self):
+        self.assertEqual(self.router.call(self.call), PRIMARY.name)
+        self.assertEqual(self.calls, [(PRIMARY, False)])
+
+    def test_fails_over_to_the_next_provider(self):
+        self.failing = {PRIMARY}
+        self.assertEqual(self.router.call(self.call), FALLBACK.name)
+        self.assertEqual(self.calls, [(PRIMARY, False), (FALLBACK, True)])
+
+    def test_open_circuit_is_skipped_until_cooldown(self):
+        self.failing = {PRIMARY}
+        self.router.call(self.call)
+        self.router.call(self.call)
+        self.calls.clear()
+
+        self.router.call(self.call)
+        self.assertEqual(self.calls, [(FALLBACK, True)])
+
+        self.failing = set()
+        self.clock.now += 30
+        self.calls.clear()
+        self.assertEqual(self.router.call(self.call), PRIMARY.name)
+        self.assertEqual(self.router.breakers[PRIMARY.name].state, "closed")
+
+    def test_every_circuit_open(self):
+        self.failing = {PRIMARY, FALLBACK}
+        for _ in range(2):
+            with self.assertRaises(ProviderError):
+                self.router.call(self.call)
+
+        with self.assertRaises(ProvidersUnavailable) as raised:
+            self.router.call(self.call)
+        # scan tasks retry rate limits with a countdown
+        self.assertIsInstance(raised.exception, RateLimitExceeded)
+        self.assertEqual(raised.exception.retry_after, 30)
+
+    def test_unhealthy_provider_is_tried_last(self):
+        # failures with successes in between never open the circuit, but lower the success rate
+        for _ in range(4):
+            self.failing = {PRIMARY}
+            self.router.call(self.call)
+            self.failing = set()
+            self.router.call(self.call)
+            self.router.health[PRIMARY.name].record(False, 0)
+        self.assertEqual(self.router.candidates(), [FALLBACK, PRIMARY])
+
+    def test_rate_limit_does_not_count_against_the_provider(self):
+        def call(provider: Provider, last: bool) -> str:
+            if provider.primary:
+                raise RateLimitExceeded(provider.model_id, 10)
+            return provider.name
+
+        for _ in range(3):
+            self.assertEqual(self.router.call(call), FALLBACK.name)
+        self.assertEqual(self.router.breakers[PRIMARY.name].state, "closed")
+        self.assertEqual(self.router.health[PRIMARY.name].success_rate, 1.0)
+
+
+class HedgedLLMRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.router = LLMRouter([PRIMARY, FALLBACK], failure_threshold=2, cooldown=30, hedge_percentile=95)
+        for _ in range(MIN_HEDGE_SAMPLES):
+            self.router.health[PRIMARY.name].record(True, 0.01)
+
+    def test_not_hedged_without_enough_samples(self):
+        self.router.health[PRIMARY.name].latencies.clear()
+        self.assertIsNone(self.router.hedge_delay(PRIMARY))
+
+    def test_slow_call_is_hedged(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def call(provider: Provider, last: bool) -> str:
+            if provider.primary:
+                release.wait(5)
+            return provider.name
+
+        self.assertEqual(self.router.call(call), FALLBACK.name)
+
+    def test_fast_call_is_not_hedged(self):
+        calls = []
+
+        def call(provider: Provider, last: bool) -> str:
+            calls.append(provider)
+            return provider.name
+
+        self.assertEqual(self.router.call(call), PRIMARY.name)
+        self.assertEqual(calls, [PRIMARY])
+
+    def test_fast_failure_still_fails_over(self):
+        def call(provider: Provider, last: bool) -> str:
+            if provider.primary:
+                raise ProviderError(provider.name)
+            return provider.name
+
+        self.assertEqual(self.router.call(call), FALLBACK.name)
+
+    def test_async_hedge_cancels_the_slow_call(self):
+        cancelled = []
+
+        async def call(provider: Provider, last: bool) -> str:
+            if provider.primary:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(provider)
+                    raise
+            return provider.name
+
+        self.assertEqual(asyncio.run(self.router.acall(call)), FALLBACK.name)
+        self.assertEqual(cancelled, [PRIMARY])
+        # the lost race is not a failure of the provider
+        self.assertEqual(self.router.breakers[PRIMARY.name].failures, 0)
+
+
+@override_settings(AGENT_LLM_CACHE_ENABLED=False, AGENT_LLM_FALLBACKS=["FakeChatModel:fallback"])
+class WorkflowFailoverTestCase(SimpleTestCase):
+    def setUp(self):
+        self.primary = mock.Mock()
+        self.primary.invoke.side_effect = ProviderError("unavailable")
+        self.fallback = mock.Mock()
+        self.fallback.invoke.return_value = AIMessage(content="fallback response")
+        self.rate_limiter = mock.Mock(aacquire=mock.AsyncMock())
+        patchers: list = [
+            mock.patch.object(workflow, "llmRouterInstance", None),
+            mock.patch.object(workflow, "llmInstance", self.primary),
+            mock.patch.object(workflow, "providerLLMInstances", {Provider("FakeChatModel", "fallback"): self.fallback}),
+            mock.patch.object(workflow, "get_llm_params", return_value={}),
+            mock.patch.object(workflow, "get_rate_limiter", return_value=self.rate_limiter),
+        ]
+        for patcher in patchers:
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_fallback_provider_answers(self):
+        self.assertEqual(workflow.invoke_llm("prompt"), "fallback response")
+        self.primary.invoke.assert_called_once_with("prompt")
+        self.fallback.invoke.assert_called_once_with("prompt")
+
+    def test_fallback_provider_answers_async(self):
+        self.primary.ainvoke = mock.AsyncMock(side_effect=ProviderError("unavailable"))
+        self.fallback.ainvoke = mock.AsyncMock(return_value=AIMessage(content="fallback response"))
+        self.assertEqual(asyncio.run(workflow.ainvoke_llm("prompt")), "fallback response")
+
+    def test_throttled_primary_is_not_waited_for(self):
+        self.primary.invoke.side_effect = ProviderError("429")
+        with mock.patch.object(workflow, "get_retry_after", return_value=20.0):
+            self.assertEqual(workflow.invoke_llm("prompt"), "fallback response")
+
+        self.rate_limiter.block.assert_called_once_with(workflow.MODEL_ID, 20.0)
+        self.primary.invoke.assert_called_once()
@@ -0,0 +1,105 @@
+from typing import cast
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from agent import steam_line_workflow as workflow
+from agent.fake_llm import FakeChatModel
+from agent.model_routing import (
+    ModelRoutingTable,
+    NodeRoute,
+    RouteRule,
+    parse_node_routes,
+)
+from agent.prompts import model_prompts
+
+SMALL_MODEL = "hhao/qwen2.5-coder-tools:0.5b"
+
+LITE = NodeRoute("ChatGoogleGenerativeAI", "gemini-2.5-flash-lite")
+FLASH = NodeRoute("ChatGoogleGenerativeAI", "gemini-2.5-flash", (("temperature", 0.2), ("thinking_budget", 512)))
+
+NODE_MODELS = {
+    "hard_skill_identifier_agent": f"FakeChatModel:{SMALL_MODEL}?temperature=0",
+    "summary_generator_agent": "ChatGoogleGenerativeAI:gemini-2.5-flash-lite",
+    "summary_generator_agent@1000": "ChatGoogleGenerativeAI:gemini-2.5-flash?temperature=0.2&thinking_budget=512",
+}
+
+
+class ModelRoutingTableTestCase(SimpleTestCase):
+    def setUp(self):
+        self.table = ModelRoutingTable(parse_node_routes(NODE_MODELS))
+
+    def test_parse(self):
+        self.assertEqual(
+            NodeRoute.parse("ChatOllama:qwen2.5:7b?temperature=0.5&num_ctx=8192&keep_alive=5m"),
+            NodeRoute("ChatOllama", "qwen2.5:7b", (("temperature", 0.5), ("num_ctx", 8192), ("keep_alive", "5m"))),
+        )
+
+    def test_size_rules(self):
+        self.assertEqual(self.table.route("summary_generator_agent", 999), LITE)
+        self.assertEqual(self.table.route("summary_generator_agent", 1000), FLASH)
+        # not routed, the workflow's own model
+        self.assertIsNone(self.table.route("preprocess_agent", 5000))
+
+    def test_validate(self):
+        self.table.validate(model_prompts, workflow.NODE_PROMPT_KEYS)
+
+        with self.assertRaisesRegex(ValueError, "unknown agent"):
+            ModelRoutingTable([RouteRule("summary_agent", NodeRoute("ChatOllama", SMALL_MODEL))]).validate(
+                model_prompts, workflow.NODE_PROMPT_KEYS
+            )
+        with self.assertRaisesRegex(ValueError, "has no 'summary_generator' prompt"):
+            ModelRoutingTable([RouteRule("summary_generator_agent", NodeRoute("ChatOllama", "llama3.2"))]).validate(
+                model_prompts, workflow.NODE_PROMPT_KEYS
+            )
+        # the small model has no fused prompts
+        with self.assertRaisesRegex(ValueError, "has no 'skill_identifier' prompt"):
+            ModelRoutingTable([RouteRule("skill_identifier_agent", NodeRoute("ChatOllama", SMALL_MODEL))]).validate(
+                model_prompts, workflow.NODE_PROMPT_KEYS
+            )
+
+
+@override_settings(AGENT_LLM_CACHE_ENABLED=False, AGENT_LLM_FALLBACKS=[])
+class WorkflowModelRoutingTestCase(SimpleTestCase):
+    def setUp(self):
+        self.primary = mock.Mock()
+        self.rate_limiter = mock.Mock()
+        self.capture_trace = mock.Mock()
+        patchers: list = [
+            mock.patch.object(
+                workflow, "get_routing_table", return_value=ModelRoutingTable(parse_node_routes(NODE_MODELS))
+            ),
+            mock.patch.object(workflow, "llmRouterInstance", None),
+            mock.patch.object(workflow, "nodeRouterInstances", {}),
+            mock.patch.object(workflow, "llmInstance", self.primary),
+            mock.patch.object(workflow, "providerLLMInstances", {}),
+            mock.patch.object(workflow, "get_rate_limiter", return_value=self.rate_limiter),
+            mock.patch.object(workflow, "capture_trace", self.capture_trace),
+        ]
+        for patcher in patchers:
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_routed_node_uses_its_model_and_prompts(self):
+        output = workflow.hard_skill_identifier_agent.invoke({"job_description": "Python developer"})
+
+        self.assertTrue(output["identified_hard_skills"])
+        self.primary.invoke.assert_not_called()
+        [llm] = workflow.providerLLMInstances.values()
+        self.assertIsInstance(llm, FakeChatModel)
+        self.assertEqual(cast(FakeChatModel, llm).model, SMALL_MODEL)
+        self.rate_limiter.acquire.assert_called_once_with(f"fake/{SMALL_MODEL}")
+        prompt = self.capture_trace.call_args.kwargs["prompt"]
+        self.assertIn(model_prompts[SMALL_MODEL]["hard_skill_identifier"], prompt)
+
+    def test_route_follows_cv_size(self):
+        short_cv = workflow.State(anonymized_cv_text="Python developer. " * 10)
+        long_cv = workflow.State(anonymized_cv_text="Python developer. " * 1000)
+
+        self.assertEqual(workflow.route_node("summary_generator_agent", short_cv), LITE)
+        self.assertEqual(workflow.route_node("summary_generator_agent", long_cv), FLASH)
+
+    def test_unrouted_node_keeps_the_workflow_model(self):
+        self.assertIsNone(workflow.route_node("preprocess_agent", workflow.State()))
+        self.assertIs(workflow.get_llm_router(None), workflow.get_llm_router())
+        self.assertEqual(workflow.node_prompts(), workflow.PROMPTS)
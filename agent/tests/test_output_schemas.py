@@ -0,0 +1,121 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from langchain_core.messages import AIMessage
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_ollama import ChatOllama
+
+from agent import output_schemas
+from agent import steam_line_workflow as workflow
+from agent.parseJsonMarkdown import parse_markdown_json
+
+ANALYSIS = {"found_hard_skills": ["Python"], "missing_hard_skills": ["Go"], "match_score": 50, "summary": "half"}
+STATE = {
+    "identified_hard_skills": '{"found_hard_skills": ["Python", "Go"]}',
+    "preprocessed_cv_text": "- Python developer",
+}
+
+
+class OutputSchemasTestCase(SimpleTestCase):
+    def test_valid_output_is_normalized(self):
+        validated = output_schemas.validate_output(
+            output_schemas.HardSkillIdentification, '```json\n{"found_hard_skills": ["Python"]}\n```'
+        )
+        self.assertEqual(json.loads(validated), {"extraction_reasoning": "", "found_hard_skills": ["Python"]})
+
+    def test_float_scores_are_rounded(self):
+        validated = output_schemas.validate_output(
+            output_schemas.HardSkillAnalysis, json.dumps(ANALYSIS | {"match_score": 84.6})
+        )
+        self.assertEqual(json.loads(validated)["match_score"], 85)
+
+    def test_invalid_output_names_the_problem(self):
+        with self.assertRaisesRegex(output_schemas.OutputValidationError, "match_score.*less than or equal to 100"):
+            output_schemas.validate_output(
+                output_schemas.HardSkillAnalysis, json.dumps(ANALYSIS | {"match_score": 150})
+            )
+        with self.assertRaisesRegex(output_schemas.OutputValidationError, "not valid JSON"):
+            output_schemas.validate_output(output_schemas.HardSkillAnalysis, "Python is present, Go is missing")
+
+    def test_json_is_found_around_text(self):
+        self.assertEqual(parse_markdown_json('```\n{"a": 1}\n```'), '{"a": 1}')
+        self.assertEqual(parse_markdown_json('Here is the result: {"a": 1}. Done'), '{"a": 1}')
+        self.assertEqual(parse_markdown_json("plain text"), "plain text")
+
+    def test_provider_native_structured_output(self):
+        schema = output_schemas.ScanSummary
+        gemini = ChatGoogleGenerativeAI(model="gemini-2.5-flash", api_key="test")
+        ollama = ChatOllama(model="qwen")
+
+        self.assertEqual(
+            output_schemas.structured_output_kwargs(gemini, schema),
+            {"response_mime_type": "application/json", "response_json_schema": schema.model_json_schema()},
+        )
+        self.assertEqual(
+            output_schemas.structured_output_kwargs(ollama, schema), {"format": schema.model_json_schema()}
+        )
+        self.assertEqual(output_schemas.structured_output_kwargs(ollama, None), {})
+
+    def test_schema_reaches_the_provider_call(self):
+        llm = mock.Mock()
+        llm.invoke.return_value = AIMessage(content="{}")
+        with (
+            mock.patch.object(workflow, "get_llm", return_value=llm),
+            mock.patch.object(workflow, "get_llm_params", return_value={}),
+            mock.patch.object(workflow.llm_cache, "get", return_value=None),
+            mock.patch.object(workflow, "structured_output_kwargs", return_value={"format": "schema"}) as kwargs,
+            output_schemas.structured_output(output_schemas.ScanSummary),
+        ):
+            workflow.invoke_llm("prompt")
+
+        kwargs.assert_called_once_with(llm, output_schemas.ScanSummary)
+        llm.invoke.assert_called_once_with("prompt", format="schema")
+
+
+class OutputRepairTestCase(SimpleTestCase):
+    def setUp(self):
+        self.responses: list = []
+        self.prompts: list = []
+
+        def llm(prompt: str, on_token=None) -> str:
+            self.prompts.append(prompt)
+            return self.responses.pop(0)
+
+        patchers: list = [
+            mock.patch.object(workflow, "invoke_llm", side_effect=llm),
+            mock.patch.object(workflow, "ainvoke_llm", side_effect=mock.AsyncMock(side_effect=llm)),
+            mock.patch.object(workflow, "capture_trace"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_invalid_output_is_repaired_by_the_same_node(self):
+        self.responses = [json.dumps(ANALYSIS | {"match_score": "high"}), json.dumps(ANALYSIS)]
+        result = workflow.hard_skill_analyzer_agent.invoke(STATE)
+
+        self.assertEqual(json.loads(result["hard_skill_analyser_output"]), ANALYSIS)
+        self.assertEqual(len(self.prompts), 2)
+        self.assertIn("match_score", self.prompts[1].split("Problem:", 1)[1])
+        # the repair keeps the original task
+        self.assertIn("- Python developer", self.prompts[1])
+
+    def test_async_repair(self):
+        self.responses = ["Python found, Go missing", json.dumps(ANALYSIS)]
+        result = asyncio.run(workflow.hard_skill_analyzer_agent.ainvoke(STATE))
+        self.assertEqual(json.loads(result["hard_skill_analyser_output"]), ANALYSIS)
+
+    @override_settings(AGENT_OUTPUT_REPAIR_ATTEMPTS=2)
+    def test_output_that_can_not_be_repaired_is_kept(self):
+        self.responses = ["not json", "still not json", "never json"]
+        result = workflow.hard_skill_analyzer_agent.invoke(STATE)
+
+        self.assertEqual(result["hard_skill_analyser_output"], "never json")
+        self.assertEqual(len(self.prompts), 3)
+
+    @override_settings(AGENT_OUTPUT_VALIDATION=False)
+    def test_validation_is_optional(self):
+        self.responses = ["not json"]
+        self.assertEqual(workflow.hard_skill_analyzer_agent.invoke(STATE)["hard_skill_analyser_output"], "not json")
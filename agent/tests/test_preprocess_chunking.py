@@ -0,0 +1,80 @@
+import asyncio
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from agent import steam_line_workflow as workflow
+from agent import token_budget
+from agent.tests.test_token_budget import LONG_CV
+
+
+def echo_chunk(prompt: str, on_token=None) -> str:
+    # first line of the chunk stands in for its summary
+    return f"summary of {prompt.split('CV Text:', 1)[1].strip().splitlines()[0]}"
+
+
+@override_settings(
+    AGENT_PREPROCESS_CHUNKING=True, AGENT_PREPROCESS_CHUNK_TOKENS=200, AGENT_PREPROCESS_CHUNK_CONCURRENCY=2
+)
+class PreprocessChunkingTestCase(SimpleTestCase):
+    def setUp(self):
+        self.llm = mock.patch.object(workflow, "invoke_llm", side_effect=echo_chunk).start()
+        mock.patch.object(workflow, "capture_trace").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_long_cv_is_preprocessed_in_chunks(self):
+        chunks = token_budget.chunk_text(token_budget.compact_text(LONG_CV), 200)
+        result = workflow.preprocess_agent.invoke({"anonymized_cv_text": LONG_CV})
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(self.llm.call_count, len(chunks))
+        # merged in CV order
+        self.assertEqual(
+            result["preprocessed_cv_text"], "\n\n".join(f"summary of {chunk.splitlines()[0]}" for chunk in chunks)
+        )
+        self.assertEqual(result["prompt_budget"]["preprocess_agent"]["original_tokens"], 1 + len(LONG_CV) // 4)
+
+    def test_chunks_run_concurrently(self):
+        # would time out if the chunks were sent one after another
+        barrier = threading.Barrier(2, timeout=5)
+
+        def llm(prompt: str, on_token=None) -> str:
+            barrier.wait()
+            return echo_chunk(prompt)
+
+        with mock.patch.object(workflow, "invoke_llm", side_effect=llm):
+            workflow.preprocess_agent.invoke({"anonymized_cv_text": LONG_CV})
+
+    def test_async_chunks_respect_the_concurrency_limit(self):
+        in_flight = 0
+        max_in_flight = 0
+
+        async def llm(prompt: str, on_token=None) -> str:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return echo_chunk(prompt)
+
+        with mock.patch.object(workflow, "ainvoke_llm", side_effect=llm):
+            result = asyncio.run(workflow.preprocess_agent.ainvoke({"anonymized_cv_text": LONG_CV}))
+
+        self.assertEqual(max_in_flight, 2)
+        self.assertTrue(result["preprocessed_cv_text"].startswith("summary of Jane Doe"))
+
+    def test_short_cv_is_sent_in_one_call(self):
+        result = workflow.preprocess_agent.invoke({"anonymized_cv_text": "Jane Doe\nSkills\nPython"})
+        self.assertEqual(self.llm.call_count, 1)
+        self.assertEqual(result["preprocessed_cv_text"], "summary of Jane Doe")
+
+    @override_settings(AGENT_PREPROCESS_CHUNKING=False)
+    def test_chunking_is_optional(self):
+        workflow.preprocess_agent.invoke({"anonymized_cv_text": LONG_CV})
+        self.assertEqual(self.llm.call_count, 1)
+
+    def test_stored_preprocessed_text_is_reused(self):
+        result = workflow.preprocess_agent.invoke({"anonymized_cv_text": LONG_CV, "preprocessed_cv_text": "stored"})
+        self.assertEqual(result, {})
+        self.llm.assert_not_called()
@@ -0,0 +1,101 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from langchain_core.messages import AIMessageChunk
+
+from agent import progress
+from agent import steam_line_workflow as workflow
+from agent.tests.test_steam_line_workflow import fake_fused_llm
+
+
+class ProgressTestCase(SimpleTestCase):
+    def setUp(self):
+        self.broker = progress.InMemoryBroker()
+        patcher = mock.patch.object(progress, "progressBrokerInstance", self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.subscription = self.broker.subscribe(progress.channel_name(1))
+        self.addCleanup(self.subscription.close)
+
+    def events(self):
+        events = []
+        while (event := self.subscription.get(timeout=0)) is not None:
+            events.append(event)
+        return events
+
+    def test_publish_outside_a_scan_is_a_no_op(self):
+        progress.publish_progress("node", node="a")
+        self.assertEqual(self.events(), [])
+        self.assertIsNone(progress.get_token_publisher())
+
+    def test_publish_inside_a_scan(self):
+        with progress.scan_progress(1):
+            progress.publish_progress("node", node="a")
+        self.assertEqual(self.events(), [{"event": "node", "node": "a"}])
+
+    def test_closed_subscription_stops_receiving(self):
+        self.subscription.close()
+        progress.publish_event(1, "status", status="FINISHED")
+        self.assertEqual(self.broker._subscriptions, {})
+
+    def test_async_subscription(self):
+        async def receive():
+            subscription = await self.broker.asubscribe(progress.channel_name(2))
+            progress.publish_event(2, "status", status="FINISHED")
+            event = await subscription.aget(timeout=1)
+            await subscription.aclose()
+            return event
+
+        self.assertEqual(asyncio.run(receive()), {"event": "status", "status": "FINISHED"})
+        self.assertNotIn(progress.channel_name(2), self.broker._subscriptions)
+
+    def test_publish_errors_do_not_propagate(self):
+        with mock.patch.object(self.broker, "publish", side_effect=ConnectionError):
+            progress.publish_event(1, "status", status="FINISHED")
+
+    @override_settings(AGENT_PROGRESS_STREAM_TOKENS=True)
+    def test_workflow_publishes_node_events_and_summary_tokens(self):
+        def llm(prompt, on_token=None):
+            response = fake_fused_llm(prompt)
+            if on_token is not None:
+                on_token(response)
+            return response
+
+        with (
+            mock.patch.object(workflow, "invoke_llm", side_effect=llm),
+            mock.patch.object(workflow, "anonymize_text", side_effect=lambda text: text),
+            mock.patch.object(workflow, "capture_trace"),
+            progress.scan_progress(1),
+        ):
+            workflow.build_graph("fused").compile().invoke(
+                {"raw_cv_text": "cv", "job_description": "jd", "anonymized_cv_text": "cv"}  # type: ignore [arg-type]
+            )
+
+        events = self.events()
+        nodes = {event["node"]: event["skipped"] for event in events if event["event"] == "node"}
+        self.assertEqual(
+            nodes,
+            {
+                "anonymizer_agent": True,
+                "preprocess_agent": False,
+                "skill_identifier_agent": False,
+                "skill_analyzer_agent": False,
+                "summary_generator_agent": False,
+            },
+        )
+        tokens = [event["text"] for event in events if event["event"] == "token"]
+        self.assertEqual(tokens, ['```json\n{"section": "Hard Skill Analysis"}\n```'])
+
+    def test_invoke_llm_streams_tokens(self):
+        llm = mock.Mock()
+        llm.stream.return_value = [AIMessageChunk(content="a"), AIMessageChunk(content="b")]
+        tokens: list[str] = []
+        with (
+            mock.patch.object(workflow, "get_llm", return_value=llm),
+            mock.patch.object(workflow.llm_cache, "get", return_value=None),
+            mock.patch.object(workflow.llm_cache, "set"),
+        ):
+            self.assertEqual(workflow.invoke_llm("prompt", on_token=tokens.append), "ab")
+        self.assertEqual(tokens, ["a", "b"])
+        llm.invoke.assert_not_called()
@@ -0,0 +1,120 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from agent.rate_limit import (
+    InMemoryBackend,
+    RateLimit,
+    RateLimiter,
+    RateLimitExceeded,
+    get_retry_after,
+    parse_rate_limits,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class RateLimiterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(
+            backend=InMemoryBackend(clock=self.clock),
+            limits={"model": RateLimit(requests=2, period=60, burst=2)},
+            max_wait=60,
+            sleep=self.clock.sleep,
+        )
+
+    def test_calls_within_budget_do_not_wait(self):
+        self.limiter.acquire("model")
+        self.limiter.acquire("model")
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_waits_only_until_next_slot(self):
+        self.limiter.acquire("model")
+        self.limiter.acquire("model")
+        self.limiter.acquire("model")
+        self.assertEqual(self.clock.sleeps, [30.0])
+
+    def test_budget_refills_over_time(self):
+        self.limiter.acquire("model")
+        self.limiter.acquire("model")
+        self.clock.now += 60
+        self.limiter.acquire("model")
+        self.limiter.acquire("model")
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_unlimited_models_never_wait(self):
+        for _ in range(100):
+            self.limiter.acquire("other")
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_raises_when_wait_exceeds_maximum(self):
+        self.limiter.max_wait = 10
+        self.limiter.acquire("model")
+        self.limiter.acquire("model")
+        with self.assertRaises(RateLimitExceeded) as ctx:
+            self.limiter.acquire("model")
+        self.assertEqual(ctx.exception.retry_after, 30.0)
+
+    def test_block_honors_retry_after(self):
+        self.limiter.block("model", 45)
+        self.limiter.acquire("model")
+        self.assertEqual(self.clock.sleeps, [45.0])
+
+
+class RateLimitHelpersTestCase(SimpleTestCase):
+    def test_parse_rate_limits(self):
+        limits = parse_rate_limits({"a": "10/60", "b": "5", "c": "1/2/3"})
+        self.assertEqual(limits["a"], RateLimit(requests=10, period=60))
+        self.assertEqual(limits["b"], RateLimit(requests=5, period=60))
+        self.assertEqual(limits["c"], RateLimit(requests=1, period=2, burst=3))
+
+    def test_get_retry_after_from_wrapped_google_error(self):
+        class ClientError(Exception):
+            details = {"error": {"details": [{"@type": "RetryInfo", "retryDelay": "37s"}]}}
+
+        try:
+            try:
+                raise ClientError()
+            except ClientError as e:
+                raise RuntimeError("wrapped") from e
+        except RuntimeError as wrapped:
+            self.assertEqual(get_retry_after(wrapped), 37.0)
+
+    def test_get_retry_after_from_header(self):
+        class Response:
+            headers = {"retry-after": "12"}
+
+        error = Exception()
+        error.response = Response()  # type: ignore[attr-defined]
+        self.assertEqual(get_retry_after(error), 12.0)
+        self.assertIsNone(get_retry_after(Exception()))
+
+
+class AsyncRateLimiterTestCase(SimpleTestCase):
+    def test_aacquire_sleeps_without_blocking(self):
+        limiter = RateLimiter(
+            backend=InMemoryBackend(),
+            limits={"model": RateLimit(requests=1, period=0.05)},
+            max_wait=1,
+        )
+
+        async def run():
+            await limiter.aacquire("model")
+            await limiter.aacquire("model")
+
+        with mock.patch("agent.rate_limit.asyncio.sleep", wraps=asyncio.sleep) as sleep:
+            asyncio.run(run())
+        sleep.assert_called_once()
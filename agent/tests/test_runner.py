@@ -0,0 +1,119 @@
+import asyncio
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from agent import progress
+from agent import runner as runner_module
+from agent import steam_line_workflow as workflow
+from agent.fake_llm import FakeChatModel
+from agent.llm_cache import LLMCacheMode, llm_cache, llm_cache_mode
+from agent.progress import scan_progress
+from agent.rate_limit import RateLimit, RateLimiter
+from agent.runner import WorkflowRunner
+from agent.tests.test_steam_line_workflow import fake_llm
+
+
+class WorkflowRunnerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.in_flight = 0
+        self.max_seen_in_flight = 0
+
+        async def slow_llm(prompt: str, on_token=None) -> str:
+            self.in_flight += 1
+            self.max_seen_in_flight = max(self.max_seen_in_flight, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            return fake_llm(prompt)
+
+        patchers: list = [
+            # split mode runs the most LLM nodes of a scan at the same time
+            mock.patch.object(runner_module, "steam_line_workflow", workflow.build_graph("split").compile()),
+            mock.patch.object(workflow, "ainvoke_llm", side_effect=slow_llm),
+            mock.patch.object(workflow, "invoke_llm", side_effect=AssertionError("sync llm used")),
+            mock.patch.object(workflow, "anonymize_text", side_effect=lambda text: text),
+            mock.patch.object(workflow, "capture_trace"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.runner = WorkflowRunner(max_in_flight=2)
+        self.addCleanup(self.runner.stop)
+
+    def test_run_uses_async_nodes(self):
+        result = self.runner.run(workflow.State(raw_cv_text="cv", job_description="jd"), timeout=10)
+        self.assertEqual(result["summary_generator_output"], '{"section": "Hard Skill Analysis"}')
+
+    def test_scans_share_one_event_loop_with_bounded_concurrency(self):
+        loop = self.runner._start()
+        futures = [
+            asyncio.run_coroutine_threadsafe(
+                self.runner.arun(workflow.State(raw_cv_text=f"cv {i}", job_description="jd")), loop
+            )
+            for i in range(5)
+        ]
+        results = [future.result(timeout=10) for future in futures]
+
+        self.assertEqual([result["raw_cv_text"] for result in results], [f"cv {i}" for i in range(5)])
+        # 2 scans in flight, each running up to 2 LLM nodes at the same time
+        self.assertGreater(self.max_seen_in_flight, 2)
+        self.assertLessEqual(self.max_seen_in_flight, 4)
+
+
+@override_settings(AGENT_LLM_CACHE_ENABLED=True, AGENT_LLM_FALLBACKS=[])
+class EventLoopNotBlockedTestCase(SimpleTestCase):
+    """Redis round trips of a node must leave the shared event loop free for the other nodes."""
+
+    def setUp(self):
+        # set by a coroutine on the loop, a backend call blocking the loop would wait for it in vain
+        self.loop_ran = threading.Event()
+        self.released: list = []
+
+        def slow_backend_call(*args, **kwargs):
+            self.released.append(self.loop_ran.wait(timeout=5))
+
+        self.slow_backend_call = slow_backend_call
+        self.rate_limiter = mock.Mock(aacquire=mock.AsyncMock())
+        patchers: list = [
+            mock.patch.object(workflow, "llmRouterInstance", None),
+            mock.patch.object(workflow, "llmInstance", FakeChatModel(prompts=workflow.PROMPTS)),
+            mock.patch.object(workflow, "get_llm_params", return_value={}),
+            mock.patch.object(workflow, "get_rate_limiter", return_value=self.rate_limiter),
+        ]
+        for patcher in patchers:
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def run_next_to_other_node(self, coroutine):
+        async def other_node():
+            await asyncio.sleep(0)
+            self.loop_ran.set()
+
+        async def run():
+            await asyncio.gather(coroutine, other_node())
+
+        asyncio.run(run())
+        self.assertEqual(self.released, [True] * len(self.released))
+        self.assertTrue(self.released)
+
+    def test_llm_cache(self):
+        backend = mock.Mock(get=mock.Mock(side_effect=self.slow_backend_call), set=self.slow_backend_call)
+        with mock.patch("agent.llm_cache.cache", backend), llm_cache_mode(LLMCacheMode.USE):
+            llm_cache.clear_local()
+            self.run_next_to_other_node(workflow.ainvoke_llm("prompt"))
+        backend.get.assert_called_once()
+        self.assertEqual(len(self.released), 2)
+
+    def test_rate_limiter(self):
+        backend = mock.Mock(reserve=mock.Mock(side_effect=lambda *args: self.slow_backend_call() or 0.0))
+        limiter = RateLimiter(backend=backend, limits={"model": RateLimit(requests=1)}, max_wait=1)
+        self.run_next_to_other_node(limiter.aacquire("model"))
+        backend.reserve.assert_called_once()
+
+    def test_progress(self):
+        broker = mock.Mock(publish=mock.Mock(side_effect=self.slow_backend_call))
+        with mock.patch.object(progress, "progressBrokerInstance", broker), scan_progress(1):
+            self.run_next_to_other_node(workflow.anonymizer_agent.ainvoke(workflow.State(anonymized_cv_text="cv")))
+        broker.publish.assert_called_once()
@@ -0,0 +1,148 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from agent import skill_matcher
+from agent import steam_line_workflow as workflow
+
+CV_TEXT = "Skills: Python3, Django REST framework, k8s, Golang, C++\nDeployed JavaScript apps on Amazon Web Services"
+REQUIRED = ["Python", "Django", "Kubernetes", "Go", "AWS", "Java", "C", "Terraform", "Prompt Engineering"]
+
+
+class SkillMatcherTestCase(SimpleTestCase):
+    def setUp(self):
+        self.matcher = skill_matcher.SkillMatcher()
+
+    def test_synonyms_are_found_as_canonical_skills(self):
+        self.assertEqual(
+            self.matcher.find(CV_TEXT),
+            {"Python", "Django", "Django REST Framework", "Kubernetes", "Go", "C++", "JavaScript", "AWS", "REST APIs"},
+        )
+
+    def test_related_skills_are_not_synonyms(self):
+        cv_text = "Unit tests with pytest, CSS, Django, Agile, Git, Linux and Elasticsearch. R&D lead, Go-to-market."
+        match = self.matcher.match(["Jest", "Sass", "Django REST Framework", "Scrum", "GitHub", "R", "Go"], cv_text)
+
+        self.assertEqual(match.found, [])
+        self.assertEqual(match.missing, ["Jest", "Sass", "Django REST Framework", "Scrum", "GitHub", "R", "Go"])
+
+    def test_short_skills_need_list_context(self):
+        self.assertEqual(self.matcher.find("R&D, Go-to-market, C-level, Node.js"), {"Node.js"})
+        self.assertEqual(
+            self.matcher.find("Skills: C, R (Shiny) | ML\nservices written in Go."),
+            {"C", "R", "Machine Learning", "Go"},
+        )
+
+    def test_matches_respect_word_boundaries(self):
+        # no Java in JavaScript, no C in C++ or "clean code"
+        self.assertEqual(self.matcher.find("JavaScript, C++ and clean code"), {"JavaScript", "C++"})
+
+    def test_everyday_words_only_match_as_written(self):
+        self.assertEqual(self.matcher.find("go to the rest of the team, rust removal"), set())
+        self.assertEqual(self.matcher.find("Go, REST and Rust"), {"Go", "REST APIs", "Rust"})
+
+    def test_overlapping_patterns_are_all_found(self):
+        self.assertEqual(self.matcher.find("Ruby on Rails"), {"Ruby", "Ruby on Rails"})
+
+    def test_match(self):
+        match = self.matcher.match(REQUIRED, CV_TEXT)
+
+        self.assertEqual(match.found, ["Python", "Django", "Kubernetes", "Go", "AWS"])
+        self.assertEqual(match.missing, ["Java", "C", "Terraform"])
+        # not in the taxonomy, another wording may still be in the CV
+        self.assertEqual(match.undecided, ["Prompt Engineering"])
+        self.assertEqual(match.as_analysis()["match_score"], 56)
+
+    def test_skills_outside_the_taxonomy_match_as_written(self):
+        match = self.matcher.match(["Prompt Engineering"], "prompt   engineering for chat bots")
+        self.assertEqual(match.found, ["Prompt Engineering"])
+
+    def test_merge_analysis(self):
+        match = self.matcher.match(REQUIRED, CV_TEXT)
+        merged = match.merge_analysis({"found_hard_skills": ["Prompt Engineering"], "summary": "ok"})
+
+        self.assertEqual(
+            merged["found_hard_skills"], ["Python", "Django", "Kubernetes", "Go", "AWS", "Prompt Engineering"]
+        )
+        self.assertEqual(merged["missing_hard_skills"], ["Java", "C", "Terraform"])
+        self.assertEqual(merged["match_score"], 67)
+        self.assertEqual(merged["summary"], "ok")
+
+    def test_parse_required_skills(self):
+        self.assertEqual(skill_matcher.parse_required_skills('{"found_hard_skills": ["Go"]}'), ["Go"])
+        self.assertIsNone(skill_matcher.parse_required_skills('{"section": "Job Description"}'))
+        self.assertIsNone(skill_matcher.parse_required_skills("not json"))
+
+    def test_matcher_is_built_once_per_process(self):
+        self.assertIs(skill_matcher.get_skill_matcher(), skill_matcher.get_skill_matcher())
+
+
+class SkillMatchedNodeTestCase(SimpleTestCase):
+    state = {
+        "identified_hard_skills": json.dumps({"found_hard_skills": REQUIRED}),
+        "anonymized_cv_text": CV_TEXT,
+        "preprocessed_cv_text": "- Backend developer",
+    }
+
+    def setUp(self):
+        self.prompts: list = []
+
+        def llm(prompt: str, on_token=None) -> str:
+            self.prompts.append(prompt)
+            return json.dumps(
+                {
+                    "found_hard_skills": ["Prompt Engineering"],
+                    "missing_hard_skills": [],
+                    "match_score": 100,
+                    "summary": "llm",
+                }
+            )
+
+        patchers: list = [
+            mock.patch.object(workflow, "invoke_llm", side_effect=llm),
+            mock.patch.object(workflow, "capture_trace"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def analysis(self, result) -> dict:
+        return json.loads(result["hard_skill_analyser_output"])
+
+    @override_settings(AGENT_SKILL_MATCHING="llm")
+    def test_llm_mode_sends_every_skill(self):
+        workflow.hard_skill_analyzer_agent.invoke(self.state)
+        self.assertIn('"Python"', self.prompts[0])
+
+    @override_settings(AGENT_SKILL_MATCHING="rules")
+    def test_rules_mode_skips_the_llm(self):
+        analysis = self.analysis(workflow.hard_skill_analyzer_agent.invoke(self.state))
+
+        self.assertEqual(self.prompts, [])
+        self.assertEqual(analysis["found_hard_skills"], ["Python", "Django", "Kubernetes", "Go", "AWS"])
+        self.assertEqual(analysis["missing_hard_skills"], ["Java", "C", "Terraform", "Prompt Engineering"])
+
+    @override_settings(AGENT_SKILL_MATCHING="prefilter")
+    def test_prefilter_mode_only_sends_what_rules_did_not_find(self):
+        analysis = self.analysis(workflow.hard_skill_analyzer_agent.invoke(self.state))
+
+        required = self.prompts[0].split("Required Hard Skills:", 1)[1].split("Preprocessed CV:", 1)[0]
+        self.assertEqual(json.loads(required), {"found_hard_skills": ["Java", "C", "Terraform", "Prompt Engineering"]})
+        self.assertEqual(analysis["found_hard_skills"][-1], "Prompt Engineering")
+        self.assertEqual(analysis["missing_hard_skills"], ["Java", "C", "Terraform"])
+        self.assertEqual(analysis["summary"], "llm")
+
+    @override_settings(AGENT_SKILL_MATCHING="prefilter")
+    def test_prefilter_mode_skips_the_llm_when_every_skill_is_found(self):
+        state = {**self.state, "identified_hard_skills": json.dumps({"found_hard_skills": ["Python", "k8s"]})}
+        analysis = self.analysis(asyncio.run(workflow.hard_skill_analyzer_agent.ainvoke(state)))
+
+        self.assertEqual(self.prompts, [])
+        self.assertEqual(analysis["match_score"], 100)
+
+    @override_settings(AGENT_SKILL_MATCHING="rules")
+    def test_unexpected_identifier_output_falls_back_to_the_llm(self):
+        workflow.hard_skill_analyzer_agent.invoke({**self.state, "identified_hard_skills": "Python, Go"})
+        self.assertEqual(len(self.prompts), 1)
@@ -0,0 +1,156 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from agent import prompts as workflow_prompts
+from agent import steam_line_workflow as workflow
+
+SECTIONS = ["Hard Skill Analysis:", "Required Hard Skills:", "Required Soft Skills:", "Job Description:", "CV Text:"]
+
+
+def fake_llm(prompt: str, on_token=None) -> str:
+    for section in SECTIONS:
+        if section in prompt:
+            return f'```json\n{{"section": "{section[:-1]}"}}\n```'
+    return "unknown"
+
+
+def is_identifier_prompt(prompt: str) -> bool:
+    return "Job Description:" in prompt and "Required" not in prompt
+
+
+# fake responses are section markers, not schema shaped, see agent/tests/test_output_schemas.py
+@override_settings(AGENT_MAX_CONCURRENCY=3, AGENT_OUTPUT_VALIDATION=False)
+class SteamLineWorkflowTestCase(SimpleTestCase):
+    def setUp(self):
+        patchers = [
+            mock.patch.object(workflow, "invoke_llm", side_effect=fake_llm),
+            mock.patch.object(workflow, "anonymize_text", side_effect=lambda text: text.upper()),
+            mock.patch.object(workflow, "capture_trace"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def invoke(self):
+        return (
+            workflow.build_graph("split")
+            .compile()
+            .invoke(
+                {"raw_cv_text": "python developer", "job_description": "need python"},  # type: ignore [arg-type]
+                config=workflow.get_workflow_config(),
+            )
+        )
+
+    def test_all_outputs_are_produced(self):
+        result = self.invoke()
+        self.assertEqual(result["anonymized_cv_text"], "PYTHON DEVELOPER")
+        self.assertEqual(result["preprocessed_cv_text"], '```json\n{"section": "CV Text"}\n```')
+        self.assertEqual(result["identified_hard_skills"], '{"section": "Job Description"}')
+        self.assertEqual(result["identified_soft_skills"], '{"section": "Job Description"}')
+        self.assertEqual(result["hard_skill_analyser_output"], '{"section": "Required Hard Skills"}')
+        self.assertEqual(result["soft_skill_analyser_output"], '{"section": "Required Soft Skills"}')
+        self.assertEqual(result["summary_generator_output"], '{"section": "Hard Skill Analysis"}')
+
+    def test_identifiers_run_concurrently_with_cv_branch(self):
+        # would time out if the three entry nodes ran one after another
+        barrier = threading.Barrier(3, timeout=5)
+
+        def wait_then(fn):
+            def wrapped(*args, **kwargs):
+                barrier.wait()
+                return fn(*args, **kwargs)
+
+            return wrapped
+
+        def llm(prompt: str, on_token=None) -> str:
+            if is_identifier_prompt(prompt):
+                return wait_then(fake_llm)(prompt)
+            return fake_llm(prompt)
+
+        with mock.patch.object(workflow, "anonymize_text", side_effect=wait_then(lambda text: text)):
+            with mock.patch.object(workflow, "invoke_llm", side_effect=llm):
+                result = self.invoke()
+
+        self.assertIn("summary_generator_output", result)
+
+
+def fake_fused_llm(prompt: str, on_token=None) -> str:
+    if "Required Soft Skills:" in prompt and "Required Hard Skills:" in prompt:
+        return '```json\n{"hard_skill_analysis": {"match_score": 80}, "soft_skill_analysis": {"match_score": 60}}\n```'
+    if "Job Description:" in prompt:
+        return '{"identified_hard_skills": {"found_hard_skills": ["Python"]}, "identified_soft_skills": {}}'
+    return fake_llm(prompt)
+
+
+@override_settings(AGENT_OUTPUT_VALIDATION=False)
+class FusedWorkflowTestCase(SimpleTestCase):
+    def setUp(self):
+        self.llm = mock.patch.object(workflow, "invoke_llm", side_effect=fake_fused_llm).start()
+        mock.patch.object(workflow, "anonymize_text", side_effect=lambda text: text).start()
+        mock.patch.object(workflow, "capture_trace").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def invoke(self, **workflow_input):
+        workflow_input = {"raw_cv_text": "python developer", "job_description": "need python", **workflow_input}
+        return workflow.build_graph("fused").compile().invoke(workflow_input)  # type: ignore [arg-type]
+
+    def test_outputs_have_split_mode_shapes(self):
+        result = self.invoke()
+        self.assertEqual(result["identified_hard_skills"], '{"found_hard_skills": ["Python"]}')
+        self.assertEqual(result["identified_soft_skills"], "{}")
+        self.assertEqual(result["hard_skill_analyser_output"], '{"match_score": 80}')
+        self.assertEqual(result["soft_skill_analyser_output"], '{"match_score": 60}')
+        self.assertEqual(result["summary_generator_output"], '{"section": "Hard Skill Analysis"}')
+
+    def test_one_call_per_pair(self):
+        self.invoke()
+        # preprocess, skill identifier, skill analyzer, summary
+        self.assertEqual(self.llm.call_count, 4)
+
+    def test_identifier_skipped_when_skills_are_known(self):
+        result = self.invoke(identified_hard_skills='["Go"]', identified_soft_skills='["Empathy"]')
+        self.assertEqual(self.llm.call_count, 3)
+        self.assertEqual(result["identified_hard_skills"], '["Go"]')
+
+    def test_malformed_fused_response_raises(self):
+        with self.assertRaises(ValueError):
+            workflow.split_fused_output('{"hard_skill_analysis": {}}', {"soft_skill_analysis": "x"})
+
+
+class PipelineModeTestCase(SimpleTestCase):
+    def test_fused_requires_fused_prompts(self):
+        prompts = {"m": {**workflow.PROMPTS}}
+        prompts["m"].pop("skill_identifier")
+        self.assertEqual(workflow_prompts.get_pipeline_mode(prompts, "m", "fused"), "split")  # type: ignore [arg-type]
+        self.assertEqual(
+            workflow_prompts.get_pipeline_mode(
+                workflow_prompts.model_prompts, "hhao/qwen2.5-coder-tools:0.5b", "fused"
+            ),
+            "split",
+        )
+
+    def test_split_is_the_default(self):
+        self.assertEqual(
+            workflow_prompts.get_pipeline_mode(workflow_prompts.model_prompts, "gemini-2.5-flash"), "split"
+        )
+        self.assertEqual(
+            workflow_prompts.get_pipeline_mode(workflow_prompts.model_prompts, "gemini-2.5-flash", "fused"), "fused"
+        )
+
+    def test_mode_of_the_model(self):
+        prompts = {"m": {**workflow_prompts.model_prompts["gemini-2.5-flash"], "pipeline_mode": "fused"}}
+        self.assertEqual(workflow_prompts.get_pipeline_mode(prompts, "m"), "fused")  # type: ignore [arg-type]
+        # the setting overrides it
+        self.assertEqual(workflow_prompts.get_pipeline_mode(prompts, "m", "split"), "split")  # type: ignore [arg-type]
+
+    def test_unknown_mode_raises(self):
+        with self.assertRaisesRegex(ValueError, "unknown pipeline mode 'fussed'"):
+            workflow_prompts.get_pipeline_mode(workflow_prompts.model_prompts, "gemini-2.5-flash", "fussed")
+
+    def test_fused_prompts_are_shared(self):
+        for model in ["gemini-2.5-flash-lite", "gemini-2.5-flash"]:
+            prompts = workflow_prompts.model_prompts[model]
+            self.assertIs(prompts.get("skill_identifier"), workflow_prompts.FUSED_SKILL_IDENTIFIER_PROMPT)
+            self.assertIs(prompts.get("skill_analyzer"), workflow_prompts.FUSED_SKILL_ANALYZER_PROMPT)
@@ -0,0 +1,165 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from langchain_core.messages.ai import UsageMetadata
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from agent import steam_line_workflow as workflow
+from agent import telemetry
+from agent.fake_llm import FakeChatModel
+from agent.llm_cache import llm_cache
+
+
+@override_settings(AGENT_LLM_CACHE_ENABLED=True)
+class TelemetryTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        llm_cache.clear_local()
+        self.addCleanup(cache.clear)
+
+        self.spans = InMemorySpanExporter()
+        tracer_provider = TracerProvider()
+        tracer_provider.add_span_processor(SimpleSpanProcessor(self.spans))
+        self.metrics = InMemoryMetricReader()
+        meter = MeterProvider(metric_readers=[self.metrics]).get_meter("test")
+
+        patchers: list = [
+            mock.patch.object(telemetry, "tracer", tracer_provider.get_tracer("test")),
+            mock.patch.object(telemetry, "node_duration_histogram", meter.create_histogram("agent.node.duration")),
+            mock.patch.object(telemetry, "queue_wait_histogram", meter.create_histogram("agent.queue.wait")),
+            mock.patch.object(telemetry, "token_counter", meter.create_counter("agent.llm.tokens")),
+            mock.patch.object(workflow, "llmInstance", FakeChatModel(prompts=workflow.PROMPTS)),
+            mock.patch.object(workflow, "MODEL_ID", f"fake/{workflow.MODEL_NAME}"),
+            mock.patch.object(workflow, "anonymize_text", side_effect=lambda text: text),
+            mock.patch.object(workflow, "capture_trace"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def run_scan(self):
+        with telemetry.scan_span(1, attempt=0, resumed=False):
+            workflow.build_graph("fused").compile().invoke(
+                {"raw_cv_text": "Python developer", "job_description": "need Python"}  # type: ignore [arg-type]
+            )
+
+    def span_attributes(self, name: str) -> Dict[str, Any]:
+        span = next(span for span in self.spans.get_finished_spans() if span.name == name)
+        return dict(span.attributes or {})
+
+    def data_points(self, name: str) -> List[Dict[str, Any]]:
+        metrics_data = self.metrics.get_metrics_data()
+        return [
+            # histograms have a sum, counters a value
+            {"attributes": dict(point.attributes or {}), "value": getattr(point, "sum", getattr(point, "value", None))}
+            for resource_metrics in (metrics_data.resource_metrics if metrics_data else [])
+            for scope_metrics in resource_metrics.scope_metrics
+            for metric in scope_metrics.metrics
+            if metric.name == name
+            for point in metric.data.data_points
+        ]
+
+    def test_node_spans_are_children_of_the_scan_span(self):
+        self.run_scan()
+
+        spans = {span.name: span for span in self.spans.get_finished_spans()}
+        self.assertEqual(
+            set(spans),
+            {"agent.scan", "anonymizer_agent", "preprocess_agent", "skill_identifier_agent"}
+            | {"skill_analyzer_agent", "summary_generator_agent"},
+        )
+        scan_span = spans.pop("agent.scan")
+        for span in spans.values():
+            self.assertEqual(span.parent.span_id, scan_span.context.span_id)  # type: ignore [union-attr]
+
+        attributes = self.span_attributes("summary_generator_agent")
+        self.assertEqual(attributes["gen_ai.request.model"], f"fake/{workflow.MODEL_NAME}")
+        self.assertFalse(attributes["llm.cache_hit"])
+        self.assertGreater(attributes["gen_ai.usage.input_tokens"], 0)
+
+    def test_node_latency_histogram_per_agent(self):
+        self.run_scan()
+
+        agents = {point["attributes"]["agent.name"] for point in self.data_points("agent.node.duration")}
+        self.assertIn("anonymizer_agent", agents)
+        self.assertIn("summary_generator_agent", agents)
+        token_types = {point["attributes"]["gen_ai.token.type"] for point in self.data_points("agent.llm.tokens")}
+        self.assertEqual(token_types, {"input", "output"})
+
+    def test_cache_hits_are_marked(self):
+        self.run_scan()
+        self.spans.clear()
+        self.run_scan()
+
+        attributes = self.span_attributes("summary_generator_agent")
+        self.assertTrue(attributes["llm.cache_hit"])
+        self.assertNotIn("gen_ai.usage.input_tokens", attributes)
+
+    def test_calls_of_a_node_add_up(self):
+        usage = UsageMetadata(input_tokens=10, output_tokens=5, total_tokens=15)
+        with telemetry.node_span("hard_skill_analyzer_agent"):
+            telemetry.record_llm_call("m", cache_hit=False, usage=usage, rate_limit_wait=0.5, retries=2)
+            # the repair call
+            telemetry.record_llm_call("m", cache_hit=True)
+
+        attributes = self.span_attributes("hard_skill_analyzer_agent")
+        self.assertEqual(attributes["llm.calls"], 2)
+        self.assertTrue(attributes["llm.cache_hit"])
+        self.assertEqual(attributes["llm.retries"], 2)
+        self.assertEqual(attributes["gen_ai.usage.input_tokens"], 10)
+        span = next(span for span in self.spans.get_finished_spans() if span.name == "hard_skill_analyzer_agent")
+        self.assertEqual(
+            [dict(event.attributes or {}).get("llm.cache_hit") for event in span.events if event.name == "llm.call"],
+            [False, True],
+        )
+
+    def test_calls_on_other_threads_add_up_on_the_node_span(self):
+        usage = UsageMetadata(input_tokens=1, output_tokens=1, total_tokens=2)
+
+        def chunk_calls(index: int):
+            with telemetry.tracer.start_as_current_span("preprocess_agent.chunk"):
+                for _ in range(50):
+                    telemetry.record_llm_call("m", cache_hit=False, usage=usage)
+
+        with telemetry.node_span("preprocess_agent"):
+            # the context (and the node's totals) is copied into the pool, see agent/steam_line_workflow.py
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                futures = [pool.submit(contextvars.copy_context().run, chunk_calls, index) for index in range(8)]
+                for future in futures:
+                    future.result()
+
+        attributes = self.span_attributes("preprocess_agent")
+        self.assertEqual(attributes["llm.calls"], 400)
+        self.assertEqual(attributes["gen_ai.usage.input_tokens"], 400)
+        self.assertNotIn("llm.calls", self.span_attributes("preprocess_agent.chunk"))
+
+    def test_failed_node_is_recorded(self):
+        with mock.patch.object(workflow, "invoke_llm", side_effect=RuntimeError("provider down")):
+            with self.assertRaises(RuntimeError):
+                self.run_scan()
+
+        span = next(span for span in self.spans.get_finished_spans() if span.name == "skill_identifier_agent")
+        self.assertFalse(span.status.is_ok)
+        error_types = [point["attributes"].get("error.type") for point in self.data_points("agent.node.duration")]
+        self.assertIn("RuntimeError", error_types)
+
+    def test_task_queue_wait(self):
+        telemetry.record_task_queue_wait("task", None)
+        self.assertEqual(self.data_points("agent.queue.wait"), [])
+
+        telemetry.record_task_queue_wait("task", time.time() - 5)
+        # a retry whose countdown has not passed yet did not wait in the queue
+        telemetry.record_task_queue_wait("retried", time.time() - 5, eta="2999-01-01T00:00:00+00:00")
+
+        points = {point["attributes"]["celery.task_name"]: point for point in self.data_points("agent.queue.wait")}
+        self.assertGreaterEqual(points["task"]["value"], 5)
+        self.assertEqual(points["retried"]["value"], 0)
@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from agent import steam_line_workflow as workflow
+from agent import token_budget
+from agent.tests.test_steam_line_workflow import fake_llm
+
+LONG_CV = "\n".join(
+    [
+        "Jane Doe",
+        "Backend Engineer",
+        "",
+        "Summary",
+        "Engineer building web platforms.",
+        "",
+        "Experience",
+        *[f"- Built service {i} with Python and Django for team {i}" for i in range(40)],
+        "",
+        "Hobbies",
+        *[f"- Collecting stamp series {i} from around the world" for i in range(40)],
+        "",
+        "Skills",
+        "Python, Django, PostgreSQL, Docker",
+        "Page 1 of 2",
+    ]
+)
+
+
+class TokenBudgetTestCase(SimpleTestCase):
+    def test_compact_text(self):
+        text = "Skills\n\n\n•   Python   \n• Python\n-----\nPage 2 of 3\n  Django"
+        self.assertEqual(token_budget.compact_text(text), "Skills\n\n- Python\nDjango")
+
+    def test_text_within_budget_is_only_compacted(self):
+        budgeted = token_budget.fit_to_budget("Skills\n\n\n\nPython   Django", budget=100)
+        self.assertEqual(budgeted.text, "Skills\n\nPython Django")
+        self.assertNotIn(token_budget.TRUNCATION_MARKER, budgeted.text)
+
+    def test_low_value_sections_are_dropped_first(self):
+        budgeted = token_budget.fit_to_budget(LONG_CV, budget=700)
+
+        self.assertLessEqual(token_budget.estimate_tokens(budgeted.text), 700)
+        self.assertGreater(budgeted.dropped_tokens, 0)
+        self.assertIn("Python, Django, PostgreSQL, Docker", budgeted.text)
+        self.assertIn("Built service 39", budgeted.text)
+        self.assertIn("Jane Doe", budgeted.text)
+        self.assertNotIn("stamp series 39", budgeted.text)
+        # kept sections stay in their original order
+        self.assertLess(budgeted.text.index("Experience"), budgeted.text.index("Skills"))
+        self.assertTrue(budgeted.text.endswith(token_budget.TRUNCATION_MARKER))
+
+    def test_section_that_does_not_fit_keeps_its_first_lines(self):
+        budgeted = token_budget.fit_to_budget(LONG_CV, budget=150)
+
+        self.assertLessEqual(token_budget.estimate_tokens(budgeted.text), 150)
+        self.assertIn("Python, Django, PostgreSQL, Docker", budgeted.text)
+        self.assertIn("Engineer building web platforms.", budgeted.text)
+        self.assertIn("Built service 0 ", budgeted.text)
+        self.assertNotIn("Built service 39", budgeted.text)
+
+    def test_fitting_is_deterministic(self):
+        self.assertEqual(token_budget.fit_to_budget(LONG_CV, 200), token_budget.fit_to_budget(LONG_CV, 200))
+
+    @override_settings(AGENT_PROMPT_TOKEN_BUDGETS={"preprocess_agent": 50_000, "hard_skill_analyzer_agent": 500})
+    def test_node_budget_is_capped_by_the_model(self):
+        self.assertEqual(token_budget.get_node_budget("preprocess_agent", "gemini-2.5-flash"), 16_000)
+        self.assertEqual(token_budget.get_node_budget("hard_skill_analyzer_agent", "gemini-2.5-flash"), 500)
+        self.assertEqual(token_budget.get_node_budget("summary_generator_agent", "unknown-model"), 6_000)
+
+
+@override_settings(
+    AGENT_PROMPT_TOKEN_BUDGETS={
+        "preprocess_agent": 600,
+        "hard_skill_analyzer_agent": 400,
+        "soft_skill_analyzer_agent": 5000,
+    },
+    AGENT_OUTPUT_VALIDATION=False,
+)
+class BudgetedWorkflowTestCase(SimpleTestCase):
+    def setUp(self):
+        self.prompts: dict = {}
+
+        def llm(prompt: str, on_token=None) -> str:
+            if "Preprocessed CV:" in prompt:
+                self.prompts["hard" if "Required Hard Skills:" in prompt else "soft"] = prompt
+            elif "CV Text:" in prompt:
+                self.prompts["preprocess"] = prompt
+            if "CV Text:" in prompt:
+                return prompt.split("CV Text:", 1)[1]
+            return fake_llm(prompt)
+
+        patchers: list = [
+            mock.patch.object(workflow, "invoke_llm", side_effect=llm),
+            mock.patch.object(workflow, "anonymize_text", side_effect=lambda text: text),
+            mock.patch.object(workflow, "capture_trace"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_cv_is_trimmed_per_node_and_reported(self):
+        result = (
+            workflow.build_graph("split")
+            .compile()
+            .invoke({"raw_cv_text": LONG_CV, "job_description": "need python"})  # type: ignore [arg-type]
+        )
+
+        self.assertLessEqual(token_budget.estimate_tokens(self.prompts["preprocess"]), 600)
+        self.assertLessEqual(token_budget.estimate_tokens(self.prompts["hard"]), 400)
+        # the soft skill analyzer has room for everything preprocess kept
+        self.assertIn(result["preprocessed_cv_text"].strip(), self.prompts["soft"])
+        self.assertEqual(
+            set(result["prompt_budget"]), {"preprocess_agent", "hard_skill_analyzer_agent", "soft_skill_analyzer_agent"}
+        )
+        self.assertGreater(result["prompt_budget"]["preprocess_agent"]["dropped_tokens"], 0)
+        self.assertGreater(result["prompt_budget"]["hard_skill_analyzer_agent"]["dropped_tokens"], 0)
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from agent import trace_capture
+from agent.progress import scan_progress
+from agent.trace_capture import InMemoryTraceStore, TraceBuffer
+
+PROMPT = "Contact jane.doe@example.com or +94 77 123 4567, see https://example.com/jane (2019 - 2023)"
+
+
+@override_settings(AGENT_TRACE_SAMPLE_RATE=1.0, AGENT_TRACE_MAX_CHARS=2000, AGENT_TRACE_REDACT=True)
+class TraceCaptureTestCase(SimpleTestCase):
+    def setUp(self):
+        self.store = InMemoryTraceStore()
+        self.buffer = TraceBuffer(size=3, flush_interval=60)
+        patchers: list = [
+            mock.patch.object(trace_capture, "traceStoreInstance", self.store),
+            mock.patch.object(trace_capture, "traceBufferInstance", self.buffer),
+        ]
+        for patcher in patchers:
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+        # nothing left for the flush thread to write into the next test's store
+        self.addCleanup(self.buffer.flush)
+
+    def test_captures_are_redacted_and_read_back_per_scan(self):
+        with scan_progress(7):
+            trace_capture.capture_trace("summary_generator_agent", PROMPT, "response")
+        with scan_progress(8):
+            trace_capture.capture_trace("summary_generator_agent", "other scan", "response")
+
+        [captured] = trace_capture.get_scan_traces(7)
+
+        self.assertEqual(captured["agent"], "summary_generator_agent")
+        self.assertEqual(captured["prompt"], "Contact <EMAIL_ADDRESS> or <PHONE_NUMBER>, see <URL> (2019 - 2023)")
+        self.assertEqual(captured["prompt_chars"], len(PROMPT))
+
+    @override_settings(AGENT_TRACE_MAX_CHARS=10)
+    def test_long_texts_are_truncated(self):
+        with scan_progress(7):
+            trace_capture.capture_trace("preprocess_agent", "x" * 25, "short")
+
+        [captured] = trace_capture.get_scan_traces(7)
+        self.assertEqual(captured["prompt"], "xxxxxxxxxx ... [15 chars truncated]")
+        self.assertEqual(captured["response"], "short")
+
+    def test_capture_does_not_write_anything_itself(self):
+        with scan_progress(7), mock.patch.object(self.store, "add") as add:
+            trace_capture.capture_trace("preprocess_agent", "prompt", "response")
+            add.assert_not_called()
+
+    def test_oldest_captures_are_dropped_when_full(self):
+        with scan_progress(7), mock.patch.object(self.buffer, "_wake"):
+            for i in range(5):
+                trace_capture.capture_trace(f"agent_{i}", "prompt", "response")
+
+        self.assertEqual(self.buffer.dropped, 2)
+        self.assertEqual(
+            [captured["agent"] for captured in trace_capture.get_scan_traces(7)], ["agent_2", "agent_3", "agent_4"]
+        )
+
+    @override_settings(AGENT_TRACE_SAMPLE_RATE=0.5)
+    def test_sampling_is_decided_per_scan(self):
+        sampled = [scan_id for scan_id in range(1000) if trace_capture.is_sampled(scan_id)]
+        self.assertAlmostEqual(len(sampled) / 1000, 0.5, delta=0.1)
+        # every worker makes the same decision
+        self.assertEqual(sampled, [scan_id for scan_id in range(1000) if trace_capture.is_sampled(scan_id)])
+
+    @override_settings(AGENT_TRACE_SAMPLE_RATE=0.0)
+    def test_disabled(self):
+        with scan_progress(7):
+            trace_capture.capture_trace("preprocess_agent", "prompt", "response")
+        self.assertEqual(trace_capture.get_scan_traces(7), [])
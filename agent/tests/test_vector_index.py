@@ -0,0 +1,99 @@
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from agent import vector_index
+from agent.embeddings import HashingEmbedder
+
+CVS = {
+    "backend": "Backend developer, Python, Django, PostgreSQL, REST APIs, Celery",
+    "frontend": "Frontend developer, React, TypeScript, CSS, Next.js",
+    "devops": "DevOps engineer, Kubernetes, Terraform, AWS, CI/CD pipelines",
+}
+
+
+class HashingEmbedderTestCase(SimpleTestCase):
+    def setUp(self):
+        self.embedder = HashingEmbedder(dim=512)
+
+    def test_vectors_are_normalized(self):
+        vectors = self.embedder.embed(["Python developer", ""])
+        self.assertEqual(vectors.shape, (2, 512))
+        self.assertEqual(vectors.dtype, np.float32)
+        self.assertAlmostEqual(float(np.linalg.norm(vectors[0])), 1.0, places=5)
+        self.assertEqual(float(np.linalg.norm(vectors[1])), 0.0)
+
+    def test_spelling_variants_are_close(self):
+        postgres, postgresql, react = self.embedder.embed(["Postgres", "PostgreSQL", "React"])
+        self.assertGreater(postgres @ postgresql, 0.4)
+        self.assertGreater(postgres @ postgresql, postgres @ react)
+
+    def test_vectors_are_stable(self):
+        # stored vectors must stay comparable with vectors of later processes
+        np.testing.assert_array_equal(self.embedder.embed(["Django"]), HashingEmbedder(dim=512).embed(["Django"]))
+
+
+class VectorIndexTestCase(SimpleTestCase):
+    def setUp(self):
+        self.embedder = HashingEmbedder(dim=256)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def index(self) -> vector_index.VectorIndex:
+        return vector_index.VectorIndex(self.embedder.dim, self.embedder.name, self.tmp.name)
+
+    def query(self, text: str) -> np.ndarray:
+        return self.embedder.embed([text])[0]
+
+    def test_search(self):
+        index = vector_index.VectorIndex(self.embedder.dim, self.embedder.name)
+        index.add(list(CVS), self.embedder.embed(list(CVS.values())))
+
+        results = index.search(self.query("Django and PostgreSQL"), k=2)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0][0], "backend")
+        self.assertGreater(results[0][1], results[1][1])
+        self.assertEqual(len(index.search(self.query("Django"), k=10)), 3)
+
+    def test_scores_for_selected_ids(self):
+        index = vector_index.VectorIndex(self.embedder.dim, self.embedder.name)
+        index.add(list(CVS), self.embedder.embed(list(CVS.values())))
+
+        scores = index.scores(self.query("Kubernetes on AWS"), ids=["frontend", "devops"])
+        self.assertEqual(scores.shape, (2,))
+        self.assertGreater(scores[1], scores[0])
+
+    def test_adding_an_id_again_replaces_its_vector(self):
+        index = vector_index.VectorIndex(self.embedder.dim, self.embedder.name)
+        index.add(["cv"], self.embedder.embed(["React"]))
+        index.add(["cv"], self.embedder.embed(["Kubernetes"]))
+
+        self.assertEqual(len(index), 1)
+        self.assertGreater(index.search(self.query("Kubernetes"))[0][1], 0.9)
+
+    def test_index_is_persisted_and_grows_incrementally(self):
+        index = self.index()
+        index.add(["backend"], self.embedder.embed([CVS["backend"]]))
+        ids = [f"cv-{i}" for i in range(vector_index.MIN_CAPACITY + 10)]
+        index.add(ids, self.embedder.embed(ids))
+
+        reopened = self.index()
+        self.assertEqual(reopened.ids, ["backend", *ids])
+        np.testing.assert_array_equal(reopened.vector("backend"), index.vector("backend"))
+        self.assertEqual(reopened.search(self.query(CVS["backend"]), k=1)[0][0], "backend")
+
+    def test_readers_see_rows_added_by_other_processes(self):
+        reader = self.index()
+        self.index().add(["devops"], self.embedder.embed([CVS["devops"]]))
+
+        self.assertEqual(reader.search(self.query("Terraform"), k=1)[0][0], "devops")
+
+    def test_index_of_another_embedder_is_rejected(self):
+        self.index().add(["devops"], self.embedder.embed([CVS["devops"]]))
+        with self.assertRaises(ValueError):
+            vector_index.VectorIndex(512, "hashing-512", self.tmp.name)
+
+    def test_nearest_skills(self):
+        self.assertEqual(vector_index.nearest_skills("Postgres DB", k=1)[0][0], "PostgreSQL")
+        self.assertEqual(vector_index.nearest_skills("k8s cluster", k=1)[0][0], "Kubernetes")
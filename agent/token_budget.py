@@ -0,0 +1,220 @@
+import dataclasses
+import math
+import re
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+
+# Deterministic estimate without a provider tokenizer, close enough for english CVs on gemini and qwen
+CHARS_PER_TOKEN = 4
+
+TRUNCATION_MARKER = "[... trimmed to fit the token budget]"
+
+
+@dataclasses.dataclass(frozen=True)
+class ModelTokenLimits:
+    context: int
+    # inputs above this get slow and costly long before the context window is full
+    target_input: int
+
+
+MODEL_TOKEN_LIMITS: Dict[str, ModelTokenLimits] = {
+    "gemini-2.5-flash": ModelTokenLimits(context=1_048_576, target_input=16_000),
+    "gemini-2.5-flash-lite": ModelTokenLimits(context=1_048_576, target_input=12_000),
+    # ollama defaults to a small context window for local models
+    "hhao/qwen2.5-coder-tools:0.5b": ModelTokenLimits(context=4_096, target_input=3_000),
+}
+DEFAULT_TOKEN_LIMITS = ModelTokenLimits(context=8_192, target_input=6_000)
+
+# Lower value is kept first when a CV does not fit, matched against section headings
+SECTION_PRIORITIES: List[Tuple[re.Pattern, int]] = [
+    (re.compile(r"skill|technolog|competenc|stack|tools", re.IGNORECASE), 0),
+    (re.compile(r"experience|employment|work history|career|professional", re.IGNORECASE), 1),
+    (re.compile(r"summary|profile|objective|about", re.IGNORECASE), 2),
+    (re.compile(r"project", re.IGNORECASE), 3),
+    (re.compile(r"certifica|education|qualification|training|course", re.IGNORECASE), 4),
+    (re.compile(r"award|achievement|publication|language", re.IGNORECASE), 5),
+    (re.compile(r"hobb|interest|reference|personal|declaration", re.IGNORECASE), 9),
+]
+# text before the first heading (name, title, contact line)
+HEADER_PRIORITY = 2
+DEFAULT_PRIORITY = 6
+
+PAGE_NUMBER_RE = re.compile(r"^\s*(page\s*)?\d+\s*(of|/)\s*\d+\s*$", re.IGNORECASE)
+SEPARATOR_RE = re.compile(r"^\s*[-=_*~.•·]{3,}\s*$")
+BULLET_RE = re.compile(r"^\s*[•·▪●○◦■□➢➤►▶✓✔\-*]\s*")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def get_model_limits(model: str) -> ModelTokenLimits:
+    return MODEL_TOKEN_LIMITS.get(model, DEFAULT_TOKEN_LIMITS)
+
+
+def get_node_budget(agent: str, model: str) -> int:
+    """Input tokens `agent` may send, its AGENT_PROMPT_TOKEN_BUDGETS entry capped by the model's target input."""
+    target_input = get_model_limits(model).target_input
+    return min(settings.AGENT_PROMPT_TOKEN_BUDGETS.get(agent, target_input), target_input)
+
+
+def compact_text(text: str) -> str:
+    """
+    Remove what costs tokens without carrying information: page numbers, separator lines,
+    bullet glyphs, repeated whitespace and lines repeated back to back (eg: page headers).
+    """
+    lines: List[str] = []
+    for line in text.splitlines():
+        if PAGE_NUMBER_RE.match(line) or SEPARATOR_RE.match(line):
+            continue
+        line = " ".join(BULLET_RE.sub("- ", line).split())
+        if not line:
+            # keep a single blank line between blocks
+            if lines and lines[-1]:
+                lines.append("")
+            continue
+        if lines and lines[-1] == line:
+            continue
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def _is_heading(line: str) -> bool:
+    words = line.rstrip(":").split()
+    if not words or len(words) > 5 or line.startswith("- "):
+        return False
+    if line.endswith(":") or line.isupper():
+        return True
+    # "Work Experience", but not "Built internal tools, dashboards."
+    return len(words) <= 4 and not re.search(r"[,.;]", line) and any(p.search(line) for p, _ in SECTION_PRIORITIES)
+
+
+def _section_priority(heading: str) -> int:
+    for pattern, priority in SECTION_PRIORITIES:
+        if pattern.search(heading):
+            return priority
+    return DEFAULT_PRIORITY
+
+
+@dataclasses.dataclass
+class Section:
+    lines: List[str]
+    priority: int
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+def split_sections(text: str) -> List[Section]:
+    sections = [Section(lines=[], priority=HEADER_PRIORITY)]
+    for line in text.splitlines():
+        if _is_heading(line):
+            sections.append(Section(lines=[line], priority=_section_priority(line)))
+        else:
+            sections[-1].lines.append(line)
+    return [section for section in sections if section.text.strip()]
+
+
+def _split_lines(lines: List[str], max_tokens: int) -> List[List[str]]:
+    groups: List[List[str]] = [[]]
+    used = 0
+    for line in lines:
+        # a single huge line (eg: text extracted without line breaks) is cut into pieces
+        pieces = [line[i : i + max_tokens * CHARS_PER_TOKEN] for i in range(0, len(line), max_tokens * CHARS_PER_TOKEN)]
+        for piece in pieces or [line]:
+            cost = estimate_tokens(piece) + 1
+            if groups[-1] and used + cost > max_tokens:
+                groups.append([])
+                used = 0
+            groups[-1].append(piece)
+            used += cost
+    return [group for group in groups if group]
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """Split text into chunks of about `max_tokens` at most, cutting between sections whenever possible."""
+    chunks: List[str] = []
+    current: List[str] = []
+    used = 0
+    for section in split_sections(text):
+        cost = estimate_tokens(section.text) + 1
+        pieces = [section.lines] if cost <= max_tokens else _split_lines(section.lines, max_tokens)
+        for lines in pieces:
+            cost = estimate_tokens("\n".join(lines)) + 1
+            if current and used + cost > max_tokens:
+                chunks.append("\n".join(current))
+                current, used = [], 0
+            current.extend(lines)
+            used += cost
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+@dataclasses.dataclass
+class BudgetedText:
+    text: str
+    budget: int
+    original_tokens: int
+    tokens: int
+
+    @property
+    def dropped_tokens(self) -> int:
+        return max(self.original_tokens - self.tokens, 0)
+
+    def report(self) -> Dict[str, int]:
+        return {"budget": self.budget, "original_tokens": self.original_tokens, "dropped_tokens": self.dropped_tokens}
+
+
+def _truncate_lines(lines: List[str], budget: int) -> List[str]:
+    kept: List[str] = []
+    used = 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            remaining = (budget - used) * CHARS_PER_TOKEN
+            if not kept and remaining > 0:
+                # a single huge line (eg: text extracted without line breaks)
+                kept.append(line[:remaining])
+            break
+        kept.append(line)
+        used += cost
+    return kept
+
+
+def fit_to_budget(text: str, budget: int) -> BudgetedText:
+    """
+    Compact `text` and, when it still does not fit in `budget` tokens, keep the highest value
+    CV sections that fit (see SECTION_PRIORITIES) in their original order. The most valuable
+    section that did not fit keeps its first lines. Same input, same output.
+    """
+    original_tokens = estimate_tokens(text)
+    compacted = compact_text(text)
+    if estimate_tokens(compacted) <= budget:
+        return BudgetedText(compacted, budget, original_tokens, estimate_tokens(compacted))
+
+    remaining = budget - estimate_tokens(TRUNCATION_MARKER) - 1
+    sections = split_sections(compacted)
+    kept: Dict[int, List[str]] = {}
+    skipped: List[int] = []
+    for index in sorted(range(len(sections)), key=lambda index: sections[index].priority):
+        cost = estimate_tokens(sections[index].text) + 1
+        if cost <= remaining:
+            kept[index] = sections[index].lines
+            remaining -= cost
+        else:
+            skipped.append(index)
+    if skipped and remaining > 0:
+        # what is left goes to the first lines of the most valuable section that did not fit
+        kept[skipped[0]] = _truncate_lines(sections[skipped[0]].lines, remaining)
+
+    fitted = "\n".join("\n".join(kept[index]) for index in sorted(kept) if kept[index])
+    fitted = f"{fitted}\n{TRUNCATION_MARKER}".strip()
+    return BudgetedText(fitted, budget, original_tokens, estimate_tokens(fitted))
+
+
+def budget_prompt_text(agent: str, model: str, text: str, prompt_overhead: int) -> BudgetedText:
+    """Fit the variable part of a node's prompt into what is left of its budget after the fixed part."""
+    return fit_to_budget(text, max(get_node_budget(agent, model) - prompt_overhead, 0))
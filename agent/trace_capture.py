@@ -0,0 +1,223 @@
+import atexit
+import collections
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from typing import Any, Deque, Dict, List, Optional, cast
+
+import redis
+import structlog
+from django.conf import settings
+from opentelemetry import trace
+
+from agent.anonymizer import REGEX_RECOGNIZERS
+from agent.progress import KEY_PREFIX, get_scan_id
+
+logger = structlog.get_logger(__name__)
+
+# captures kept per scan, and scans kept by the in memory store
+MAX_TRACES_PER_SCAN = 50
+IN_MEMORY_MAX_SCANS = 256
+
+# CV text is anonymized before any prompt is built, this also covers job descriptions and model output
+# with the recognizers of the "fast" anonymizer profile
+REDACTIONS = [(pattern, f"<{entity}>") for entity, pattern in REGEX_RECOGNIZERS]
+
+
+def traces_key(scan_id: int) -> str:
+    return f"{KEY_PREFIX}:{scan_id}:traces"
+
+
+def redact(text: str) -> str:
+    for pattern, replacement in REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]} ... [{len(text) - max_chars} chars truncated]"
+
+
+def is_sampled(scan_id: Optional[int]) -> bool:
+    rate = settings.AGENT_TRACE_SAMPLE_RATE
+    if rate <= 0:
+        return False
+    if rate >= 1:
+        return True
+    if scan_id is None:
+        return random.random() < rate
+    # the same decision in every worker, a sampled scan has all of its nodes captured
+    return zlib.crc32(str(scan_id).encode()) / 2**32 < rate
+
+
+class InMemoryTraceStore:
+    """Captures of the most recent scans in process memory, used when redis is not configured."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scans: collections.OrderedDict[int, Deque[Dict[str, Any]]] = collections.OrderedDict()
+
+    def add(self, scan_id: int, records: List[Dict[str, Any]]):
+        with self._lock:
+            traces = self._scans.setdefault(scan_id, collections.deque(maxlen=MAX_TRACES_PER_SCAN))
+            traces.extend(records)
+            self._scans.move_to_end(scan_id)
+            while len(self._scans) > IN_MEMORY_MAX_SCANS:
+                self._scans.popitem(last=False)
+
+    def get(self, scan_id: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._scans.get(scan_id, []))
+
+
+class RedisTraceStore:
+    def __init__(self, client: redis.Redis):
+        self._client = client
+
+    def add(self, scan_id: int, records: List[Dict[str, Any]]):
+        key = traces_key(scan_id)
+        pipeline = self._client.pipeline(transaction=False)
+        pipeline.rpush(key, *[json.dumps(record) for record in records])
+        pipeline.ltrim(key, -MAX_TRACES_PER_SCAN, -1)
+        pipeline.expire(key, settings.AGENT_TRACE_TTL)
+        pipeline.execute()
+
+    def get(self, scan_id: int) -> List[Dict[str, Any]]:
+        records = cast(List[bytes], self._client.lrange(traces_key(scan_id), 0, -1))
+        return [json.loads(record) for record in records]
+
+
+# One store per Python process, workers write and the web tier reads through redis
+traceStoreInstance: InMemoryTraceStore | RedisTraceStore | None = None
+
+
+def get_trace_store() -> InMemoryTraceStore | RedisTraceStore:
+    global traceStoreInstance
+    if traceStoreInstance is None:
+        if settings.REDIS_URL:
+            traceStoreInstance = RedisTraceStore(redis.from_url(settings.REDIS_URL))
+        else:
+            traceStoreInstance = InMemoryTraceStore()
+    return traceStoreInstance
+
+
+class TraceBuffer:
+    """
+    Bounded ring of captured prompts and responses, written out by a background thread.
+
+    Nodes only append a reference to the texts they already hold, truncating, redacting, logging
+    and storing happen on the flush thread every `flush_interval` seconds (or once the ring is half
+    full). When captures come in faster than they are flushed the oldest ones are dropped.
+    """
+
+    def __init__(self, size: int, flush_interval: float):
+        self.size = size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._records: Deque[Dict[str, Any]] = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, record: Dict[str, Any]):
+        with self._lock:
+            if len(self._records) == self.size:
+                self.dropped += 1
+            self._records.append(record)
+            if len(self._records) >= self.size // 2:
+                # flush early instead of dropping captures
+                self._wake.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-flush", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write out everything captured so far, also called before captures are read."""
+        with self._flush_lock:
+            with self._lock:
+                records = list(self._records)
+                self._records.clear()
+                dropped, self.dropped = self.dropped, 0
+            if dropped:
+                logger.warning("agent traces dropped, the capture buffer was full", dropped=dropped)
+            by_scan: Dict[int, List[Dict[str, Any]]] = {}
+            for record in records:
+                record = _finish_record(record)
+                logger.info("agent trace", **record)
+                if record["scan_id"] is not None:
+                    by_scan.setdefault(record["scan_id"], []).append(record)
+            for scan_id, scan_records in by_scan.items():
+                try:
+                    get_trace_store().add(scan_id, scan_records)
+                except Exception:
+                    # best effort, like progress events
+                    logger.warning("could not store agent traces", scan_id=scan_id, exc_info=True)
+
+
+def _finish_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    max_chars = settings.AGENT_TRACE_MAX_CHARS
+    finished = {**record, "prompt_chars": len(record["prompt"]), "response_chars": len(record["response"])}
+    for key in ("prompt", "response"):
+        # truncated first, so long CVs are never scanned in full
+        text = truncate(record[key], max_chars)
+        finished[key] = redact(text) if settings.AGENT_TRACE_REDACT else text
+    return finished
+
+
+# One buffer per Python process, a forked child starts with an empty one
+traceBufferInstance: Optional[TraceBuffer] = None
+
+
+def get_trace_buffer() -> TraceBuffer:
+    global traceBufferInstance
+    if traceBufferInstance is None:
+        traceBufferInstance = TraceBuffer(settings.AGENT_TRACE_BUFFER_SIZE, settings.AGENT_TRACE_FLUSH_INTERVAL)
+    return traceBufferInstance
+
+
+def _forget_buffer():
+    global traceBufferInstance
+    traceBufferInstance = None
+
+
+def _flush_at_exit():
+    if traceBufferInstance is not None:
+        traceBufferInstance.flush()
+
+
+os.register_at_fork(after_in_child=_forget_buffer)
+atexit.register(_flush_at_exit)
+
+
+def capture_trace(agent: str, prompt: str, response: str):
+    """
+    Capture a node's prompt and response for the scan running in the current context.
+
+    Only AGENT_TRACE_SAMPLE_RATE of the scans are captured, see `get_scan_traces` to read them back.
+    """
+    scan_id = get_scan_id()
+    if not is_sampled(scan_id):
+        return
+    trace.get_current_span().add_event("agent.trace.captured", {"agent.name": agent})
+    get_trace_buffer().add(
+        {"scan_id": scan_id, "agent": agent, "captured_at": time.time(), "prompt": prompt, "response": response}
+    )
+
+
+def get_scan_traces(scan_id: int) -> List[Dict[str, Any]]:
+    """Captured prompts and responses of a scan, oldest first. Empty when the scan was not sampled."""
+    if traceBufferInstance is not None:
+        traceBufferInstance.flush()
+    return get_trace_store().get(scan_id)
@@ -0,0 +1,184 @@
+import contextlib
+import fcntl
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from agent.embeddings import get_embedder
+from agent.skill_matcher import SKILL_TAXONOMY
+
+INDEX_FILE = "index.json"
+VECTORS_FILE = "vectors.npy"
+LOCK_FILE = ".lock"
+MIN_CAPACITY = 64
+
+
+class VectorIndex:
+    """
+    Cosine similarity search over L2 normalized vectors kept in one NumPy matrix, a query is a
+    single matrix-vector product.
+
+    With a `path`, vectors live in a memory-mapped .npy file and the ids in a json file next to it.
+    Adds are incremental: rows are written in place and the file grows by doubling. Writers from
+    several processes are serialized with a file lock, readers pick up new rows on their next search.
+    """
+
+    def __init__(self, dim: int, embedder_name: str, path: Optional[Path | str] = None):
+        self.dim = dim
+        self.embedder_name = embedder_name
+        self.path = Path(path) if path else None
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._vectors: np.ndarray = np.zeros((0, dim), dtype=np.float32)
+        self._loaded_mtime: Optional[int] = None
+        if self.path:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._rows
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._ids)
+
+    def _meta_path(self) -> Path:
+        assert self.path is not None
+        return self.path / INDEX_FILE
+
+    def _load(self):
+        meta_path = self._meta_path()
+        if not meta_path.exists():
+            return
+        meta = json.loads(meta_path.read_text())
+        if meta["dim"] != self.dim or meta["embedder"] != self.embedder_name:
+            raise ValueError(
+                f"index at {self.path} holds {meta['embedder']} vectors of {meta['dim']} dimensions, "
+                f"not {self.embedder_name} vectors of {self.dim}"
+            )
+        self._ids = meta["ids"]
+        self._rows = {id: row for row, id in enumerate(self._ids)}
+        self._vectors = np.load(self.path / VECTORS_FILE, mmap_mode="r+")  # type: ignore [operator]
+        self._loaded_mtime = meta_path.stat().st_mtime_ns
+
+    def refresh(self):
+        """Pick up rows other processes added since the index was loaded."""
+        if self.path and self._meta_path().exists() and self._meta_path().stat().st_mtime_ns != self._loaded_mtime:
+            self._load()
+
+    @contextlib.contextmanager
+    def _lock(self) -> Iterator[None]:
+        assert self.path is not None
+        with open(self.path / LOCK_FILE, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _grow(self, needed: int):
+        capacity = max(MIN_CAPACITY, 2 * len(self._vectors), needed)
+        count = len(self._ids)
+        if self.path is None:
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            vectors[:count] = self._vectors[:count]
+            self._vectors = vectors
+            return
+        # copy into a bigger file and swap it in, readers keep their old mapping until they refresh
+        tmp_path = self.path / f"{VECTORS_FILE}.tmp"
+        vectors = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, self.dim))
+        vectors[:count] = self._vectors[:count]
+        vectors.flush()
+        os.replace(tmp_path, self.path / VECTORS_FILE)
+        self._vectors = np.load(self.path / VECTORS_FILE, mmap_mode="r+")
+
+    def _add(self, ids: Sequence[str], vectors: np.ndarray):
+        new_ids = [id for id in dict.fromkeys(ids) if id not in self._rows]
+        if len(self._ids) + len(new_ids) > len(self._vectors):
+            self._grow(len(self._ids) + len(new_ids))
+        for id in new_ids:
+            self._rows[id] = len(self._ids)
+            self._ids.append(id)
+        # an id added again replaces its vector
+        self._vectors[[self._rows[id] for id in ids]] = vectors
+
+    def _save(self):
+        assert self.path is not None
+        if isinstance(self._vectors, np.memmap):
+            self._vectors.flush()
+        # vectors first, a crash in between leaves rows the ids do not point to yet
+        tmp_path = self.path / f"{INDEX_FILE}.tmp"
+        tmp_path.write_text(json.dumps({"embedder": self.embedder_name, "dim": self.dim, "ids": self._ids}))
+        os.replace(tmp_path, self._meta_path())
+        self._loaded_mtime = self._meta_path().stat().st_mtime_ns
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        if not ids:
+            return
+        if self.path is None:
+            self._add(ids, vectors)
+            return
+        with self._lock():
+            self.refresh()
+            self._add(ids, vectors)
+            self._save()
+
+    def vector(self, id: str) -> np.ndarray:
+        return np.array(self._vectors[self._rows[id]])
+
+    def scores(self, query: np.ndarray, ids: Optional[Sequence[str]] = None) -> np.ndarray:
+        """Cosine similarity of `query` with every vector, or only with those of `ids` (in that order)."""
+        self.refresh()
+        vectors = self._vectors[: len(self._ids)]
+        if ids is not None:
+            vectors = vectors[[self._rows[id] for id in ids]]
+        return vectors @ np.asarray(query, dtype=np.float32)
+
+    def search(self, query: np.ndarray, k: int = 10) -> List[Tuple[str, float]]:
+        """The `k` most similar ids with their score, most similar first."""
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self._ids[row], float(scores[row])) for row in top]
+
+
+# One index of each kind per Python process
+skillIndexInstance: VectorIndex | None = None
+cvIndexInstance: VectorIndex | None = None
+
+
+def get_skill_index() -> VectorIndex:
+    """In memory index of the skill taxonomy, one vector per canonical skill and its synonyms."""
+    global skillIndexInstance
+    if skillIndexInstance is None:
+        embedder = get_embedder()
+        skillIndexInstance = VectorIndex(embedder.dim, embedder.name)
+        texts = [" ".join([canonical, *synonyms]) for canonical, synonyms in SKILL_TAXONOMY.items()]
+        skillIndexInstance.add(list(SKILL_TAXONOMY), embedder.embed(texts))
+    return skillIndexInstance
+
+
+def nearest_skills(text: str, k: int = 5) -> List[Tuple[str, float]]:
+    """Taxonomy skills closest to `text` (eg: "Postgres DB" -> PostgreSQL)."""
+    return get_skill_index().search(get_embedder().embed([text])[0], k)
+
+
+def get_cv_index() -> VectorIndex:
+    """Index of preprocessed CVs by CV id, persisted under AGENT_VECTOR_INDEX_DIR."""
+    global cvIndexInstance
+    if cvIndexInstance is None:
+        embedder = get_embedder()
+        path = Path(settings.AGENT_VECTOR_INDEX_DIR) / embedder.name.replace("/", "_") / "cvs"
+        cvIndexInstance = VectorIndex(embedder.dim, embedder.name, path)
+    return cvIndexInstance
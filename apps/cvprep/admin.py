@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from apps.cvprep.models import CV, CVScan
+from apps.cvprep.models import CV, CVScan, JobDescription
 
 admin.site.register(CV)
 admin.site.register(CVScan)
+admin.site.register(JobDescription)
@@ -0,0 +1,227 @@
+import asyncio
+import datetime
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from django.db.models import QuerySet
+from django.utils import timezone
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.graph.state import CompiledStateGraph
+
+from .models import WorkflowCheckpoint, WorkflowCheckpointWrite
+
+
+class DjangoCheckpointSaver(BaseCheckpointSaver[int]):
+    """
+    LangGraph checkpointer that keeps workflow checkpoints in the django database.
+
+    A checkpoint holds the whole (small) workflow state, so channel values are stored inline
+    instead of as separate blobs. Writes of nodes that finished while a sibling node failed are
+    kept too, langgraph does not run those nodes again when the workflow resumes.
+
+    The async methods run the ORM calls in a thread, the workflow may be driven by agent/runner.py.
+    Langgraph saves from its own threads, writes are serialized since sqlite allows a single writer
+    (they are a few small rows per step).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+
+    def _config(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+        return {
+            "configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}
+        }
+
+    def _to_tuple(self, row: WorkflowCheckpoint) -> CheckpointTuple:
+        writes = WorkflowCheckpointWrite.objects.filter(
+            thread_id=row.thread_id, checkpoint_ns=row.checkpoint_ns, checkpoint_id=row.checkpoint_id
+        ).order_by("task_id", "idx")
+        return CheckpointTuple(
+            config=self._config(row.thread_id, row.checkpoint_ns, row.checkpoint_id),
+            checkpoint=self.serde.loads_typed((row.checkpoint_type, bytes(row.checkpoint))),
+            metadata=self.serde.loads_typed((row.metadata_type, bytes(row.metadata))),
+            parent_config=(
+                self._config(row.thread_id, row.checkpoint_ns, row.parent_checkpoint_id)
+                if row.parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (write.task_id, write.channel, self.serde.loads_typed((write.value_type, bytes(write.value))))
+                for write in writes
+            ],
+        )
+
+    def _queryset(self, config: Optional[RunnableConfig]) -> "QuerySet[WorkflowCheckpoint]":
+        queryset = WorkflowCheckpoint.objects.all()
+        if config:
+            configurable = config["configurable"]
+            queryset = queryset.filter(thread_id=configurable["thread_id"])
+            if configurable.get("checkpoint_ns") is not None:
+                queryset = queryset.filter(checkpoint_ns=configurable["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                queryset = queryset.filter(checkpoint_id=checkpoint_id)
+        # checkpoint ids are time ordered
+        return queryset.order_by("-checkpoint_id")
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        row = self._queryset(
+            {"configurable": {**configurable, "checkpoint_ns": configurable.get("checkpoint_ns", "")}}
+        ).first()
+        return self._to_tuple(row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        queryset = self._queryset(config)
+        if before and (before_checkpoint_id := get_checkpoint_id(before)):
+            queryset = queryset.filter(checkpoint_id__lt=before_checkpoint_id)
+
+        for row in queryset.iterator():
+            checkpoint_tuple = self._to_tuple(row)
+            if filter and not all(checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_bytes = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_bytes = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            WorkflowCheckpoint.objects.update_or_create(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                checkpoint_id=checkpoint["id"],
+                defaults={
+                    "parent_checkpoint_id": configurable.get("checkpoint_id") or "",
+                    "checkpoint_type": checkpoint_type,
+                    "checkpoint": checkpoint_bytes,
+                    "metadata_type": metadata_type,
+                    "metadata": metadata_bytes,
+                },
+            )
+        return self._config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        for idx, (channel, value) in enumerate(writes):
+            value_type, value_bytes = self.serde.dumps_typed(value)
+            lookup = {
+                "thread_id": configurable["thread_id"],
+                "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+                "checkpoint_id": configurable["checkpoint_id"],
+                "task_id": task_id,
+                "idx": WRITES_IDX_MAP.get(channel, idx),
+            }
+            fields = {"task_path": task_path, "channel": channel, "value_type": value_type, "value": value_bytes}
+            with self._lock:
+                if lookup["idx"] >= 0:
+                    # regular writes are saved once, special ones (errors, interrupts) are replaced
+                    WorkflowCheckpointWrite.objects.get_or_create(**lookup, defaults=fields)
+                else:
+                    WorkflowCheckpointWrite.objects.update_or_create(**lookup, defaults=fields)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            WorkflowCheckpoint.objects.filter(thread_id=thread_id).delete()
+            WorkflowCheckpointWrite.objects.filter(thread_id=thread_id).delete()
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoint_tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def delete_stale_checkpoints(max_age: float) -> int:
+    """Remove checkpoints of scans that never finished (eg: ran out of retries), returns the number deleted."""
+    cutoff = timezone.now() - datetime.timedelta(seconds=max_age)
+    thread_ids = set(WorkflowCheckpoint.objects.filter(modified__lt=cutoff).values_list("thread_id", flat=True))
+    # keep threads that are still being written to
+    thread_ids -= set(WorkflowCheckpoint.objects.filter(modified__gte=cutoff).values_list("thread_id", flat=True))
+    deleted, _ = WorkflowCheckpoint.objects.filter(thread_id__in=thread_ids).delete()
+    WorkflowCheckpointWrite.objects.filter(thread_id__in=thread_ids).delete()
+    return deleted
+
+
+def scan_thread_id(scan_id: int) -> str:
+    return f"cv-scan-{scan_id}"
+
+
+# One checkpointed workflow per Python process
+checkpointedWorkflowInstance: CompiledStateGraph | None = None
+
+
+def get_checkpointed_workflow() -> CompiledStateGraph:
+    global checkpointedWorkflowInstance
+    if checkpointedWorkflowInstance is None:
+        from agent.steam_line_workflow import compile_workflow
+
+        checkpointedWorkflowInstance = compile_workflow(checkpointer=DjangoCheckpointSaver())
+    return checkpointedWorkflowInstance
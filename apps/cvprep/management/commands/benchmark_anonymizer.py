@@ -0,0 +1,82 @@
+import time
+from typing import Dict, List, Tuple
+
+from django.core.management.base import BaseCommand
+
+from agent.anonymizer import (
+    ANONYMIZER_PROFILES,
+    EngineRegistry,
+    anonymize_text,
+    anonymize_texts,
+)
+from agent.anonymizer_samples import ANONYMIZER_SAMPLES
+from apps.cvprep.management.commands.benchmark_pipeline import percentile
+
+
+def pii_recall(anonymized: str, pii: List[Tuple[str, str]]) -> Dict[str, Tuple[int, int]]:
+    """entity type -> (removed, expected), a piece of PII counts as removed when its text is gone."""
+    recall: Dict[str, Tuple[int, int]] = {}
+    for entity, value in pii:
+        removed, expected = recall.get(entity, (0, 0))
+        recall[entity] = (removed + (value not in anonymized), expected + 1)
+    return recall
+
+
+class Command(BaseCommand):
+    help = (
+        "Anonymizes the bundled sample CVs (agent/anonymizer_samples.py) with each anonymizer profile and reports "
+        "the per document latency and the recall of the annotated PII. Engine loading is reported separately. "
+        "`batch` is the per document time when all samples go through anonymize_texts at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profiles",
+            nargs="+",
+            choices=sorted(ANONYMIZER_PROFILES),
+            default=list(ANONYMIZER_PROFILES),
+            help="Profiles to benchmark, see AGENT_ANONYMIZER_PROFILE",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Times every sample is anonymized")
+
+    def handle(self, *args, **options):
+        entities = sorted({entity for sample in ANONYMIZER_SAMPLES for entity, _ in sample.pii})
+        self.stdout.write(
+            f"{'profile':<10}{'load (s)':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}{'batch (ms)':>12}{'recall':>8}"
+            + "".join(f"{entity:>15}" for entity in entities)
+        )
+        for name in options["profiles"]:
+            registry = EngineRegistry(profile=name)
+            try:
+                # the first document pays for lazy initialization, like warm_up in a worker
+                registry.warm_up()
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"{name:<10}could not load the engines: {e}"))
+                continue
+
+            latencies: List[float] = []
+            recall: Dict[str, Tuple[int, int]] = {}
+            for sample in ANONYMIZER_SAMPLES:
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    anonymized = anonymize_text(sample.text, registry=registry)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                # the output is deterministic, recall is counted once per sample
+                for entity, (removed, expected) in pii_recall(anonymized, sample.pii).items():
+                    total_removed, total_expected = recall.get(entity, (0, 0))
+                    recall[entity] = (total_removed + removed, total_expected + expected)
+
+            texts = [sample.text for sample in ANONYMIZER_SAMPLES]
+            started = time.perf_counter()
+            for _ in range(options["repeat"]):
+                anonymize_texts(texts, registry=registry)
+            batch = (time.perf_counter() - started) * 1000 / (options["repeat"] * len(texts))
+
+            removed = sum(removed for removed, _ in recall.values())
+            expected = sum(expected for _, expected in recall.values())
+            self.stdout.write(
+                f"{name:<10}{registry.metrics.load_seconds:>10.2f}{percentile(latencies, 50):>10.2f}"
+                f"{percentile(latencies, 95):>10.2f}{batch:>12.2f}{removed / expected:>8.0%}"
+                + "".join(f"{recall[entity][0] / recall[entity][1]:>15.0%}" for entity in entities)
+            )
+        self.stdout.write(self.style.SUCCESS(f"Benchmark finished, {len(ANONYMIZER_SAMPLES)} samples"))
@@ -0,0 +1,149 @@
+import math
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from agent.fake_llm import HARD_SKILLS, SOFT_SKILLS
+from agent.progress import channel_name, get_progress_broker
+from apps.cvprep.models import CV, CVOwner, CVScan, JobDescription
+from apps.cvprep.tasks import analyze_cv_task
+from apps.users.models import User
+
+BENCHMARK_USERNAME = "pipeline-benchmark"
+
+JOB_DESCRIPTION = """
+Backend engineer to build our CV analysis platform with Python, Django, Celery and PostgreSQL.
+Experience with Docker, Redis and AWS is a plus. We value communication, ownership and mentoring.
+"""
+
+
+def synthetic_cv_text(index: int) -> str:
+    """A CV with personal details for the anonymizer and a different mix of skills per index."""
+    hard_skills = [HARD_SKILLS[(index + offset) % len(HARD_SKILLS)] for offset in range(4)]
+    soft_skills = [SOFT_SKILLS[(index + offset) % len(SOFT_SKILLS)] for offset in range(2)]
+    return f"""
+    Candidate {index}
+    candidate{index}@example.com | +1 555 010 {index % 10000:04d} | 42 Example Street, Springfield
+
+    Summary
+    Software engineer with {index % 12 + 1} years of experience building web applications.
+
+    Experience
+    Senior Developer at Example Corp ({2024 - index % 12} - present)
+    - Built services with {", ".join(hard_skills[:2])}
+    - Introduced {hard_skills[2]} to the deployment pipeline
+
+    Skills
+    {", ".join(hard_skills)}, {", ".join(soft_skills)}
+    """
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def peak_rss_mb() -> float:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs synthetic CVs through analyze_cv_task and reports scans/min, per node latency and peak RSS. "
+        "Scans run inside this process, like a celery worker with --pool=threads --concurrency=<concurrency>. "
+        "Set AGENT_LLM_NAME=FakeChatModel to measure the pipeline without calling an LLM provider."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scans", type=int, default=20, help="Number of synthetic CVs to scan")
+        parser.add_argument("--concurrency", type=int, default=4, help="Scans running at the same time")
+        parser.add_argument(
+            "--use-cache",
+            action="store_true",
+            help="Reuse cached LLM responses and stored results, by default every scan runs every node",
+        )
+        parser.add_argument("--keep", action="store_true", help="Keep the synthetic CVs and scans afterwards")
+
+    def run_scan(self, cv_scan: CVScan, refresh_llm_cache: bool) -> Dict[str, Any]:
+        # subscribe before starting, the nodes publish their durations to the scan channel
+        subscription = get_progress_broker().subscribe(channel_name(cv_scan.id))
+        try:
+            result = analyze_cv_task.apply(args=[cv_scan.cv_id, cv_scan.id, refresh_llm_cache])
+            events = []
+            while (event := subscription.get(timeout=0.1)) is not None:
+                events.append(event)
+            return {"successful": result.successful(), "events": events}
+        finally:
+            subscription.close()
+            connection.close()
+
+    def handle(self, *args, **options):
+        if settings.AGENT_LLM_NAME != "FakeChatModel":
+            self.stdout.write(
+                self.style.WARNING(f"Benchmarking with {settings.AGENT_LLM_NAME}, scans use the provider quota")
+            )
+
+        user = User.objects.filter(username=BENCHMARK_USERNAME).first()
+        if user is None:
+            # nobody logs in as the benchmark owner
+            user = User.objects.create_user(username=BENCHMARK_USERNAME, password=None)
+        owner, _ = CVOwner.objects.get_or_create(user=user)
+        job_description = JobDescription.for_text(JOB_DESCRIPTION)
+        cv_scans = []
+        for index in range(options["scans"]):
+            cv = CV.objects.create(
+                title=f"Benchmark CV {index}",
+                file=ContentFile(b"", name=f"benchmark-{index}.pdf"),
+                cv_text=synthetic_cv_text(index),
+                owner=owner,
+            )
+            cv_scans.append(
+                CVScan.objects.create(
+                    title=f"Benchmark scan {index}",
+                    cv=cv,
+                    job_description=JOB_DESCRIPTION,
+                    job_description_ref=job_description,
+                )
+            )
+
+        refresh_llm_cache = not options["use_cache"]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            runs = list(pool.map(lambda cv_scan: self.run_scan(cv_scan, refresh_llm_cache), cv_scans))
+        elapsed = time.perf_counter() - started
+
+        durations: Dict[str, List[float]] = {}
+        retries = 0
+        for run in runs:
+            for event in run["events"]:
+                if event["event"] == "retry":
+                    retries += 1
+                elif event["event"] == "node" and not event["skipped"]:
+                    durations.setdefault(event["node"], []).append(event["duration"])
+
+        finished = sum(run["successful"] for run in runs)
+        self.stdout.write(
+            f"{finished} scans finished, {len(runs) - finished} failed, {retries} retries in {elapsed:.1f}s "
+            f"({finished / elapsed * 60:.1f} scans/min)"
+        )
+        self.stdout.write(f"{'node':<28}{'calls':>8}{'p50 (s)':>10}{'p95 (s)':>10}")
+        for node, values in sorted(durations.items()):
+            self.stdout.write(
+                f"{node:<28}{len(values):>8}{percentile(values, 50):>10.3f}{percentile(values, 95):>10.3f}"
+            )
+        self.stdout.write(f"peak worker RSS: {peak_rss_mb():.1f} MB")
+
+        if not options["keep"]:
+            CV.objects.filter(pk__in=[cv_scan.cv_id for cv_scan in cv_scans]).delete()
+            JobDescription.objects.filter(pk=job_description.pk, scans__isnull=True).delete()
+        self.stdout.write(self.style.SUCCESS("Benchmark finished"))
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cvprep", "0004_cvscan_title"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JobDescription",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("modified", models.DateTimeField(auto_now=True)),
+                ("text", models.TextField(blank=True)),
+                ("text_hash", models.CharField(max_length=64, unique=True)),
+                ("identified_hard_skills", models.TextField(blank=True)),
+                ("identified_soft_skills", models.TextField(blank=True)),
+                ("extraction_model", models.CharField(blank=True, max_length=255)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.AddField(
+            model_name="cvscan",
+            name="job_description_ref",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="scans",
+                to="cvprep.jobdescription",
+            ),
+        ),
+    ]
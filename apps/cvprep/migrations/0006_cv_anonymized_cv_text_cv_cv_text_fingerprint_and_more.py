@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cvprep", "0005_jobdescription_cvscan_job_description_ref"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cv",
+            name="anonymized_cv_text",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name="cv",
+            name="cv_text_fingerprint",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="cv",
+            name="preprocess_model",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="cv",
+            name="preprocessed_cv_text",
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cvprep", "0006_cv_anonymized_cv_text_cv_cv_text_fingerprint_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WorkflowCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("modified", models.DateTimeField(auto_now=True)),
+                ("thread_id", models.CharField(max_length=255)),
+                (
+                    "checkpoint_ns",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                ("checkpoint_id", models.CharField(max_length=255)),
+                (
+                    "parent_checkpoint_id",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                ("checkpoint_type", models.CharField(max_length=64)),
+                ("checkpoint", models.BinaryField()),
+                ("metadata_type", models.CharField(max_length=64)),
+                ("metadata", models.BinaryField()),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("thread_id", "checkpoint_ns", "checkpoint_id"),
+                        name="unique_workflow_checkpoint",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="WorkflowCheckpointWrite",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("modified", models.DateTimeField(auto_now=True)),
+                ("thread_id", models.CharField(max_length=255)),
+                (
+                    "checkpoint_ns",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                ("checkpoint_id", models.CharField(max_length=255)),
+                ("task_id", models.CharField(max_length=255)),
+                ("task_path", models.CharField(blank=True, default="", max_length=255)),
+                ("idx", models.IntegerField()),
+                ("channel", models.CharField(max_length=255)),
+                ("value_type", models.CharField(max_length=64)),
+                ("value", models.BinaryField()),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=(
+                            "thread_id",
+                            "checkpoint_ns",
+                            "checkpoint_id",
+                            "task_id",
+                            "idx",
+                        ),
+                        name="unique_workflow_checkpoint_write",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cvprep", "0007_workflowcheckpoint_workflowcheckpointwrite"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cvscan",
+            name="prompt_budget",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
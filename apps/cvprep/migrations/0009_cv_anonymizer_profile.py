@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cvprep", "0008_cvscan_prompt_budget"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cv",
+            name="anonymizer_profile",
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cvprep", "0009_cv_anonymizer_profile"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="cvscan",
+            name="scan_status",
+            field=models.CharField(
+                choices=[
+                    ("pe", "PENDING"),
+                    ("st", "STARTED"),
+                    ("pr", "PROCESSING"),
+                    ("fi", "FINISHED"),
+                    ("fa", "FAILED"),
+                ],
+                default="pe",
+                max_length=2,
+            ),
+        ),
+    ]
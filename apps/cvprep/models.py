@@ -1,3 +1,7 @@
+import hashlib
+import re
+from typing import Optional
+
 from django.db import models
 
 from apps.users.models import User
@@ -28,6 +32,98 @@ class CV(TimeStampedModel):
     cv_text = models.TextField(blank=True)
     owner = models.ForeignKey(CVOwner, on_delete=models.CASCADE)
 
+    # Artifacts that only depend on cv_text, computed once and reused by every scan of this CV.
+    # They are valid while cv_text_fingerprint matches the current cv_text.
+    cv_text_fingerprint = models.CharField(max_length=64, blank=True)
+    anonymized_cv_text = models.TextField(blank=True)
+    preprocessed_cv_text = models.TextField(blank=True)
+    # model that produced preprocessed_cv_text
+    preprocess_model = models.CharField(max_length=255, blank=True)
+    # anonymizer profile that produced anonymized_cv_text, see AGENT_ANONYMIZER_PROFILE
+    anonymizer_profile = models.CharField(max_length=32, blank=True)
+
+    @staticmethod
+    def fingerprint(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_artifacts(self, model: str, anonymizer_profile: str) -> dict[str, str]:
+        """
+        Stored artifacts still valid for the current cv_text, preprocessed text only if made by `model`,
+        the model the preprocess node is routed to for this CV (see `preprocess_model_id`).
+
+        Nothing is returned when another anonymizer profile made them: a lighter profile leaves PII that a
+        stricter one removes, and the preprocessed text was derived from that anonymized text.
+        """
+        if not self.cv_text_fingerprint or self.cv_text_fingerprint != self.fingerprint(self.cv_text):
+            return {}
+        if self.anonymizer_profile != anonymizer_profile:
+            return {}
+        artifacts = {}
+        if self.anonymized_cv_text:
+            artifacts["anonymized_cv_text"] = self.anonymized_cv_text
+            if self.preprocessed_cv_text and self.preprocess_model == model:
+                artifacts["preprocessed_cv_text"] = self.preprocessed_cv_text
+        return artifacts
+
+    def save_artifacts(self, anonymized_cv_text: str, preprocessed_cv_text: str, model: str, anonymizer_profile: str):
+        self.cv_text_fingerprint = self.fingerprint(self.cv_text)
+        self.anonymized_cv_text = anonymized_cv_text
+        self.preprocessed_cv_text = preprocessed_cv_text
+        self.preprocess_model = model
+        self.anonymizer_profile = anonymizer_profile
+        self.save(
+            update_fields=[
+                "cv_text_fingerprint",
+                "anonymized_cv_text",
+                "preprocessed_cv_text",
+                "preprocess_model",
+                "anonymizer_profile",
+                "modified",
+            ]
+        )
+
+
+class JobDescription(TimeStampedModel):
+    """
+    A job posting shared by every scan made against it, so skills are extracted from it only once.
+
+    Postings are deduplicated on a hash of the normalized text (case and whitespace insensitive).
+    """
+
+    text = models.TextField(blank=True)
+    text_hash = models.CharField(max_length=64, unique=True)
+
+    # Json, same format as the CVScan fields
+    identified_hard_skills = models.TextField(blank=True)
+    identified_soft_skills = models.TextField(blank=True)
+    # model that produced the identified skills, extraction is redone when the model changes
+    extraction_model = models.CharField(max_length=255, blank=True)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return re.sub(r"\s+", " ", text).strip().casefold()
+
+    @classmethod
+    def hash_text(cls, text: str) -> str:
+        return hashlib.sha256(cls.normalize(text).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def for_text(cls, text: str) -> "JobDescription":
+        job_description, _ = cls.objects.get_or_create(text_hash=cls.hash_text(text), defaults={"text": text})
+        return job_description
+
+    def has_extraction(self, model: Optional[str] = None) -> bool:
+        """
+        Skills are extracted, by `model` when given: the model(s) the skill identifier nodes are routed to,
+        see `skill_extraction_model_id`.
+        """
+        if not (self.identified_hard_skills and self.identified_soft_skills):
+            return False
+        return model is None or self.extraction_model == model
+
+    def __str__(self):
+        return self.text[:50]
+
 
 class CVScan(TimeStampedModel):
     title = models.CharField(max_length=255, default="Untitled Scan")
@@ -37,9 +133,15 @@ class CVScan(TimeStampedModel):
         STARTED = "st", "STARTED"
         PROCESSING = "pr", "PROCESSING"
         FINISHED = "fi", "FINISHED"
+        # retries exhausted or abandoned, see apps/cvprep/tasks.py
+        FAILED = "fa", "FAILED"
 
     cv = models.ForeignKey(CV, on_delete=models.CASCADE)
     job_description = models.TextField(blank=True)
+    # set when the scan runs, reuses skills already extracted for the same job description
+    job_description_ref = models.ForeignKey(
+        JobDescription, null=True, blank=True, on_delete=models.SET_NULL, related_name="scans"
+    )
     scan_status = models.CharField(max_length=2, choices=ScanStatus.choices, default=ScanStatus.PENDING)
     # CV_STATUS = [
     #     ("pe", "PENDING"),
@@ -59,3 +161,57 @@ class CVScan(TimeStampedModel):
     hard_skill_analyser_output = models.TextField(blank=True)
     soft_skill_analyser_output = models.TextField(blank=True)
     summary_generator_output = models.TextField(blank=True)
+    # agent -> {budget, original_tokens, dropped_tokens} of the CV text it was sent, see agent/token_budget.py
+    prompt_budget = models.JSONField(default=dict, blank=True)
+
+
+class WorkflowCheckpoint(TimeStampedModel):
+    """
+    LangGraph checkpoint of a scan's workflow state, written after every step so a retried
+    scan resumes at the node that failed. See apps/cvprep/checkpointer.py.
+    """
+
+    thread_id = models.CharField(max_length=255)
+    checkpoint_ns = models.CharField(max_length=255, blank=True, default="")
+    checkpoint_id = models.CharField(max_length=255)
+    parent_checkpoint_id = models.CharField(max_length=255, blank=True, default="")
+    # serialized with the checkpointer serde, type tag + payload
+    checkpoint_type = models.CharField(max_length=64)
+    checkpoint = models.BinaryField()
+    metadata_type = models.CharField(max_length=64)
+    metadata = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["thread_id", "checkpoint_ns", "checkpoint_id"], name="unique_workflow_checkpoint"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.thread_id} {self.checkpoint_id}"
+
+
+class WorkflowCheckpointWrite(TimeStampedModel):
+    """Output of a node that finished in a step whose checkpoint is not written yet (eg: a sibling node failed)."""
+
+    thread_id = models.CharField(max_length=255)
+    checkpoint_ns = models.CharField(max_length=255, blank=True, default="")
+    checkpoint_id = models.CharField(max_length=255)
+    task_id = models.CharField(max_length=255)
+    task_path = models.CharField(max_length=255, blank=True, default="")
+    idx = models.IntegerField()
+    channel = models.CharField(max_length=255)
+    value_type = models.CharField(max_length=64)
+    value = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"],
+                name="unique_workflow_checkpoint_write",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.thread_id} {self.checkpoint_id} {self.channel}"
@@ -0,0 +1,119 @@
+import dataclasses
+from typing import List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+
+from .models import CV, CVScan, JobDescription
+
+
+@dataclasses.dataclass
+class CVRank:
+    cv: CV
+    score: float
+    similarity: float
+    # None when the job description has no extracted skills yet
+    skill_coverage: Optional[float] = None
+    found_hard_skills: List[str] = dataclasses.field(default_factory=list)
+    missing_hard_skills: List[str] = dataclasses.field(default_factory=list)
+    scan: Optional[CVScan] = None
+    # 1 for the best CV
+    rank: int = 0
+
+
+def ranking_text(cv: CV) -> str:
+    # preprocessed text has the noise removed, any model's version will do for ranking
+    if cv.preprocessed_cv_text and cv.cv_text_fingerprint == CV.fingerprint(cv.cv_text):
+        return cv.preprocessed_cv_text
+    return cv.cv_text
+
+
+def vector_key(cv: CV, text: str) -> str:
+    # a new CV text gets a new vector, the old one is never looked up again
+    return f"{cv.pk}:{CV.fingerprint(text)[:16]}"
+
+
+def index_cvs(cvs: Sequence[CV]) -> List[str]:
+    """Index keys of the CVs' vectors, embedding only those not in the CV index yet, see agent/vector_index.py."""
+    from agent.embeddings import get_embedder
+    from agent.vector_index import get_cv_index
+
+    index = get_cv_index()
+    index.refresh()
+    texts = [ranking_text(cv) for cv in cvs]
+    keys = [vector_key(cv, text) for cv, text in zip(cvs, texts)]
+    missing = [i for i, key in enumerate(keys) if key not in index]
+    if missing:
+        index.add([keys[i] for i in missing], get_embedder().embed([texts[i] for i in missing]))
+    return keys
+
+
+def rank_cvs(job_description: JobDescription, cvs: Sequence[CV]) -> List[CVRank]:
+    """
+    Score every CV against the job description without an LLM call, best first.
+
+    The score is the cosine similarity of the local embeddings of the CV and the job description,
+    blended with the share of required hard skills found by the rule based skill matcher when
+    the job description's skills were already extracted (AGENT_RANKING_SKILL_WEIGHT).
+    """
+    from agent.embeddings import get_embedder
+    from agent.skill_matcher import get_skill_matcher, parse_required_skills
+    from agent.vector_index import get_cv_index
+
+    if not cvs:
+        return []
+    keys = index_cvs(cvs)
+    similarities = get_cv_index().scores(get_embedder().embed([job_description.text])[0], ids=keys)
+    # negative cosine only means unrelated
+    similarities = np.clip(similarities, 0, 1)
+
+    required = None
+    # there is no single CV to route the skill identifiers by, skills extracted by any routed model will do
+    if job_description.has_extraction():
+        required = parse_required_skills(job_description.identified_hard_skills)
+    if not required:
+        ranks = [
+            CVRank(cv=cv, score=float(similarity), similarity=float(similarity))
+            for cv, similarity in zip(cvs, similarities)
+        ]
+    else:
+        matcher = get_skill_matcher()
+        weight = settings.AGENT_RANKING_SKILL_WEIGHT
+        ranks = []
+        for cv, similarity in zip(cvs, similarities):
+            # matching is local, the full CV text is fine
+            match = matcher.match(required, cv.cv_text)
+            coverage = len(match.found) / len(required)
+            ranks.append(
+                CVRank(
+                    cv=cv,
+                    score=float(weight * coverage + (1 - weight) * similarity),
+                    similarity=float(similarity),
+                    skill_coverage=coverage,
+                    found_hard_skills=match.found,
+                    missing_hard_skills=match.to_judge,
+                )
+            )
+    ranks.sort(key=lambda rank: (-rank.score, rank.cv.pk))
+    for position, rank in enumerate(ranks, start=1):
+        rank.rank = position
+    return ranks
+
+
+def start_top_scans(job_description: JobDescription, ranks: List[CVRank], top_k: int, title: str) -> List[CVScan]:
+    """Full LLM scans for the `top_k` best ranked CVs, set on their ranks."""
+    from .tasks import start_cv_scans
+
+    scans = []
+    for rank in ranks[:top_k]:
+        rank.scan = CVScan.objects.create(
+            cv=rank.cv,
+            title=title,
+            job_description=job_description.text,
+            job_description_ref=job_description,
+            scan_status=CVScan.ScanStatus.PENDING,
+        )
+        scans.append(rank.scan)
+    # the CVs are anonymized in one batch before their scans run
+    start_cv_scans([(scan.cv_id, scan.pk) for scan in scans])
+    return scans
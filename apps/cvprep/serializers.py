@@ -1,6 +1,7 @@
 # myapp/serializers.py
 import json
 
+from django.conf import settings
 from rest_framework import serializers
 
 from apps.api_auth.apis.common.serializers import UserSerializer
@@ -50,6 +51,16 @@ class CVSerializer(serializers.ModelSerializer):
         return None
 
 
+def load_json_output(value: str) -> dict:
+    """A stored LLM output, one that never matched its schema is returned as `raw_output` instead of failing."""
+    if not value:
+        return {}
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return {"raw_output": value}
+
+
 class CVScanSerializer(serializers.ModelSerializer):
     cv = CVSerializer(read_only=True)
     identified_hard_skills = serializers.SerializerMethodField()
@@ -69,29 +80,19 @@ class CVScanSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
     def get_identified_hard_skills(self, obj):
-        if obj.identified_hard_skills:
-            return json.loads(obj.identified_hard_skills)
-        return {}
+        return load_json_output(obj.identified_hard_skills)
 
     def get_identified_soft_skills(self, obj):
-        if obj.identified_soft_skills:
-            return json.loads(obj.identified_soft_skills)
-        return {}
+        return load_json_output(obj.identified_soft_skills)
 
     def get_hard_skill_analyser_output(self, obj):
-        if obj.hard_skill_analyser_output:
-            return json.loads(obj.hard_skill_analyser_output)
-        return {}
+        return load_json_output(obj.hard_skill_analyser_output)
 
     def get_soft_skill_analyser_output(self, obj):
-        if obj.soft_skill_analyser_output:
-            return json.loads(obj.soft_skill_analyser_output)
-        return {}
+        return load_json_output(obj.soft_skill_analyser_output)
 
     def get_summary_generator_output(self, obj):
-        if obj.summary_generator_output:
-            return json.loads(obj.summary_generator_output)
-        return {}
+        return load_json_output(obj.summary_generator_output)
 
 
 class CVScanCreateSerializer(serializers.ModelSerializer):
@@ -111,3 +112,24 @@ class CVScanCreateSerializer(serializers.ModelSerializer):
             validated_data["title"] = title
 
         return super().create(validated_data)
+
+
+class CVRankingRequestSerializer(serializers.Serializer):
+    job_description = serializers.CharField()
+    # all of the user's CVs when not given
+    cvs = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    # full LLM scans for the best ranked CVs, enqueued on every request that asks for them
+    top_k_scans = serializers.IntegerField(min_value=0, max_value=settings.AGENT_RANKING_MAX_SCANS, default=0)
+    scan_title = serializers.CharField(max_length=255, default="Ranked Scan")
+
+
+class CVRankSerializer(serializers.Serializer):
+    rank = serializers.IntegerField()
+    cv = serializers.IntegerField(source="cv.id")
+    title = serializers.CharField(source="cv.title")
+    score = serializers.FloatField()
+    similarity = serializers.FloatField()
+    skill_coverage = serializers.FloatField(allow_null=True)
+    found_hard_skills = serializers.ListField(child=serializers.CharField())
+    missing_hard_skills = serializers.ListField(child=serializers.CharField())
+    scan = serializers.IntegerField(source="scan.id", allow_null=True, default=None)
@@ -1,20 +1,195 @@
 # cv/tasks.py
-from typing import cast
+from datetime import timedelta
+from typing import List, Tuple, cast
 
-from celery import shared_task
+import structlog
+from celery import chain, group, shared_task
+from django.conf import settings
+from django.utils import timezone
 
-from .models import CV, CVScan
+from .models import CV, CVScan, JobDescription
+from .ranking import index_cvs
+
+logger = structlog.get_logger(__name__)
+
+
+def set_scan_status(cv_scan: CVScan, scan_status: CVScan.ScanStatus):
+    """Save the scan (with any other changed fields) in its new status and tell progress stream listeners."""
+    from agent.progress import publish_event
+
+    cv_scan.scan_status = scan_status
+    cv_scan.save()
+    publish_event(cv_scan.id, "status", status=cv_scan.get_scan_status_display())
+
+
+@shared_task(bind=True, max_retries=3)
+def precompute_cv_artifacts_task(self, cv_id):
+    """Anonymize and preprocess a freshly uploaded CV and store the result on it for later scans."""
+    from agent.anonymizer import engine_registry
+    from agent.rate_limit import RateLimitExceeded
+    from agent.steam_line_workflow import (
+        State,
+        cv_artifacts_workflow,
+        preprocess_model_id,
+    )
+    from agent.telemetry import record_task_queue_wait
+
+    record_task_queue_wait(self.name, self.request.get("enqueued_at"), self.request.eta)
+    try:
+        cv = CV.objects.get(pk=cv_id)
+        anonymizer_profile = engine_registry.profile.name
+        artifacts = cv.get_artifacts(preprocess_model_id(cv.anonymized_cv_text), anonymizer_profile)
+        if not cv.cv_text or "preprocessed_cv_text" in artifacts:
+            return {"cv_id": cv_id, "status": "skipped"}
+
+        workflow_input = State(raw_cv_text=cv.cv_text)
+        workflow_input.update(artifacts)  # type: ignore [typeddict-item]
+        result = cast(State, cv_artifacts_workflow.invoke(workflow_input))  # type: ignore [arg-type]
+        cv.save_artifacts(
+            result["anonymized_cv_text"],
+            result["preprocessed_cv_text"],
+            preprocess_model_id(result["anonymized_cv_text"]),
+            anonymizer_profile,
+        )
+        # ranking requests find the CV's vector ready, see apps/cvprep/ranking.py
+        index_cvs([cv])
+        return {"cv_id": cv_id, "status": "done"}
+
+    except RateLimitExceeded as e:
+        if self.request.retries >= self.max_retries:
+            # a failed task would stop the chain in start_cv_processing, the scan must still run
+            logger.warning("gave up precomputing cv artifacts", cv_id=cv_id, exc_info=True)
+            return {"cv_id": cv_id, "status": "failed"}
+        raise self.retry(exc=e, countdown=e.retry_after)
+
+    except Exception:
+        # scans compute the artifacts themselves when they are missing, never block them
+        logger.exception("could not precompute cv artifacts", cv_id=cv_id)
+        return {"cv_id": cv_id, "status": "failed"}
 
 
 @shared_task(bind=True)
-def analyze_cv_task(self, cv_id, scan_id):
-    from agent.steam_line_workflow import State, steam_line_workflow
+def anonymize_cvs_task(self, cv_ids):
+    """
+    Anonymize many CVs in one batch and store the result on them, the scans of these CVs skip their anonymizer node.
 
+    spacy runs on batches of CVs (see `anonymize_texts`) instead of once per scan.
+    """
+    from agent.anonymizer import anonymize_texts, engine_registry
+    from agent.telemetry import record_task_queue_wait
+
+    record_task_queue_wait(self.name, self.request.get("enqueued_at"), self.request.eta)
+    try:
+        anonymizer_profile = engine_registry.profile.name
+        cvs = [
+            cv
+            for cv in CV.objects.filter(pk__in=cv_ids).order_by("pk")
+            # already anonymized, the preprocessed text does not matter here
+            if cv.cv_text and "anonymized_cv_text" not in cv.get_artifacts("", anonymizer_profile)
+        ]
+        for cv, anonymized_cv_text in zip(cvs, anonymize_texts([cv.cv_text for cv in cvs])):
+            cv.save_artifacts(anonymized_cv_text, "", "", anonymizer_profile)
+        return {"cv_ids": cv_ids, "anonymized": len(cvs), "status": "done"}
+
+    except Exception:
+        # the scans anonymize their CV themselves, never block them
+        logger.exception("could not anonymize cvs", cv_ids=cv_ids)
+        return {"cv_ids": cv_ids, "status": "failed"}
+
+
+def start_cv_processing(cv_id, scan_id=None):
+    """
+    Kick off background work for a newly uploaded CV.
+
+    The CV artifacts are computed first, so a scan started together with the upload reuses them
+    instead of racing the precompute task for the same anonymizer and preprocess calls.
+    The precompute task never fails (the scan computes missing artifacts itself), so the chain always
+    reaches the scan.
+    """
+    if scan_id is None:
+        precompute_cv_artifacts_task.delay(cv_id)
+    else:
+        chain(precompute_cv_artifacts_task.si(cv_id), analyze_cv_task.si(cv_id, scan_id)).delay()
+
+
+def start_cv_scans(scans: List[Tuple[int, int]]):
+    """
+    Kick off many scans at once (eg: the top ranked CVs), as `(cv_id, scan_id)` pairs.
+
+    Their CVs are anonymized together first, see `anonymize_cvs_task`, which never fails either.
+    """
+    if not scans:
+        return
+    cv_ids = list(dict.fromkeys(cv_id for cv_id, _ in scans))
+    chain(
+        anonymize_cvs_task.si(cv_ids),
+        group(analyze_cv_task.si(cv_id, scan_id) for cv_id, scan_id in scans),
+    ).delay()
+
+
+def retry_scan(task, scan_id, exc: Exception, countdown: float):
+    """Retry the scan task, once its retries are exhausted the scan is FAILED so its listeners stop waiting."""
+    from agent.progress import publish_event
+
+    if task.request.retries >= task.max_retries:
+        cv_scan = CVScan.objects.filter(pk=scan_id).first()
+        if cv_scan is not None:
+            set_scan_status(cv_scan, CVScan.ScanStatus.FAILED)
+        raise exc
+    publish_event(scan_id, "retry", countdown=countdown)
+    return task.retry(exc=exc, countdown=countdown)
+
+
+@shared_task
+def fail_abandoned_scans_task():
+    """
+    Meant to be scheduled with celery beat (see CELERY_BEAT_SCHEDULE). Scans nobody worked on for
+    AGENT_SCAN_ABANDONED_AFTER seconds lost their task, eg: a worker died before acknowledging it.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.AGENT_SCAN_ABANDONED_AFTER)
+    unfinished = [CVScan.ScanStatus.PENDING, CVScan.ScanStatus.STARTED, CVScan.ScanStatus.PROCESSING]
+    abandoned = CVScan.objects.filter(scan_status__in=unfinished, modified__lt=cutoff)
+    failed = 0
+    for cv_scan in abandoned:
+        # publishes the status, listeners of the scan's progress stream stop waiting
+        set_scan_status(cv_scan, CVScan.ScanStatus.FAILED)
+        failed += 1
+    return {"failed": failed}
+
+
+@shared_task
+def delete_stale_checkpoints_task():
+    """Run hourly by celery beat (see CELERY_BEAT_SCHEDULE), finished scans clean up their checkpoints themselves."""
+    from .checkpointer import delete_stale_checkpoints
+
+    deleted = delete_stale_checkpoints(max_age=settings.AGENT_CHECKPOINT_MAX_AGE)
+    return {"deleted": deleted}
+
+
+# acks_late: a scan lost with its worker is delivered again and resumes from its checkpoints
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=3)
+def analyze_cv_task(self, cv_id, scan_id, refresh_llm_cache=False):
+    from agent.anonymizer import engine_registry
+    from agent.llm_cache import LLMCacheMode, llm_cache_mode
+    from agent.progress import scan_progress
+    from agent.rate_limit import RateLimitExceeded
+    from agent.runner import get_workflow_runner
+    from agent.steam_line_workflow import (
+        State,
+        get_workflow_config,
+        preprocess_model_id,
+        skill_extraction_model_id,
+        steam_line_workflow,
+    )
+    from agent.telemetry import record_task_queue_wait, scan_span
+
+    from .checkpointer import get_checkpointed_workflow, scan_thread_id
+
+    record_task_queue_wait(self.name, self.request.get("enqueued_at"), self.request.eta)
     try:
         cv = CV.objects.get(pk=cv_id)
         cv_scan = CVScan.objects.get(pk=scan_id)
-        cv_scan.scan_status = CVScan.ScanStatus.STARTED
-        cv_scan.save()
+        set_scan_status(cv_scan, CVScan.ScanStatus.STARTED)
 
         # raw_cv_text = """
         # Python developer with Django experience.
@@ -28,12 +203,58 @@ def analyze_cv_task(self, cv_id, scan_id):
         #     {"raw_cv_text": raw_cv_text, "job_description": job_description}
         # )
 
-        result: State = cast(
-            State,
-            steam_line_workflow.invoke(
-                {"raw_cv_text": cv.cv_text, "job_description": cv_scan.job_description}  # type: ignore [arg-type]
-            ),
+        if cv_scan.job_description_ref is None:
+            cv_scan.job_description_ref = JobDescription.for_text(cv_scan.job_description)
+            cv_scan.save(update_fields=["job_description_ref"])
+        job_description = cv_scan.job_description_ref
+
+        anonymizer_profile = engine_registry.profile.name
+        # nodes can be routed to another model by CV size, artifacts are only reused from that model
+        artifacts = cv.get_artifacts(preprocess_model_id(cv.anonymized_cv_text), anonymizer_profile)
+        # the raw text stands in for an anonymized text not computed yet, both have about the same size
+        extraction_model = skill_extraction_model_id(
+            State(anonymized_cv_text=artifacts.get("anonymized_cv_text") or cv.cv_text)
         )
+        reuse_skills = not refresh_llm_cache and job_description.has_extraction(extraction_model)
+        if refresh_llm_cache:
+            # anonymization does not use the LLM, only the preprocessed text is redone
+            artifacts.pop("preprocessed_cv_text", None)
+
+        workflow_input = State(raw_cv_text=cv.cv_text, job_description=cv_scan.job_description)
+        # anonymizer and preprocess nodes are skipped when these are already in the input
+        workflow_input.update(artifacts)  # type: ignore [typeddict-item]
+        if reuse_skills:
+            # skill identifier nodes are skipped when these are already in the input
+            workflow_input["identified_hard_skills"] = job_description.identified_hard_skills
+            workflow_input["identified_soft_skills"] = job_description.identified_soft_skills
+        set_scan_status(cv_scan, CVScan.ScanStatus.PROCESSING)
+
+        workflow = steam_line_workflow
+        config = get_workflow_config()
+        run_input: State | None = workflow_input
+        if settings.AGENT_CHECKPOINTS_ENABLED:
+            # state is saved after every node, a retry continues where the previous attempt failed
+            workflow = get_checkpointed_workflow()
+            config = get_workflow_config(thread_id=scan_thread_id(cv_scan.id))
+            if refresh_llm_cache:
+                workflow.checkpointer.delete_thread(scan_thread_id(cv_scan.id))  # type: ignore [union-attr]
+            elif workflow.get_state(config).next:
+                # None as input resumes the unfinished run instead of starting a new one
+                run_input = None
+
+        # refresh skips cached LLM responses but stores the new ones
+        cache_mode = LLMCacheMode.REFRESH if refresh_llm_cache else LLMCacheMode.USE
+        # workflow nodes publish their progress to the scan channel, see agent/progress.py
+        with (
+            llm_cache_mode(cache_mode),
+            scan_progress(cv_scan.id),
+            scan_span(cv_scan.id, attempt=self.request.retries, resumed=run_input is None),
+        ):
+            if settings.AGENT_ASYNC_MODE:
+                # many scans share one event loop in this worker process
+                result = get_workflow_runner().run(run_input, workflow=workflow, config=config)
+            else:
+                result = cast(State, workflow.invoke(run_input, config=config))
 
         cv_scan.scan_result = result["summary_generator_output"]
         cv_scan.anonymized_cv_text = result["anonymized_cv_text"]
@@ -43,11 +264,32 @@ def analyze_cv_task(self, cv_id, scan_id):
         cv_scan.hard_skill_analyser_output = result["hard_skill_analyser_output"]
         cv_scan.soft_skill_analyser_output = result["soft_skill_analyser_output"]
         cv_scan.summary_generator_output = result["summary_generator_output"]
-        cv_scan.scan_status = CVScan.ScanStatus.FINISHED
-        cv_scan.save()
+        cv_scan.prompt_budget = result.get("prompt_budget", {})
+        set_scan_status(cv_scan, CVScan.ScanStatus.FINISHED)
+
+        if settings.AGENT_CHECKPOINTS_ENABLED:
+            workflow.checkpointer.delete_thread(scan_thread_id(cv_scan.id))  # type: ignore [union-attr]
+
+        if "preprocessed_cv_text" not in artifacts:
+            cv.save_artifacts(
+                result["anonymized_cv_text"],
+                result["preprocessed_cv_text"],
+                preprocess_model_id(result["anonymized_cv_text"]),
+                anonymizer_profile,
+            )
+
+        if not reuse_skills:
+            job_description.identified_hard_skills = result["identified_hard_skills"]
+            job_description.identified_soft_skills = result["identified_soft_skills"]
+            job_description.extraction_model = skill_extraction_model_id(result)
+            job_description.save()
 
         return {"cv_id": cv_id, "status": "done"}
 
+    except RateLimitExceeded as e:
+        # Free the worker slot and come back when the shared LLM budget allows it
+        raise retry_scan(self, scan_id, e, e.retry_after)
+
     except Exception as e:
         # Optional retry logic
-        raise self.retry(exc=e, countdown=5, max_retries=3)
+        raise retry_scan(self, scan_id, e, 5)
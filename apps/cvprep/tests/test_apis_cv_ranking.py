@@ -0,0 +1,121 @@
+import logging
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from agent import vector_index
+from agent.steam_line_workflow import MODEL_ID
+from apps.cvprep.models import CV, CVOwner, CVScan, JobDescription
+from apps.users.models import User
+
+JOB_DESCRIPTION = "Backend developer: Python, Django, PostgreSQL and Docker"
+CV_TEXTS = {
+    "backend": "Backend developer building Python and Django services on PostgreSQL, shipped with Docker",
+    "data": "Data analyst, Python notebooks and dashboards",
+    "frontend": "Frontend developer, React, TypeScript and CSS",
+}
+
+
+@override_settings(AGENT_RANKING_SKILL_WEIGHT=0.5)
+class CVRankingTestCase(TestCase):
+    def setUp(self):
+        # uploaded CV files go to a directory of their own instead of MEDIA_ROOT
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        logging.disable(logging.CRITICAL)
+        # every test starts with an empty CV index of its own
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        index_dir = override_settings(AGENT_VECTOR_INDEX_DIR=tmp.name)
+        index_dir.enable()
+        self.addCleanup(index_dir.disable)
+        mock.patch.object(vector_index, "cvIndexInstance", None).start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.user = User.objects.create_user(username="owner", password="password")
+        owner = CVOwner.objects.create(user=self.user)
+        self.cvs = {
+            title: CV.objects.create(title=title, file=SimpleUploadedFile("cv.pdf", b"pdf"), cv_text=text, owner=owner)
+            for title, text in CV_TEXTS.items()
+        }
+        # not ranked: without text, and CVs of other users
+        CV.objects.create(title="empty", file=SimpleUploadedFile("cv.pdf", b"pdf"), owner=owner)
+        other = CVOwner.objects.create(user=User.objects.create_user(username="other", password="password"))
+        CV.objects.create(
+            title="other", file=SimpleUploadedFile("cv.pdf", b"pdf"), cv_text=JOB_DESCRIPTION, owner=other
+        )
+
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+
+    def rank(self, query="", **data):
+        return self.api_client.post(
+            reverse("scan_ranking") + query, {"job_description": JOB_DESCRIPTION, **data}, format="json"
+        )
+
+    def test_cvs_are_ranked_best_first(self):
+        response = self.rank()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        results = response.data["results"]
+        self.assertEqual([result["title"] for result in results][0], "backend")
+        self.assertEqual([result["rank"] for result in results], [1, 2, 3])
+        self.assertEqual(results, sorted(results, key=lambda result: -result["score"]))
+        # skills of the job description were never extracted
+        self.assertIsNone(results[0]["skill_coverage"])
+        self.assertEqual(results[0]["score"], results[0]["similarity"])
+        self.assertIsNone(results[0]["scan"])
+
+    def test_extracted_skills_are_part_of_the_score(self):
+        job_description = JobDescription.for_text(JOB_DESCRIPTION)
+        job_description.identified_hard_skills = '{"found_hard_skills": ["Python", "Django", "Postgres", "Docker"]}'
+        job_description.identified_soft_skills = '{"found_soft_skills": []}'
+        job_description.extraction_model = MODEL_ID
+        job_description.save()
+
+        results = {result["title"]: result for result in self.rank().data["results"]}
+
+        self.assertEqual(results["backend"]["skill_coverage"], 1.0)
+        self.assertEqual(results["data"]["found_hard_skills"], ["Python"])
+        self.assertEqual(results["data"]["missing_hard_skills"], ["Django", "Postgres", "Docker"])
+        self.assertAlmostEqual(results["data"]["score"], 0.5 * 0.25 + 0.5 * results["data"]["similarity"])
+
+    def test_selected_cvs_are_paginated(self):
+        response = self.rank(query="?page_size=1&page=2", cvs=[self.cvs["backend"].id, self.cvs["frontend"].id])
+
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual([result["title"] for result in response.data["results"]], ["frontend"])
+
+    def test_cvs_of_other_users_are_rejected(self):
+        other = CV.objects.get(title="other")
+        response = self.rank(cvs=[self.cvs["backend"].id, other.id])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cv_vectors_are_embedded_once(self):
+        self.rank()
+        with mock.patch("agent.embeddings.HashingEmbedder.embed", wraps=vector_index.get_embedder().embed) as embed:
+            self.rank()
+        # only the job description
+        self.assertEqual(embed.call_args_list, [mock.call([JOB_DESCRIPTION])])
+
+    def test_scans_are_started_for_the_top_cvs(self):
+        with mock.patch("apps.cvprep.tasks.start_cv_scans") as start_cv_scans:
+            response = self.rank(top_k_scans=2, scan_title="Backend shortlist")
+
+        scans = CVScan.objects.order_by("id")
+        self.assertEqual(
+            [scan.cv.title for scan in scans], [result["title"] for result in response.data["results"][:2]]
+        )
+        self.assertEqual({scan.title for scan in scans}, {"Backend shortlist"})
+        self.assertEqual(response.data["results"][0]["scan"], scans[0].id)
+        self.assertIsNone(response.data["results"][2]["scan"])
+        start_cv_scans.assert_called_once_with([(scan.cv.id, scan.id) for scan in scans])
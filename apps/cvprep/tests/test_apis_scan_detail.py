@@ -0,0 +1,62 @@
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.cvprep.models import CV, CVOwner, CVScan
+from apps.users.models import User
+
+
+class ScanDetailTestCase(TestCase):
+    def setUp(self):
+        # uploaded CV files go to a directory of their own instead of MEDIA_ROOT
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def test_output_that_is_not_json_does_not_break_the_scan(self):
+        user = User.objects.create_user(username="owner", password="password")
+        cv = CV.objects.create(
+            title="cv", file=SimpleUploadedFile("cv.pdf", b"pdf"), owner=CVOwner.objects.create(user=user)
+        )
+        cv_scan = CVScan.objects.create(
+            cv=cv,
+            identified_hard_skills='{"found_hard_skills": ["Python"]}',
+            summary_generator_output="The candidate is a strong fit",
+        )
+        api_client = APIClient()
+        api_client.force_authenticate(user=user)
+
+        response = api_client.get(reverse("scan_results", args=[cv_scan.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["identified_hard_skills"], {"found_hard_skills": ["Python"]})
+        self.assertEqual(response.data["summary_generator_output"], {"raw_output": "The candidate is a strong fit"})
+        self.assertEqual(response.data["hard_skill_analyser_output"], {})
+
+    def test_traces_are_only_shown_to_admins(self):
+        user = User.objects.create_user(username="owner", password="password")
+        cv = CV.objects.create(
+            title="cv", file=SimpleUploadedFile("cv.pdf", b"pdf"), owner=CVOwner.objects.create(user=user)
+        )
+        cv_scan = CVScan.objects.create(cv=cv)
+        traces = [{"scan_id": cv_scan.id, "agent": "summary_generator_agent", "prompt": "p", "response": "r"}]
+        api_client = APIClient()
+
+        with mock.patch("agent.trace_capture.get_scan_traces", return_value=traces) as get_scan_traces:
+            api_client.force_authenticate(user=user)
+            self.assertEqual(
+                api_client.get(reverse("scan_traces", args=[cv_scan.id])).status_code, status.HTTP_403_FORBIDDEN
+            )
+            api_client.force_authenticate(user=User.objects.create_user(username="admin", is_staff=True))
+            response = api_client.get(reverse("scan_traces", args=[cv_scan.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"scan": cv_scan.id, "traces": traces})
+        get_scan_traces.assert_called_once_with(cv_scan.id)
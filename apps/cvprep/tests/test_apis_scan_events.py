@@ -0,0 +1,103 @@
+import logging
+import tempfile
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.cvprep.models import CV, CVOwner, CVScan
+from apps.users.models import User
+
+
+class FakeSubscription:
+    def __init__(self, events):
+        self.events = list(events)
+        self.closed = False
+
+    async def aget(self, timeout):
+        return self.events.pop(0) if self.events else None
+
+    async def aclose(self):
+        self.closed = True
+
+
+async def read_stream(response) -> bytes:
+    return b"".join([chunk async for chunk in response.streaming_content])
+
+
+class ScanEventsTestCase(TestCase):
+    def setUp(self):
+        # uploaded CV files go to a directory of their own instead of MEDIA_ROOT
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        logging.disable(logging.CRITICAL)
+        self.user = User.objects.create_user(username="owner", password="password")
+        owner = CVOwner.objects.create(user=self.user)
+        cv = CV.objects.create(title="cv", file=SimpleUploadedFile("cv.pdf", b"pdf"), owner=owner)
+        self.cv_scan = CVScan.objects.create(cv=cv, job_description="Python Developer")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+
+    def stream(self, events, query=""):
+        subscription = FakeSubscription(events)
+        broker = mock.Mock()
+        broker.asubscribe = mock.AsyncMock(return_value=subscription)
+        with mock.patch("agent.progress.get_progress_broker", return_value=broker):
+            response = self.api_client.get(
+                reverse("scan_events", args=[self.cv_scan.id]) + query, HTTP_ACCEPT="text/event-stream"
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            # an async generator, served by the ASGI app without holding a thread
+            self.assertTrue(response.is_async)  # type: ignore [attr-defined]
+            body = async_to_sync(read_stream)(response).decode()
+        self.assertTrue(subscription.closed)
+        return body
+
+    def test_finished_scan_sends_status_and_closes(self):
+        self.cv_scan.scan_status = CVScan.ScanStatus.FINISHED
+        self.cv_scan.save()
+        body = self.stream([{"event": "node", "node": "never sent"}])
+        self.assertEqual(body, 'event: status\ndata: {"event": "status", "status": "FINISHED"}\n\n')
+
+    def test_events_are_forwarded_until_finished(self):
+        events = [
+            {"event": "node", "node": "preprocess_agent", "skipped": False},
+            None,
+            {"event": "token", "text": "{"},
+            {"event": "status", "status": "FINISHED"},
+            {"event": "node", "node": "after finished"},
+        ]
+        body = self.stream(events)
+        self.assertIn('event: status\ndata: {"event": "status", "status": "PENDING"}\n\n', body)
+        self.assertIn('"node": "preprocess_agent"', body)
+        self.assertIn(": keep-alive\n\n", body)
+        self.assertNotIn("event: token", body)
+        self.assertNotIn("after finished", body)
+
+    def test_failed_scan_ends_the_stream(self):
+        body = self.stream([{"event": "status", "status": "FAILED"}, {"event": "node", "node": "after failed"}])
+        self.assertIn('event: status\ndata: {"event": "status", "status": "FAILED"}\n\n', body)
+        self.assertNotIn("after failed", body)
+
+        self.cv_scan.scan_status = CVScan.ScanStatus.FAILED
+        self.cv_scan.save()
+        body = self.stream([{"event": "node", "node": "never sent"}])
+        self.assertEqual(body, 'event: status\ndata: {"event": "status", "status": "FAILED"}\n\n')
+
+    def test_tokens_are_forwarded_on_request(self):
+        body = self.stream([{"event": "token", "text": "{"}, {"event": "status", "status": "FINISHED"}], "?tokens=1")
+        self.assertIn('event: token\ndata: {"event": "token", "text": "{"}\n\n', body)
+
+    def test_other_users_cannot_listen(self):
+        other = User.objects.create_user(username="other", password="password")
+        self.api_client.force_authenticate(user=other)
+        response = self.api_client.get(reverse("scan_events", args=[self.cv_scan.id]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,23 @@
+import logging
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+
+class BenchmarkAnonymizerCommandTest(SimpleTestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+    def test_reports_latency_and_recall_per_profile(self):
+        out = StringIO()
+        call_command("benchmark_anonymizer", "--profiles", "fast", "--repeat=2", stdout=out)
+
+        output = out.getvalue()
+        self.assertRegex(
+            output, r"profile\s+load \(s\)\s+p50 \(ms\)\s+p95 \(ms\)\s+batch \(ms\)\s+recall\s+EMAIL_ADDRESS"
+        )
+        # contact details are found by the regex recognizers, names need spacy
+        self.assertRegex(output, r"fast(\s+[\d.]+){4}\s+\d+%\s+100%\s+\d+%\s+0%\s+100%\s+100%")
+        self.assertIn("Benchmark finished, 6 samples", output)
@@ -0,0 +1,52 @@
+import logging
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+
+from agent import progress
+from agent import steam_line_workflow as workflow
+from agent.fake_llm import FakeChatModel
+from apps.cvprep.models import CV, CVScan
+
+
+@override_settings(AGENT_CHECKPOINTS_ENABLED=False, AGENT_LLM_CACHE_ENABLED=False, AGENT_LLM_NAME="FakeChatModel")
+class BenchmarkPipelineCommandTest(TransactionTestCase):
+    def setUp(self):
+        # uploaded CV files go to a directory of their own instead of MEDIA_ROOT
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        logging.disable(logging.CRITICAL)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        patchers: list = [
+            mock.patch.object(workflow, "llmInstance", FakeChatModel(prompts=workflow.PROMPTS)),
+            mock.patch.object(workflow, "MODEL_ID", f"fake/{workflow.MODEL_NAME}"),
+            mock.patch.object(workflow, "anonymize_text", side_effect=lambda text: text),
+            mock.patch.object(workflow, "capture_trace"),
+            mock.patch.object(progress, "progressBrokerInstance", progress.InMemoryBroker()),
+        ]
+        for patcher in patchers:
+            patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_reports_throughput_and_node_latency(self):
+        out = StringIO()
+        call_command("benchmark_pipeline", "--scans=3", "--concurrency=1", stdout=out)
+
+        output = out.getvalue()
+        self.assertIn("3 scans finished, 0 failed, 0 retries", output)
+        self.assertIn("scans/min", output)
+        self.assertRegex(output, r"summary_generator_agent\s+3\s")
+        self.assertIn("peak worker RSS", output)
+        self.assertFalse(CV.objects.exists())
+
+    def test_keep_leaves_finished_scans(self):
+        call_command("benchmark_pipeline", "--scans=2", "--concurrency=1", "--keep", stdout=StringIO())
+
+        self.assertEqual(CVScan.objects.filter(scan_status=CVScan.ScanStatus.FINISHED).count(), 2)
+        self.assertEqual(CV.objects.get(title="Benchmark CV 0").preprocess_model, f"fake/{workflow.MODEL_NAME}")
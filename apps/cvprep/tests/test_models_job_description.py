@@ -0,0 +1,30 @@
+from django.test import TestCase
+
+from apps.cvprep.models import JobDescription
+
+
+class JobDescriptionModelTestCase(TestCase):
+    def test_for_text_deduplicates_on_normalized_text(self):
+        first = JobDescription.for_text("Python  Developer\nDjango")
+        second = JobDescription.for_text("  python developer django ")
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(JobDescription.objects.count(), 1)
+        self.assertEqual(first.text, "Python  Developer\nDjango")
+
+    def test_different_text_creates_new_job_description(self):
+        JobDescription.for_text("Python Developer")
+        JobDescription.for_text("React Developer")
+        self.assertEqual(JobDescription.objects.count(), 2)
+
+    def test_has_extraction_requires_both_skills_and_same_model(self):
+        job_description = JobDescription.for_text("Python Developer")
+        self.assertFalse(job_description.has_extraction("model"))
+        self.assertFalse(job_description.has_extraction())
+
+        job_description.identified_hard_skills = '{"found_hard_skills": ["Python"]}'
+        job_description.identified_soft_skills = '{"found_soft_skills": []}'
+        job_description.extraction_model = "model"
+        self.assertTrue(job_description.has_extraction("model"))
+        self.assertFalse(job_description.has_extraction("other-model"))
+        # by any model
+        self.assertTrue(job_description.has_extraction())
@@ -0,0 +1,254 @@
+import logging
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from agent import progress
+from agent.model_routing import ModelRoutingTable, parse_node_routes
+from agent.rate_limit import RateLimitExceeded
+from agent.steam_line_workflow import MODEL_ID
+from apps.cvprep.models import CV, CVOwner, CVScan, JobDescription
+from apps.cvprep.tasks import (
+    analyze_cv_task,
+    fail_abandoned_scans_task,
+    precompute_cv_artifacts_task,
+    start_cv_processing,
+    start_cv_scans,
+)
+from apps.users.models import User
+
+
+def workflow_result(workflow_input, config=None):
+    return {
+        **workflow_input,
+        "anonymized_cv_text": workflow_input.get("anonymized_cv_text", "anonymized"),
+        "preprocessed_cv_text": workflow_input.get("preprocessed_cv_text", "preprocessed"),
+        "identified_hard_skills": workflow_input.get("identified_hard_skills", '{"found_hard_skills": ["Python"]}'),
+        "identified_soft_skills": workflow_input.get("identified_soft_skills", '{"found_soft_skills": []}'),
+        "hard_skill_analyser_output": "{}",
+        "soft_skill_analyser_output": "{}",
+        "summary_generator_output": "{}",
+        "prompt_budget": {"preprocess_agent": {"budget": 100, "original_tokens": 150, "dropped_tokens": 50}},
+    }
+
+
+@override_settings(AGENT_CHECKPOINTS_ENABLED=False, AGENT_ANONYMIZER_PROFILE="full")
+class AnalyzeCVTaskTestCase(TestCase):
+    def setUp(self):
+        # uploaded CV files go to a directory of their own instead of MEDIA_ROOT
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        logging.disable(logging.CRITICAL)
+        user = User.objects.create_user(username="owner", password="password")
+        owner = CVOwner.objects.create(user=user)
+        self.cv = CV.objects.create(
+            title="cv", file=SimpleUploadedFile("cv.pdf", b"pdf"), cv_text="Python developer", owner=owner
+        )
+
+        patcher = mock.patch("agent.steam_line_workflow.steam_line_workflow.invoke", side_effect=workflow_result)
+        self.invoke = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def scan(self, job_description="Python Developer"):
+        cv_scan = CVScan.objects.create(cv=self.cv, job_description=job_description)
+        analyze_cv_task.apply(args=(self.cv.id, cv_scan.id))
+        cv_scan.refresh_from_db()
+        return cv_scan
+
+    def test_first_scan_stores_skills_on_job_description(self):
+        cv_scan = self.scan()
+        self.assertEqual(cv_scan.scan_status, CVScan.ScanStatus.FINISHED)
+        self.assertIsNotNone(cv_scan.job_description_ref)
+        job_description = JobDescription.objects.get()
+        self.assertEqual(job_description.identified_hard_skills, '{"found_hard_skills": ["Python"]}')
+        self.assertNotIn("identified_hard_skills", self.invoke.call_args.args[0])
+
+    def test_prompt_budget_report_is_stored(self):
+        cv_scan = self.scan()
+        self.assertEqual(cv_scan.prompt_budget["preprocess_agent"]["dropped_tokens"], 50)
+
+    def test_later_scans_reuse_extracted_skills(self):
+        self.scan()
+        cv_scan = self.scan(job_description="python   developer")
+        workflow_input = self.invoke.call_args.args[0]
+        self.assertEqual(workflow_input["identified_hard_skills"], '{"found_hard_skills": ["Python"]}')
+        self.assertEqual(workflow_input["identified_soft_skills"], '{"found_soft_skills": []}')
+        self.assertEqual(cv_scan.identified_hard_skills, '{"found_hard_skills": ["Python"]}')
+        self.assertEqual(JobDescription.objects.count(), 1)
+
+    def test_first_scan_stores_artifacts_on_cv(self):
+        self.scan()
+        self.cv.refresh_from_db()
+        self.assertEqual(self.cv.cv_text_fingerprint, CV.fingerprint("Python developer"))
+        self.assertEqual(self.cv.anonymized_cv_text, "anonymized")
+        self.assertEqual(self.cv.preprocessed_cv_text, "preprocessed")
+
+    def test_later_scans_reuse_cv_artifacts(self):
+        self.cv.save_artifacts("stored anonymized", "stored preprocessed", MODEL_ID, "full")
+        cv_scan = self.scan()
+        workflow_input = self.invoke.call_args.args[0]
+        self.assertEqual(workflow_input["anonymized_cv_text"], "stored anonymized")
+        self.assertEqual(workflow_input["preprocessed_cv_text"], "stored preprocessed")
+        self.assertEqual(cv_scan.preprocessed_cv_text, "stored preprocessed")
+
+    def test_changed_cv_text_invalidates_artifacts(self):
+        self.cv.save_artifacts("stored anonymized", "stored preprocessed", MODEL_ID, "full")
+        self.cv.cv_text = "React developer"
+        self.cv.save()
+        self.scan()
+        self.assertNotIn("anonymized_cv_text", self.invoke.call_args.args[0])
+        self.cv.refresh_from_db()
+        self.assertEqual(self.cv.cv_text_fingerprint, CV.fingerprint("React developer"))
+
+    def test_artifacts_of_another_anonymizer_profile_are_not_reused(self):
+        # the fast profile leaves names and locations in the text, the full profile must not be served them
+        self.cv.save_artifacts("stored anonymized", "stored preprocessed", MODEL_ID, "fast")
+        self.scan()
+        workflow_input = self.invoke.call_args.args[0]
+        self.assertNotIn("anonymized_cv_text", workflow_input)
+        self.assertNotIn("preprocessed_cv_text", workflow_input)
+        self.cv.refresh_from_db()
+        self.assertEqual(self.cv.anonymized_cv_text, "anonymized")
+        self.assertEqual(self.cv.anonymizer_profile, "full")
+
+    def test_artifacts_and_skills_are_keyed_on_the_routed_model(self):
+        routes = {
+            "preprocess_agent": "ChatGoogleGenerativeAI:gemini-2.5-flash-lite",
+            "hard_skill_identifier_agent": "ChatGoogleGenerativeAI:gemini-2.5-flash-lite",
+        }
+        self.cv.save_artifacts("stored anonymized", "stored preprocessed", MODEL_ID, "full")
+        with (
+            mock.patch("agent.model_routing.routingTableInstance", ModelRoutingTable(parse_node_routes(routes))),
+            mock.patch("agent.steam_line_workflow.PIPELINE_MODE", "split"),
+        ):
+            self.scan()
+            workflow_input = self.invoke.call_args.args[0]
+            # preprocessed by the workflow's own model, not by the one the node is routed to
+            self.assertEqual(workflow_input["anonymized_cv_text"], "stored anonymized")
+            self.assertNotIn("preprocessed_cv_text", workflow_input)
+            self.cv.refresh_from_db()
+            self.assertEqual(self.cv.preprocess_model, "gemini-2.5-flash-lite")
+            self.assertEqual(JobDescription.objects.get().extraction_model, f"gemini-2.5-flash-lite,{MODEL_ID}")
+
+            self.scan()
+            workflow_input = self.invoke.call_args.args[0]
+            self.assertEqual(workflow_input["preprocessed_cv_text"], "preprocessed")
+            self.assertIn("identified_hard_skills", workflow_input)
+
+        # skills extracted by the routed models are not reused once the routing changes
+        self.scan()
+        self.assertNotIn("identified_hard_skills", self.invoke.call_args.args[0])
+
+    def test_precompute_task_stores_artifacts(self):
+        with (
+            mock.patch("agent.steam_line_workflow.cv_artifacts_workflow.invoke", side_effect=workflow_result) as invoke,
+            mock.patch("apps.cvprep.tasks.index_cvs") as index_cvs,
+        ):
+            precompute_cv_artifacts_task.apply(args=(self.cv.id,))
+            precompute_cv_artifacts_task.apply(args=(self.cv.id,))
+        self.assertEqual(invoke.call_count, 1)
+        self.cv.refresh_from_db()
+        self.assertEqual(self.cv.preprocessed_cv_text, "preprocessed")
+        self.assertEqual(self.cv.preprocess_model, MODEL_ID)
+        # the vector for ranking is ready too
+        index_cvs.assert_called_once_with([self.cv])
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_batch_of_scans_anonymizes_the_cvs_at_once(self):
+        other = CV.objects.create(
+            title="other", file=SimpleUploadedFile("cv.pdf", b"pdf"), cv_text="React developer", owner=self.cv.owner
+        )
+        scans = [CVScan.objects.create(cv=cv, job_description="Python Developer") for cv in [self.cv, other]]
+        with mock.patch(
+            "agent.anonymizer.anonymize_texts", side_effect=lambda texts: [f"anonymized {text}" for text in texts]
+        ) as anonymize_texts:
+            start_cv_scans([(scan.cv.id, scan.id) for scan in scans])
+
+        anonymize_texts.assert_called_once_with(["Python developer", "React developer"])
+        # the scans skip their anonymizer node
+        self.assertEqual(
+            sorted(call.args[0]["anonymized_cv_text"] for call in self.invoke.call_args_list),
+            ["anonymized Python developer", "anonymized React developer"],
+        )
+        statuses = {scan.scan_status for scan in CVScan.objects.all()}
+        self.assertEqual(statuses, {CVScan.ScanStatus.FINISHED})
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_scans_run_when_batch_anonymization_fails(self):
+        cv_scan = CVScan.objects.create(cv=self.cv, job_description="Python Developer")
+        with mock.patch("agent.anonymizer.anonymize_texts", side_effect=RuntimeError("spacy")):
+            start_cv_scans([(self.cv.id, cv_scan.id)])
+
+        cv_scan.refresh_from_db()
+        self.assertEqual(cv_scan.scan_status, CVScan.ScanStatus.FINISHED)
+        self.assertNotIn("anonymized_cv_text", self.invoke.call_args.args[0])
+
+    def test_status_changes_are_published(self):
+        broker = progress.InMemoryBroker()
+        cv_scan = CVScan.objects.create(cv=self.cv, job_description="Python Developer")
+        subscription = broker.subscribe(progress.channel_name(cv_scan.id))
+        with mock.patch.object(progress, "progressBrokerInstance", broker):
+            analyze_cv_task.apply(args=(self.cv.id, cv_scan.id))
+
+        statuses = []
+        while (event := subscription.get(timeout=0)) is not None:
+            statuses.append(event["status"])
+        self.assertEqual(statuses, ["STARTED", "PROCESSING", "FINISHED"])
+
+    def test_scan_fails_once_retries_are_exhausted(self):
+        broker = progress.InMemoryBroker()
+        cv_scan = CVScan.objects.create(cv=self.cv, job_description="Python Developer")
+        subscription = broker.subscribe(progress.channel_name(cv_scan.id))
+        self.invoke.side_effect = RuntimeError("provider down")
+        with mock.patch.object(progress, "progressBrokerInstance", broker):
+            result = analyze_cv_task.apply(args=(self.cv.id, cv_scan.id))
+
+        self.assertIsInstance(result.result, RuntimeError)
+        self.assertEqual(self.invoke.call_count, 4)
+        cv_scan.refresh_from_db()
+        self.assertEqual(cv_scan.scan_status, CVScan.ScanStatus.FAILED)
+        events = []
+        while (event := subscription.get(timeout=0)) is not None:
+            events.append(event)
+        self.assertEqual(events[-1], {"event": "status", "status": "FAILED"})
+
+    @override_settings(AGENT_SCAN_ABANDONED_AFTER=60)
+    def test_abandoned_scans_are_failed(self):
+        abandoned = CVScan.objects.create(cv=self.cv, job_description="Python Developer")
+        recent = CVScan.objects.create(cv=self.cv, job_description="Python Developer")
+        finished = CVScan.objects.create(
+            cv=self.cv, job_description="Python Developer", scan_status=CVScan.ScanStatus.FINISHED
+        )
+        # update() leaves `modified` alone
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        CVScan.objects.filter(pk__in=[abandoned.pk, finished.pk]).update(modified=an_hour_ago)
+
+        self.assertEqual(fail_abandoned_scans_task.apply().result, {"failed": 1})
+        statuses = dict(CVScan.objects.values_list("pk", "scan_status"))
+        self.assertEqual(statuses[abandoned.pk], CVScan.ScanStatus.FAILED)
+        self.assertEqual(statuses[recent.pk], CVScan.ScanStatus.PENDING)
+        self.assertEqual(statuses[finished.pk], CVScan.ScanStatus.FINISHED)
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_scan_runs_when_precompute_gives_up(self):
+        cv_scan = CVScan.objects.create(cv=self.cv, job_description="Python Developer")
+        with (
+            mock.patch(
+                "agent.steam_line_workflow.cv_artifacts_workflow.invoke",
+                side_effect=RateLimitExceeded("gemini-2.5-flash", 0),
+            ) as precompute,
+        ):
+            start_cv_processing(self.cv.id, cv_scan.id)
+
+        # first attempt and its 3 retries
+        self.assertEqual(precompute.call_count, 4)
+        cv_scan.refresh_from_db()
+        self.assertEqual(cv_scan.scan_status, CVScan.ScanStatus.FINISHED)
+        self.assertNotIn("anonymized_cv_text", self.invoke.call_args.args[0])
@@ -0,0 +1,91 @@
+import logging
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TransactionTestCase, override_settings
+
+from agent import steam_line_workflow as workflow
+from agent.tests.test_steam_line_workflow import fake_fused_llm
+from apps.cvprep.checkpointer import delete_stale_checkpoints
+from apps.cvprep.models import (
+    CV,
+    CVOwner,
+    CVScan,
+    WorkflowCheckpoint,
+    WorkflowCheckpointWrite,
+)
+from apps.cvprep.tasks import analyze_cv_task, delete_stale_checkpoints_task
+from apps.users.models import User
+
+
+@override_settings(AGENT_CHECKPOINTS_ENABLED=True, AGENT_ASYNC_MODE=False, AGENT_OUTPUT_VALIDATION=False)
+class AnalyzeCVTaskCheckpointTestCase(TransactionTestCase):
+    def setUp(self):
+        # uploaded CV files go to a directory of their own instead of MEDIA_ROOT
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        logging.disable(logging.CRITICAL)
+        user = User.objects.create_user(username="owner", password="password")
+        owner = CVOwner.objects.create(user=user)
+        cv = CV.objects.create(
+            title="cv", file=SimpleUploadedFile("cv.pdf", b"pdf"), cv_text="Python developer", owner=owner
+        )
+        self.cv_scan = CVScan.objects.create(cv=cv, job_description="Python Developer")
+
+        self.prompts: list[str] = []
+        self.fail_analyzer = True
+
+        def llm(prompt, on_token=None):
+            self.prompts.append(prompt)
+            if self.fail_analyzer and "Required Soft Skills:" in prompt:
+                raise RuntimeError("provider is down")
+            return fake_fused_llm(prompt)
+
+        mock.patch.object(workflow, "invoke_llm", side_effect=llm).start()
+        mock.patch.object(workflow, "anonymize_text", side_effect=lambda text: text).start()
+        mock.patch.object(workflow, "capture_trace").start()
+        # the checkpointed workflow is built from the current pipeline mode, pin it to fused
+        mock.patch.object(workflow, "PIPELINE_MODE", "fused").start()
+        mock.patch("apps.cvprep.checkpointer.checkpointedWorkflowInstance", None).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def run_task(self):
+        analyze_cv_task.apply(args=(self.cv_scan.cv_id, self.cv_scan.id), retries=3)
+        self.cv_scan.refresh_from_db()
+
+    def test_retry_resumes_at_the_failed_node(self):
+        self.run_task()
+        self.assertNotEqual(self.cv_scan.scan_status, CVScan.ScanStatus.FINISHED)
+        # preprocess, skill identifier, failing skill analyzer
+        self.assertEqual(len(self.prompts), 3)
+        self.assertTrue(WorkflowCheckpoint.objects.exists())
+
+        self.fail_analyzer = False
+        self.run_task()
+        self.assertEqual(self.cv_scan.scan_status, CVScan.ScanStatus.FINISHED)
+        # only the skill analyzer and the summary ran again
+        self.assertEqual(len(self.prompts), 5)
+        self.assertIn("Required Soft Skills:", self.prompts[3])
+        self.assertEqual(self.cv_scan.soft_skill_analyser_output, '{"match_score": 60}')
+
+    def test_checkpoints_are_deleted_when_the_scan_finishes(self):
+        self.fail_analyzer = False
+        self.run_task()
+        self.assertEqual(self.cv_scan.scan_status, CVScan.ScanStatus.FINISHED)
+        self.assertFalse(WorkflowCheckpoint.objects.exists())
+        self.assertFalse(WorkflowCheckpointWrite.objects.exists())
+
+    def test_stale_checkpoints_are_deleted(self):
+        self.run_task()
+        self.assertEqual(delete_stale_checkpoints(max_age=60), 0)
+        self.assertGreater(delete_stale_checkpoints(max_age=-60), 0)
+        self.assertFalse(WorkflowCheckpoint.objects.exists())
+
+    def test_stale_checkpoint_cleanup_is_scheduled(self):
+        scheduled = {entry["task"] for entry in settings.CELERY_BEAT_SCHEDULE.values()}
+        self.assertIn(delete_stale_checkpoints_task.name, scheduled)
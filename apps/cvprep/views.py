@@ -1,24 +1,35 @@
+import json
 import os
+import time
 import uuid
 
 import pymupdf
 from django.contrib.auth import get_user_model
-from django.http import FileResponse
-from rest_framework import exceptions, generics, mixins, status
+from django.http import FileResponse, StreamingHttpResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework import exceptions, generics, mixins, renderers, status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
-from apps.cvprep.filter import StandardResultsSetPagination
+from apps.cvprep.filter import RankingResultsSetPagination, StandardResultsSetPagination
 from apps.utils.permissions import IsAdminORCVOwner, IsAdminORCVScanOwner
 from config import settings
 from config.settings import MEDIA_ROOT, MEDIA_URL
 
-from .models import CV, CVOwner, CVScan
-from .serializers import CVScanCreateSerializer, CVScanSerializer, CVSerializer
-from .tasks import analyze_cv_task
+from .models import CV, CVOwner, CVScan, JobDescription
+from .ranking import rank_cvs, start_top_scans
+from .serializers import (
+    CVRankingRequestSerializer,
+    CVRankSerializer,
+    CVScanCreateSerializer,
+    CVScanSerializer,
+    CVSerializer,
+)
+from .tasks import analyze_cv_task, start_cv_processing
 
 User = get_user_model()
 
@@ -85,6 +96,152 @@ class CVScanDetailView(generics.RetrieveAPIView, generics.UpdateAPIView):
     serializer_class = CVScanSerializer
 
 
+class CVRankingView(generics.GenericAPIView):
+    """
+    Rank many CVs against one job description in one request, without LLM calls, best first.
+
+    Scores come from local embeddings of the (preprocessed) CV texts and, once the job description's
+    skills were extracted by an earlier scan, the share of required hard skills found in each CV.
+    With `top_k_scans`, full LLM scans are enqueued for the best ranked CVs, their ids are returned
+    with the ranks. Pages are selected with `?page=` and `?page_size=`.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = CVRankSerializer
+    pagination_class = RankingResultsSetPagination
+
+    def get_queryset(self):
+        queryset = CV.objects.exclude(cv_text="")
+        if self.request.user.is_staff:
+            return queryset
+        assert isinstance(self.request.user, User)
+        return queryset.filter(owner__user=self.request.user)
+
+    @extend_schema(request=CVRankingRequestSerializer, responses=CVRankSerializer(many=True))
+    def post(self, request, *args, **kwargs):
+        ranking_request = CVRankingRequestSerializer(data=request.data)
+        ranking_request.is_valid(raise_exception=True)
+        data = ranking_request.validated_data
+
+        cvs = self.get_queryset()
+        if "cvs" in data:
+            cvs = cvs.filter(id__in=data["cvs"])
+            unknown = set(data["cvs"]) - {cv.id for cv in cvs}
+            if unknown:
+                raise exceptions.ValidationError({"cvs": f"CVs not found or without text: {sorted(unknown)}"})
+
+        job_description = JobDescription.for_text(data["job_description"])
+        ranks = rank_cvs(job_description, list(cvs))
+        if data["top_k_scans"]:
+            start_top_scans(job_description, ranks, data["top_k_scans"], data["scan_title"])
+
+        page = self.paginate_queryset(ranks)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+
+class EventStreamRenderer(renderers.BaseRenderer):
+    # lets EventSource clients (Accept: text/event-stream) through DRF content negotiation
+    media_type = "text/event-stream"
+    format = "sse"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode("utf-8")
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# no more progress events come after these
+TERMINAL_SCAN_STATUSES = {CVScan.ScanStatus.FINISHED, CVScan.ScanStatus.FAILED}
+TERMINAL_SCAN_STATUS_LABELS = {status.label for status in TERMINAL_SCAN_STATUSES}
+
+
+async def scan_event_stream(cv_scan: CVScan, include_tokens: bool):
+    """
+    Current status of the scan followed by the progress events published by analyze_cv_task,
+    until the scan finishes or fails, or `AGENT_PROGRESS_STREAM_TIMEOUT` runs out.
+
+    An async generator: served by the ASGI app (config/asgi.py) an open stream waits on the event loop
+    instead of holding a worker thread.
+    """
+    from agent.progress import channel_name, get_progress_broker
+
+    # subscribe before reading the status, so an update in between is not missed
+    subscription = await get_progress_broker().asubscribe(channel_name(cv_scan.id))
+    try:
+        await cv_scan.arefresh_from_db(fields=["scan_status"])
+        yield format_sse("status", {"event": "status", "status": cv_scan.get_scan_status_display()})
+        if cv_scan.scan_status in TERMINAL_SCAN_STATUSES:
+            return
+
+        deadline = time.monotonic() + settings.AGENT_PROGRESS_STREAM_TIMEOUT
+        while time.monotonic() < deadline:
+            event = await subscription.aget(timeout=settings.AGENT_PROGRESS_HEARTBEAT_INTERVAL)
+            if event is None:
+                # comment line, keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            if event["event"] == "token" and not include_tokens:
+                continue
+            yield format_sse(event["event"], event)
+            if event["event"] == "status" and event["status"] in TERMINAL_SCAN_STATUS_LABELS:
+                return
+    finally:
+        await subscription.aclose()
+
+
+class CVScanEventsView(generics.GenericAPIView):
+    """
+    Server-sent events stream of a scan's progress, replaces polling `scans/<pk>`.
+
+    Events: `status` (scan status changes), `node` (a workflow node finished or was skipped),
+    `retry` (the scan task will be retried) and, with `?tokens=1`, `token` (summary text as it is generated).
+    The stream ends once the scan is FINISHED or FAILED (retries exhausted or abandoned).
+
+    Deploy it behind the ASGI app (the `stream` service in docker-compose.yaml), the sync gunicorn
+    workers of the API would be held by every open stream.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminORCVScanOwner]
+    renderer_classes = [renderers.JSONRenderer, EventStreamRenderer]
+    queryset = CVScan.objects.select_related("cv__owner")
+
+    @extend_schema(
+        parameters=[OpenApiParameter("tokens", OpenApiTypes.BOOL, description="also stream summary tokens")],
+        responses={(200, "text/event-stream"): OpenApiTypes.STR},
+    )
+    def get(self, request, *args, **kwargs):
+        cv_scan = self.get_object()
+        include_tokens = request.query_params.get("tokens") in ("1", "true")
+        response = StreamingHttpResponse(
+            scan_event_stream(cv_scan, include_tokens=include_tokens),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        # nginx would otherwise buffer the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class CVScanTracesView(generics.GenericAPIView):
+    """
+    Prompts and responses captured for a scan's workflow nodes, truncated and redacted, oldest first.
+
+    Only a sample of the scans is captured (AGENT_TRACE_SAMPLE_RATE), `traces` is empty for the others.
+    """
+
+    permission_classes = [IsAdminUser]
+    queryset = CVScan.objects.all()
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT})
+    def get(self, request, *args, **kwargs):
+        from agent.trace_capture import get_scan_traces
+
+        cv_scan = self.get_object()
+        return Response({"scan": cv_scan.id, "traces": get_scan_traces(cv_scan.id)})
+
+
 class CVViewSet(
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
@@ -163,12 +320,14 @@ class CVViewSet(
                         scan_status=CVScan.ScanStatus.PENDING,
                     )
                     assert cv_scan_serializer.instance is not None
-                    analyze_cv_task.delay(cv_pk, cv_scan_serializer.instance.id)
+                    start_cv_processing(cv_pk, cv_scan_serializer.instance.id)
                     return Response(
                         update_serializer.data,
                         status=status.HTTP_201_CREATED,
                     )
                 else:
+                    # CV is saved, still get it ready for the scans that will follow
+                    start_cv_processing(cv_pk)
                     return Response(cv_scan_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             else:
                 return Response(update_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -23,7 +23,7 @@ from .serializers import (
     CVSerializer,
     UserCVOwnerSerializer,
 )
-from .tasks import analyze_cv_task
+from .tasks import start_cv_processing
 
 User = get_user_model()
 
@@ -98,7 +98,7 @@ class CVUploadView(APIView):
                 )
                 cv_scan.save()
                 cv_scan_serializer = CVScanSerializer(instance=cv_scan)
-                analyze_cv_task.delay(update_serializer.data.get("id"), cv_scan_serializer.data.get("id"))
+                start_cv_processing(update_serializer.data.get("id"), cv_scan_serializer.data.get("id"))
                 return Response(
                     {
                         "cv": update_serializer.data,
@@ -1,11 +1,15 @@
 import os
+import time
 
+import structlog
 from celery import Celery, shared_task
-from celery.signals import worker_process_init
+from celery.signals import before_task_publish, worker_process_init
 from django_structlog.celery.steps import DjangoStructLogInitStep
 
 from config.otel import setup_open_telemetry
 
+logger = structlog.get_logger(__name__)
+
 # Cheat Sheet Documentation
 # https://cheat.readthedocs.io/en/latest/django/celery.html
 
@@ -29,11 +33,41 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
 
+@worker_process_init.connect(weak=False)
+def init_anonymizer_engines(*args, **kwargs):
+    from django.conf import settings
+
+    from agent.anonymizer import engine_registry, get_anonymizer_pool
+
+    if settings.AGENT_WARM_UP_ENGINES:
+        # Load presidio/spacy once per worker process before it starts consuming tasks.
+        # If this fails, engines are loaded lazily on the first scan instead.
+        try:
+            engine_registry.warm_up()
+        except Exception as e:
+            logger.error("could not warm up anonymizer engines", e=e)
+
+    # The chunk pool forks now: with the engines loaded above, and before the tracing setup
+    # (connected below) or a scan starts a thread.
+    if engine_registry.profile.chunkable:
+        try:
+            get_anonymizer_pool()
+        except Exception as e:
+            logger.error("could not start the anonymizer pool", e=e)
+
+
 @worker_process_init.connect(weak=False)
 def init_celery_tracing(*args, **kwargs):
     setup_open_telemetry("django-api-template-celery-worker")
 
 
+@before_task_publish.connect(weak=False)
+def add_enqueued_at_header(headers=None, **kwargs):
+    # queue wait of the agent tasks is measured from this, see agent/telemetry.py
+    if headers is not None:
+        headers["enqueued_at"] = time.time()
+
+
 @shared_task
 def sample_echo_task():
     return {"message": "Hello World"}
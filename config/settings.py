@@ -535,6 +535,17 @@ if USE_CELERY:
     CELERY_TASK_TRACK_STARTED = True
     CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
     CELERY_TASK_ALWAYS_EAGER = False
+    # Installed into django_celery_beat's tables by the DatabaseScheduler (tools/infra/entrypoint_beat.sh)
+    CELERY_BEAT_SCHEDULE = {
+        "fail-abandoned-scans": {
+            "task": "apps.cvprep.tasks.fail_abandoned_scans_task",
+            "schedule": 15 * 60,
+        },
+        "delete-stale-checkpoints": {
+            "task": "apps.cvprep.tasks.delete_stale_checkpoints_task",
+            "schedule": 60 * 60,
+        },
+    }
 else:
     # Following will make the celery tasks always run in eager mode.
     # So tasks will not be submitted to the worker.
@@ -556,8 +567,134 @@ INSTALLED_APPS = (
     I18N_OVERRIDE_APPS + DJANGO_ADMIN_THEME_APPS + DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS + CLEANUP_APPS
 )
 
+SILKY_PYTHON_PROFILER = True
 
+# ---------------------------------------------------------- Agent -----------------------------------------------------
 GEN_AI_API_KEY = env.str("GEN_AI_API_KEY", default="")
 OLLAMA_BASE_URL = env.str("OLLAMA_BASE_URL", default="")
-
-SILKY_PYTHON_PROFILER = True
+# LLM adapter used by the workflow: ChatGoogleGenerativeAI, ChatOllama or FakeChatModel (no network, for benchmarks)
+AGENT_LLM_NAME = env.str("AGENT_LLM_NAME", default="ChatGoogleGenerativeAI")
+# Providers tried in order when AGENT_LLM_NAME fails, as "<adapter>:<model>" (eg: ChatOllama:qwen2.5:7b).
+# The prompts of the node's own model (see AGENT_NODE_MODELS) are sent to every provider, see agent/llm_router.py
+AGENT_LLM_FALLBACKS = env.list("AGENT_LLM_FALLBACKS", default=[])
+# A provider failing AGENT_LLM_BREAKER_FAILURES times in a row is skipped for AGENT_LLM_BREAKER_COOLDOWN seconds
+AGENT_LLM_BREAKER_FAILURES = env.int("AGENT_LLM_BREAKER_FAILURES", default=3)
+AGENT_LLM_BREAKER_COOLDOWN = env.float("AGENT_LLM_BREAKER_COOLDOWN", default=30.0)
+# A call slower than this percentile of the provider's latencies is also sent to the next provider, 0 disables it
+AGENT_LLM_HEDGE_PERCENTILE = env.float("AGENT_LLM_HEDGE_PERCENTILE", default=0.0)
+# Per node model routing (see agent/model_routing.py), nodes without an entry use AGENT_LLM_NAME and the workflow model.
+# Format: "<agent>[@<min cv tokens>]=<adapter>:<model>[?<param>=<value>&...]", routed models need their own prompts.
+# eg: "skill_identifier_agent=ChatGoogleGenerativeAI:gemini-2.5-flash-lite?temperature=0,
+#      summary_generator_agent@6000=ChatGoogleGenerativeAI:gemini-2.5-flash"
+AGENT_NODE_MODELS = env.dict("AGENT_NODE_MODELS", default={})
+# Connection pool shared by the LLM and embedding clients of a process (see agent/http_client.py).
+# AGENT_HTTP_TIMEOUT is the longest a single LLM request may take, AGENT_HTTP2 needs the h2 package.
+AGENT_HTTP_MAX_CONNECTIONS = env.int("AGENT_HTTP_MAX_CONNECTIONS", default=50)
+AGENT_HTTP_MAX_KEEPALIVE_CONNECTIONS = env.int("AGENT_HTTP_MAX_KEEPALIVE_CONNECTIONS", default=20)
+AGENT_HTTP_KEEPALIVE_EXPIRY = env.float("AGENT_HTTP_KEEPALIVE_EXPIRY", default=90.0)
+AGENT_HTTP_CONNECT_TIMEOUT = env.float("AGENT_HTTP_CONNECT_TIMEOUT", default=5.0)
+AGENT_HTTP_TIMEOUT = env.float("AGENT_HTTP_TIMEOUT", default=120.0)
+AGENT_HTTP2 = env.bool("AGENT_HTTP2", default=False)
+# FakeChatModel median latency in seconds, its log-normal spread, probability of a failed call and random seed
+AGENT_FAKE_LLM_LATENCY = env.float("AGENT_FAKE_LLM_LATENCY", default=0.5)
+AGENT_FAKE_LLM_LATENCY_SIGMA = env.float("AGENT_FAKE_LLM_LATENCY_SIGMA", default=0.3)
+AGENT_FAKE_LLM_FAILURE_RATE = env.float("AGENT_FAKE_LLM_FAILURE_RATE", default=0.0)
+AGENT_FAKE_LLM_SEED = env.int("AGENT_FAKE_LLM_SEED", default=None)
+# Share of scans whose node prompts and responses are captured (see agent/trace_capture.py), 1 captures every scan.
+# Captures are truncated to AGENT_TRACE_MAX_CHARS, redacted, logged and kept for AGENT_TRACE_TTL seconds per scan.
+AGENT_TRACE_SAMPLE_RATE = env.float("AGENT_TRACE_SAMPLE_RATE", default=0.1)
+AGENT_TRACE_MAX_CHARS = env.int("AGENT_TRACE_MAX_CHARS", default=2000)
+AGENT_TRACE_REDACT = env.bool("AGENT_TRACE_REDACT", default=True)
+AGENT_TRACE_TTL = env.int("AGENT_TRACE_TTL", default=24 * 60 * 60)
+# Captures waiting for the background flush, the oldest are dropped when it is full
+AGENT_TRACE_BUFFER_SIZE = env.int("AGENT_TRACE_BUFFER_SIZE", default=1000)
+AGENT_TRACE_FLUSH_INTERVAL = env.float("AGENT_TRACE_FLUSH_INTERVAL", default=2.0)
+# Load and warm up the presidio/spacy anonymizer engines when a celery worker process starts
+AGENT_WARM_UP_ENGINES = env.bool("AGENT_WARM_UP_ENGINES", default=True)
+# How much of presidio/spacy anonymizes a CV (see agent/anonymizer.py), compare them: manage.py benchmark_anonymizer
+# "fast": regex recognizers only (contact details, no names), "standard": spacy NER only with an entity allow-list,
+# "full": the whole spacy pipeline and every presidio recognizer
+AGENT_ANONYMIZER_PROFILE = env.str("AGENT_ANONYMIZER_PROFILE", default="full")
+# spacy nlp.pipe settings used when anonymizing CVs in bulk
+AGENT_ANONYMIZER_BATCH_SIZE = env.int("AGENT_ANONYMIZER_BATCH_SIZE", default=32)
+AGENT_ANONYMIZER_N_PROCESS = env.int("AGENT_ANONYMIZER_N_PROCESS", default=1)
+# CVs longer than AGENT_ANONYMIZER_CHUNK_CHARS are analyzed as chunks overlapping by AGENT_ANONYMIZER_CHUNK_OVERLAP
+# characters on AGENT_ANONYMIZER_CHUNK_WORKERS processes, started with each celery worker process. 0 disables
+# chunking. Only the "fast" profile is chunked, spacy NER depends on the text around an entity
+AGENT_ANONYMIZER_CHUNK_CHARS = env.int("AGENT_ANONYMIZER_CHUNK_CHARS", default=20000)
+AGENT_ANONYMIZER_CHUNK_OVERLAP = env.int("AGENT_ANONYMIZER_CHUNK_OVERLAP", default=500)
+AGENT_ANONYMIZER_CHUNK_WORKERS = env.int("AGENT_ANONYMIZER_CHUNK_WORKERS", default=4)
+# Per model LLM rate limits shared by all workers (through redis when REDIS_URL is set).
+# Format: "<model>=<requests>/<seconds>[/<burst>]", models without an entry are not limited.
+AGENT_RATE_LIMITS = env.dict(
+    "AGENT_RATE_LIMITS",
+    default={
+        "gemini-2.5-flash": "10/60",
+        "gemini-2.5-flash-lite": "15/60",
+    },
+)
+# Longest a node waits for rate limit budget before the scan task is retried later instead
+AGENT_RATE_LIMIT_MAX_WAIT = env.float("AGENT_RATE_LIMIT_MAX_WAIT", default=60.0)
+# How many workflow nodes of a single scan may run at the same time
+AGENT_MAX_CONCURRENCY = env.int("AGENT_MAX_CONCURRENCY", default=3)
+# Input tokens per LLM node, capped by the model's target input size (see agent/token_budget.py).
+# Long CVs are compacted and their lowest value sections trimmed to fit, nodes without an entry use the model cap.
+AGENT_PROMPT_TOKEN_BUDGETS = env.dict(
+    "AGENT_PROMPT_TOKEN_BUDGETS",
+    cast={"value": int},
+    default={
+        "preprocess_agent": 6000,
+        "hard_skill_analyzer_agent": 4000,
+        "soft_skill_analyzer_agent": 4000,
+        "skill_analyzer_agent": 5000,
+    },
+)
+# Preprocess long CVs as section aligned chunks sent in parallel, whose results are joined (map-reduce).
+# CVs above AGENT_PREPROCESS_CHUNK_TOKENS are chunked, AGENT_PREPROCESS_CHUNK_CONCURRENCY calls run at once per scan
+AGENT_PREPROCESS_CHUNKING = env.bool("AGENT_PREPROCESS_CHUNKING", default=False)
+AGENT_PREPROCESS_CHUNK_TOKENS = env.int("AGENT_PREPROCESS_CHUNK_TOKENS", default=1500)
+AGENT_PREPROCESS_CHUNK_CONCURRENCY = env.int("AGENT_PREPROCESS_CHUNK_CONCURRENCY", default=4)
+# "split": one LLM call per skill type, "fused": hard and soft skills identified and analyzed together
+# in one call each, only for models with fused prompts. Empty: the model's own mode (see agent/prompts.py)
+AGENT_PIPELINE_MODE = env.str("AGENT_PIPELINE_MODE", default="")
+# How required hard skills are matched against the CV, see agent/skill_matcher.py
+# "llm": the analyzer decides, "rules": skill taxonomy only (no LLM call),
+# "prefilter": the rules decide what they find, the LLM judges the rest
+AGENT_SKILL_MATCHING = env.str("AGENT_SKILL_MATCHING", default="llm")
+# Check json responses of the LLM nodes against agent/output_schemas.py when they are generated,
+# an invalid response is sent back with what is wrong up to AGENT_OUTPUT_REPAIR_ATTEMPTS times
+AGENT_OUTPUT_VALIDATION = env.bool("AGENT_OUTPUT_VALIDATION", default=True)
+AGENT_OUTPUT_REPAIR_ATTEMPTS = env.int("AGENT_OUTPUT_REPAIR_ATTEMPTS", default=1)
+# Local embeddings for semantic matching and ranking, see agent/embeddings.py and agent/vector_index.py
+# "hashing" needs no model (AGENT_EMBEDDING_DIM buckets), any other value is an ollama embedding model
+AGENT_EMBEDDING_MODEL = env.str("AGENT_EMBEDDING_MODEL", default="hashing")
+AGENT_EMBEDDING_DIM = env.int("AGENT_EMBEDDING_DIM", default=2048)
+# memory-mapped vector indexes are stored here, one directory per embedder
+AGENT_VECTOR_INDEX_DIR = env.str("AGENT_VECTOR_INDEX_DIR", default=str(ROOT_DIR / ".vector_index"))
+# Batch ranking of CVs against one job description (scans/rank), see apps/cvprep/ranking.py
+# share of the score given to required hard skills found in the CV, the rest is text similarity
+AGENT_RANKING_SKILL_WEIGHT = env.float("AGENT_RANKING_SKILL_WEIGHT", default=0.6)
+# most full LLM scans one ranking request may enqueue for its top CVs
+AGENT_RANKING_MAX_SCANS = env.int("AGENT_RANKING_MAX_SCANS", default=20)
+# Run scans with ainvoke on one event loop per worker process (see agent/runner.py).
+# Meant for a threads pool worker, eg: celery -A config worker --pool=threads --concurrency=50
+AGENT_ASYNC_MODE = env.bool("AGENT_ASYNC_MODE", default=False)
+# Maximum scans in flight on the event loop of a single worker process
+AGENT_ASYNC_MAX_IN_FLIGHT = env.int("AGENT_ASYNC_MAX_IN_FLIGHT", default=50)
+# Cache LLM responses keyed on provider, model, prompt and generation params (see agent/llm_cache.py)
+AGENT_LLM_CACHE_ENABLED = env.bool("AGENT_LLM_CACHE_ENABLED", default=True)
+AGENT_LLM_CACHE_TTL = env.int("AGENT_LLM_CACHE_TTL", default=7 * 24 * 60 * 60)  # 7 days
+AGENT_LLM_CACHE_LOCAL_MAX_ENTRIES = env.int("AGENT_LLM_CACHE_LOCAL_MAX_ENTRIES", default=256)
+AGENT_LLM_CACHE_MAX_RESPONSE_BYTES = env.int("AGENT_LLM_CACHE_MAX_RESPONSE_BYTES", default=256 * 1024)
+# Publish summary tokens to the scan progress stream as the LLM generates them (see agent/progress.py)
+AGENT_PROGRESS_STREAM_TOKENS = env.bool("AGENT_PROGRESS_STREAM_TOKENS", default=True)
+# Longest a client stays connected to a scan progress stream, and the keep-alive interval
+AGENT_PROGRESS_STREAM_TIMEOUT = env.float("AGENT_PROGRESS_STREAM_TIMEOUT", default=10 * 60)
+AGENT_PROGRESS_HEARTBEAT_INTERVAL = env.float("AGENT_PROGRESS_HEARTBEAT_INTERVAL", default=15.0)
+# Save the workflow state of a scan after every node, so retries resume at the failed node.
+# See apps/cvprep/checkpointer.py
+AGENT_CHECKPOINTS_ENABLED = env.bool("AGENT_CHECKPOINTS_ENABLED", default=True)
+# Checkpoints of scans that never finished are removed by delete_stale_checkpoints_task after this many seconds
+AGENT_CHECKPOINT_MAX_AGE = env.int("AGENT_CHECKPOINT_MAX_AGE", default=24 * 60 * 60)
+# Unfinished scans not updated for this many seconds are marked FAILED by fail_abandoned_scans_task
+AGENT_SCAN_ABANDONED_AFTER = env.int("AGENT_SCAN_ABANDONED_AFTER", default=3 * 60 * 60)
@@ -9,7 +9,15 @@ from rest_framework.routers import DefaultRouter
 from apps.api_auth.apis.common.views import MeCommonViewSet, TokenCommonViewSet
 from apps.api_auth.apis.customer.views import AuthCustomerViewSet
 from apps.api_auth.apis.cvowner.views import AuthCVOwnerViewSet
-from apps.cvprep.views import CVScanDetailView, CVScanListView, CVViewSet, serve_cvs
+from apps.cvprep.views import (
+    CVRankingView,
+    CVScanDetailView,
+    CVScanEventsView,
+    CVScanListView,
+    CVScanTracesView,
+    CVViewSet,
+    serve_cvs,
+)
 from apps.cvprep.views_additional import (
     CVOwnerAPIView,
     CVOwnerListView,
@@ -61,11 +69,26 @@ urlpatterns += [
         view=CVScanListView.as_view(),
         name="scan_results",
     ),
+    path(
+        "scans/rank",
+        view=CVRankingView.as_view(),
+        name="scan_ranking",
+    ),
     path(
         "scans/<int:pk>",
         view=CVScanDetailView.as_view(),
         name="scan_results",
     ),
+    path(
+        "scans/<int:pk>/events",
+        view=CVScanEventsView.as_view(),
+        name="scan_events",
+    ),
+    path(
+        "scans/<int:pk>/traces",
+        view=CVScanTracesView.as_view(),
+        name="scan_traces",
+    ),
     path("cvs/", include(cv_router.urls)),
 ]
 